@@ -1,12 +1,23 @@
-from flask import Flask, render_template, request, redirect, url_for
+from flask import Flask, render_template, request, redirect, url_for, jsonify
 from flask_cors import CORS
 
 import uuid
 from datetime import date, timedelta
 
-from oracle import get_connection
+import assets
+import db
+from db import get_connection
+import flight_summary
+import inventory_version
+import page_cache
+import round_trip
+import search_index
+import seat_holds
+import seat_inventory
+import sql_metrics
 from routes.flights import flights_bp   # JSON API: /flights/search
 from routes.seats import seats_bp       # JSON API: /flights/<id>/seats
+from routes.holds import holds_bp       # JSON API: /flights/<id>/hold
 
 # IMPORTANT: point Flask to your templates and static files
 app = Flask(
@@ -17,80 +28,173 @@ app = Flask(
 
 CORS(app)
 
+# One pooled connection per request, returned to the pool on teardown
+db.init_app(app)
+
+# Per-statement SQL timings and round trips per request, served on /metrics
+sql_metrics.init_app(app)
+
 # ----------------- REGISTER BLUEPRINTS -----------------
 # Register JSON API blueprints AFTER app is created
 app.register_blueprint(flights_bp, url_prefix="/flights")
 app.register_blueprint(seats_bp, url_prefix="/flights")
+app.register_blueprint(holds_bp, url_prefix="/flights")
+
+# Checkout session cookie for seat holds
+seat_holds.init_app(app)
+
+# Build missing summary rows and re-quote stale fares before serving
+flight_summary.init_app(app)
+
+# Warm the in-memory search index (searches fall back to SQL without it)
+search_index.init_app(app)
+
+# Bundled, fingerprinted static files once `python assets.py` has run
+assets.init_app(app)
 
 # ----------------- BASIC PAGES -----------------
+# Static templates: rendered once, then served from page_cache
 
 @app.route("/")
+@page_cache.cached()
 def home():
     # Renders main/templates/index.html
     return render_template("index.html")
 
 @app.route("/destination")
+@page_cache.cached()
 def destination():
     return render_template("destination.html")
 
 @app.route("/pricing")
+@page_cache.cached()
 def pricing():
     return render_template("pricing.html")
 
 @app.route("/contact")
+@page_cache.cached()
 def contact():
     return render_template("contact.html")
 
-# ----------------- SEARCH FLIGHTS (FORM POST) -----------------
+# ----------------- POOL STATS / METRICS -----------------
 
-@app.route("/search_flights", methods=["POST"])
-def search_flights():
-    departure_city = request.form.get("departure_city")   # e.g. 'KHI'
-    arrival_city = request.form.get("arrival_city")       # e.g. 'DXB' or 'LHE'
-    departure_date = request.form.get("departure_date")   # 'YYYY-MM-DD' (for display)
-    travel_class = request.form.get("travel_class")       # 'ECO' / 'BUS' / 'FIR'
-    passengers = request.form.get("passengers")           # string -> shown as text
-    trip_type = request.form.get("trip_type")             # 'one_way' / 'round_trip'
+@app.route("/stats/pool")
+def stats_pool():
+    return jsonify(db.pool_stats())
+
+@app.route("/stats/pages")
+def stats_pages():
+    return jsonify(page_cache.cache.stats())
+
+@app.route("/stats/holds")
+def stats_holds():
+    return jsonify(seat_holds.holds.stats())
+
+@app.route("/stats/inventory")
+def stats_inventory():
+    return jsonify(seat_inventory.stats())
+
+@app.route("/metrics")
+def metrics():
+    # Prometheus text format
+    return sql_metrics.metrics_response()
 
+# ----------------- REFERENCE DATA -----------------
+
+# Reload airports, travel classes and services now instead of at the TTL
+# (e.g. after editing them in the admin)
+@app.route("/reference/refresh", methods=["POST"])
+def refresh_reference():
+    db.reference.refresh()
+    page_cache.cache.clear()   # cached pages show city and class names
+    return jsonify(db.reference.counts())
+
+# ----------------- SEARCH FLIGHTS (FORM POST) -----------------
+
+def _search_flights_sql(departure_city, arrival_city, start_day=None, end_day=None):
+    flight_summary.ensure_current(db.acquire)
     conn = get_connection()
     cursor = conn.cursor()
 
-    # Join with MAIN_AIRPORT, MAIN_SEATDETAILS, MAIN_TRAVELCLASS, MAIN_FLIGHTCOST
-    # to get city names, travel class, and lowest price per flight.
+    # Lowest price and seats left per flight and class from the per-class
+    # summary (fare valid on the quote day, see flight_summary.py), sold-out
+    # classes left out; city and class names come from the reference cache
+    # instead of joins.
     query = """
         SELECT
             f.flight_id,
-            sa.airport_city AS source_city,
-            da.airport_city AS destination_city,
+            f.source_airport_id,
+            f.destination_airport_id,
             TO_CHAR(f.departure_date_time, 'YYYY-MM-DD HH24:MI'),
             TO_CHAR(f.arrival_date_time,   'YYYY-MM-DD HH24:MI'),
             f.airplane_type,
-            MIN(fc.cost) AS lowest_price,
-            tc.name      AS travel_class
+            fs.min_fare  AS lowest_price,
+            fs.travel_class_id,
+            fs.seats_total - fs.seats_booked AS seats_left
         FROM main_flightdetails f
-        JOIN main_airport sa       ON f.source_airport_id      = sa.airport_id
-        JOIN main_airport da       ON f.destination_airport_id = da.airport_id
-        JOIN main_seatdetails s    ON s.flight_id              = f.flight_id
-        JOIN main_travelclass tc   ON s.travel_class_id        = tc.travel_class_id
-        JOIN main_flightcost fc    ON fc.seat_id               = s.seat_id
+        JOIN main_flightclasssummary fs   ON fs.flight_id             = f.flight_id
         WHERE f.source_airport_id      = :1
           AND f.destination_airport_id = :2
-        GROUP BY
-            f.flight_id,
-            sa.airport_city,
-            da.airport_city,
-            f.departure_date_time,
-            f.arrival_date_time,
-            f.airplane_type,
-            tc.name
+          AND f.departure_date_time   >= :3
+          AND f.departure_date_time    < :4
+          AND fs.min_fare IS NOT NULL
+          AND fs.seats_booked < fs.seats_total
         ORDER BY lowest_price ASC
     """
 
-    cursor.execute(query, [departure_city, arrival_city])
-    flights = cursor.fetchall()
+    # Range predicate on the raw column (no TRUNC) so the
+    # (source, destination, departure) index drives the lookup.
+    window_start, window_end = search_index.departure_window(start_day, end_day)
+    cursor.execute(query, [departure_city, arrival_city, window_start, window_end])
+    reference = db.reference
+    flights = [
+        (flight_id, reference.airport_city(source, source), reference.airport_city(destination, destination),
+         departure, arrival, airplane_type, lowest_price, reference.class_name(class_id, class_id), seats_left)
+        for flight_id, source, destination, departure, arrival, airplane_type, lowest_price, class_id, seats_left
+        in cursor.fetchall()
+    ]
 
     cursor.close()
-    conn.close()
+
+    return flights
+
+# A page per distinct search, until inventory changes
+@app.route("/search_flights", methods=["POST"])
+@page_cache.cached(
+    page_cache.form_criteria("departure_city", "arrival_city", "departure_date",
+                             "travel_class", "passengers", "trip_type"),
+    versioned=True, ttl=page_cache.TTL,
+)
+def search_flights():
+    departure_city = request.form.get("departure_city")   # e.g. 'KHI'
+    arrival_city = request.form.get("arrival_city")       # e.g. 'DXB' or 'LHE'
+    departure_date = request.form.get("departure_date")   # 'YYYY-MM-DD'
+    travel_class = request.form.get("travel_class")       # 'ECO' / 'BUS' / 'FIR'
+    passengers = request.form.get("passengers")           # string -> shown as text
+    trip_type = request.form.get("trip_type")             # 'one_way' / 'round_trip'
+
+    # Only flights departing that day; an unreadable date searches the whole route
+    departure_day = search_index.parse_day(departure_date)
+
+    if search_index.is_ready():
+        # Served from memory: same rows _search_flights_sql() would produce
+        flights = [
+            (
+                record.flight_id,
+                record.source_city,
+                record.destination_city,
+                record.departure_str,
+                record.arrival_str,
+                record.airplane_type,
+                lowest_price,
+                class_name,
+                record.seats_left.get(class_name),
+            )
+            for record, class_name, lowest_price
+            in search_index.search(departure_city, arrival_city, departure_day, departure_day)
+        ]
+    else:
+        flights = _search_flights_sql(departure_city, arrival_city, departure_day, departure_day)
 
     # Used by search_results.html in the header
     search_criteria = {
@@ -138,26 +242,159 @@ def select_flight():
 # ----------------- RETURN FLIGHT SEARCH (ROUND TRIP RETURN DATE) -----------------
 
 @app.route("/return_flight_search", methods=["POST"])
+@page_cache.cached(
+    page_cache.form_criteria("flight_id", "passengers", "travel_class", "departure_city",
+                             "arrival_city", "departure_date", "return_date"),
+    versioned=True, ttl=page_cache.TTL,
+)
 def return_flight_search():
     flight_id = request.form.get("flight_id")
     passengers = request.form.get("passengers", "1")
+    travel_class = request.form.get("travel_class", "")
+    departure_city = request.form.get("departure_city")
+    arrival_city = request.form.get("arrival_city")
+    departure_date = request.form.get("departure_date")
     return_date = request.form.get("return_date")
 
-    # For now we just pass return_date as metadata; you can later use it
-    # to search for an actual return flight.
-    return redirect(
-        url_for(
-            "book_flight",
+    outbound_day = search_index.parse_day(departure_date)
+    return_day = search_index.parse_day(return_date)
+    if return_day is None or (outbound_day and return_day < outbound_day):
+        return render_template(
+            "return_flight_search.html",
             flight_id=flight_id,
             passengers=passengers,
-            trip_type="round_trip",
-            return_date=return_date,
-        )
+            travel_class=travel_class,
+            departure_city=departure_city,
+            arrival_city=arrival_city,
+            departure_date=departure_date,
+            error_message="Please choose a return date on or after the departure date.",
+        ), 400
+
+    # Both legs in one pass, paired cheapest-first by total fare. The
+    # outbound flight picked on the results page stays fixed.
+    itineraries = round_trip.search(
+        departure_city, arrival_city, outbound_day, return_day,
+        outbound_flight=flight_id,
+    )
+
+    return render_template(
+        "round_trip_results.html",
+        itineraries=itineraries,
+        search_criteria={
+            "departure_city": departure_city,
+            "arrival_city":   arrival_city,
+            "date":           departure_date,
+            "return_date":    return_date,
+            "travel_class":   travel_class,
+            "passengers":     passengers,
+        },
     )
 
 # ----------------- BOOK FLIGHT (PASSENGER + RESERVATION + PAYMENT) -----------------
 
+def _load_flight_header(flight_id):
+    # (flight_id, source_city, destination_city, departure, arrival, airplane_type)
+    record = search_index.index.get(flight_id) if search_index.is_ready() else None
+    if record is not None:
+        return (
+            record.flight_id,
+            record.source_city,
+            record.destination_city,
+            record.departure_str,
+            record.arrival_str,
+            record.airplane_type,
+        )
+
+    cursor = get_connection().cursor()
+    cursor.execute(
+        """
+        SELECT
+            f.flight_id,
+            f.source_airport_id,
+            f.destination_airport_id,
+            TO_CHAR(f.departure_date_time, 'YYYY-MM-DD HH24:MI'),
+            TO_CHAR(f.arrival_date_time,   'YYYY-MM-DD HH24:MI'),
+            f.airplane_type
+        FROM main_flightdetails f
+        WHERE f.flight_id = :1
+        """,
+        [flight_id],
+    )
+    flight = cursor.fetchone()
+    cursor.close()
+    if flight is None:
+        return None
+    flight_id, source, destination, departure, arrival, airplane_type = flight
+    return (flight_id, db.reference.airport_city(source, source),
+            db.reference.airport_city(destination, destination), departure, arrival, airplane_type)
+
+def _booking_page(flight_id, passengers_count, error_message=None, status=200,
+                  return_flight_id=None):
+    # Flight header for booking.html (a round trip adds the return
+    # flight's); the page fetches the seat maps from /flights/<id>/seat-map.
+    flight = _load_flight_header(flight_id)
+    return_flight = _load_flight_header(return_flight_id) if return_flight_id else None
+
+    # Start the checkout session here, so the page's seat holds share one
+    seat_holds.session_id()
+
+    return render_template(
+        "booking.html",
+        flight=flight,
+        flight_id=flight_id,
+        return_flight=return_flight,
+        return_flight_id=return_flight_id,
+        passengers=passengers_count,
+        error_message=error_message,
+    ), status
+
+def _claim_seats(cursor, flight_id, seat_ids):
+    # Lock the requested seat rows and make sure none is actively reserved.
+    # SKIP LOCKED means a seat another booking is claiming right now comes
+    # back missing instead of making us wait for that transaction.
+    # Returns the seats we could not claim (empty list = all ours).
+    binds = ", ".join(f":{i}" for i in range(2, len(seat_ids) + 2))
+    cursor.execute(
+        f"""
+        SELECT s.seat_id
+        FROM main_seatdetails s
+        WHERE s.flight_id = :1
+          AND s.seat_id IN ({binds})
+        FOR UPDATE SKIP LOCKED
+        """,
+        [flight_id] + seat_ids,
+    )
+    locked = {row[0] for row in cursor}
+    busy = [seat_id for seat_id in seat_ids if seat_id not in locked]
+    if busy:
+        return busy
+
+    binds = ", ".join(f":{i}" for i in range(1, len(seat_ids) + 1))
+    cursor.execute(
+        f"""
+        SELECT r.seat_id
+        FROM main_reservation r
+        WHERE r.seat_id IN ({binds})
+          AND r.status = 'A'
+        """,
+        seat_ids,
+    )
+    return [row[0] for row in cursor]
+
+def _selected_seats(field, passengers_count):
+    # Seats: expect comma-separated list: "PK301-8F,PK301-8E"
+    seat_ids_str = request.form.get(field, "")
+    seat_ids = [s.strip() for s in seat_ids_str.split(",") if s.strip()]
+
+    # Limit number of seats to passengers_count
+    return seat_ids[:passengers_count]
+
+def _booking_etag(flight_id):
+    # The round-trip booking page also shows the return flight's seats
+    return inventory_version.flights_etag(flight_id, request.args.get("return_flight"))
+
 @app.route("/book/<flight_id>", methods=["GET", "POST"])
+@inventory_version.conditional(_booking_etag)   # GET only
 def book_flight(flight_id):
     # Number of passengers (from query string or form, default 1)
     passengers_str = request.args.get("passengers") or request.form.get("passengers") or "1"
@@ -166,184 +403,215 @@ def book_flight(flight_id):
     except ValueError:
         passengers_count = 1
 
+    # Round trip: the return leg is booked in the same transaction
+    return_flight_id = request.args.get("return_flight") or request.form.get("return_flight") or None
+    if return_flight_id == flight_id:
+        return_flight_id = None
+
     # ----------------- POST: CREATE BOOKING -----------------
     if request.method == "POST":
-        conn = get_connection()
-        cursor = conn.cursor()
-
-        # Seats: expect comma-separated list: "PK301-8F,PK301-8E"
-        seat_ids_str = request.form.get("seat_ids", "")
-        seat_ids = [s.strip() for s in seat_ids_str.split(",") if s.strip()]
-
-        # Limit number of seats to passengers_count
-        if len(seat_ids) > passengers_count:
-            seat_ids = seat_ids[:passengers_count]
+        # [(flight_id, [seat_id, ...])] -- one entry per leg
+        legs = [(flight_id, _selected_seats("seat_ids", passengers_count))]
+        if return_flight_id:
+            legs.append((return_flight_id, _selected_seats("return_seat_ids", passengers_count)))
 
         passenger_records = []   # [(passenger_id, full_name)]
-        reservation_records = [] # [(reservation_id, seat_id, passenger_id)]
+        reservation_records = [] # [(reservation_id, seat_id, passenger_id, flight_id)]
         payment_records = []     # [(payment_id, amount)]
 
-        # If not enough seats were selected, re-render the booking page with an error
-        if len(seat_ids) < passengers_count:
-            # reload flight + seats like in GET
-            cursor.execute(
-                """
-                SELECT
-                    f.flight_id,
-                    sa.airport_city AS source_city,
-                    da.airport_city AS destination_city,
-                    TO_CHAR(f.departure_date_time, 'YYYY-MM-DD HH24:MI'),
-                    TO_CHAR(f.arrival_date_time,   'YYYY-MM-DD HH24:MI'),
-                    f.airplane_type
-                FROM main_flightdetails f
-                JOIN main_airport sa ON sa.airport_id = f.source_airport_id
-                JOIN main_airport da ON da.airport_id = f.destination_airport_id
-                WHERE f.flight_id = :1
-                """,
-                [flight_id],
-            )
-            flight = cursor.fetchone()
-
-            cursor.execute(
-                """
-                SELECT
-                    s.seat_id,
-                    tc.name AS class_name,
-                    fc.cost,
-                    CASE
-                        WHEN COUNT(r.reservation_id) > 0 THEN 1
-                        ELSE 0
-                    END AS is_booked
-                FROM main_seatdetails s
-                JOIN main_travelclass tc
-                    ON tc.travel_class_id = s.travel_class_id
-                LEFT JOIN main_flightcost fc
-                    ON fc.seat_id = s.seat_id
-                LEFT JOIN main_reservation r
-                    ON r.seat_id = s.seat_id
-                WHERE s.flight_id = :1
-                GROUP BY
-                    s.seat_id,
-                    tc.name,
-                    fc.cost
-                ORDER BY s.seat_id
-                """,
-                [flight_id],
-            )
-            seats = cursor.fetchall()
+        def retry(error_message, status=200):
+            return _booking_page(flight_id, passengers_count, error_message, status, return_flight_id)
 
-            cursor.close()
-            conn.close()
-
-            error_message = (
-                f"You selected {len(seat_ids)} seat(s) for {passengers_count} passenger(s). "
-                f"Please select {passengers_count} seats."
-            )
+        # If not enough seats were selected, re-render the booking page with an error
+        for leg_flight_id, seat_ids in legs:
+            if len(seat_ids) < passengers_count:
+                error_message = (
+                    f"You selected {len(seat_ids)} seat(s) on flight {leg_flight_id} "
+                    f"for {passengers_count} passenger(s). "
+                    f"Please select {passengers_count} seats."
+                )
+                return retry(error_message)
+
+        for leg_flight_id, seat_ids in legs:
+            seat_map = seat_inventory.get_seat_map(leg_flight_id)
+            unknown = [seat_id for seat_id in seat_ids if seat_id not in seat_map.positions]
+            if unknown or len(set(seat_ids)) < len(seat_ids):
+                error_message = (
+                    f"Invalid seat selection ({', '.join(unknown) or 'duplicate seats'}). "
+                    f"Please select {passengers_count} different seats on flight {leg_flight_id}."
+                )
+                return retry(error_message, 400)
+
+        # The seats go through this session's hold: one the page already
+        # took is kept as is, otherwise it is taken now. Seats another
+        # session holds are refused before touching the database.
+        session = seat_holds.session_id()
+        for leg_flight_id, seat_ids in legs:
+            held = seat_holds.holds.hold(session, leg_flight_id, seat_ids)
+            if held:
+                error_message = (
+                    f"Sorry, seat(s) {', '.join(held)} on flight {leg_flight_id} are being "
+                    f"booked by another customer. Please choose different seats."
+                )
+                return retry(error_message, 409)
 
-            return render_template(
-                "booking.html",
-                flight=flight,
-                seats=seats,
-                passengers=passengers_count,
-                error_message=error_message,
-            )
+        conn = get_connection()
+        cursor = conn.cursor()
 
-        # Insert passengers + reservations + payments
+        # Claim the seats on every leg before writing anything; the unique
+        # index on active reservations (main.Reservation Meta) backs this up
+        # if two requests still race past the check.
+        for leg_flight_id, seat_ids in legs:
+            taken = _claim_seats(cursor, leg_flight_id, seat_ids)
+            if taken:
+                conn.rollback()
+                cursor.close()
+                # Our seat map missed someone else's booking; rebuild it
+                seat_inventory.invalidate(leg_flight_id)
+                error_message = (
+                    f"Sorry, seat(s) {', '.join(taken)} were just taken. "
+                    f"Please choose different seats."
+                )
+                return retry(error_message, 409)
+
+        # Build every row up front, then write each table with one executemany
+        passenger_rows = []
+        reservation_rows = []
         for idx in range(1, passengers_count + 1):
-            # If we don't have enough seats selected, break (extra safety)
-            if idx > len(seat_ids):
-                break
-
-            seat_id = seat_ids[idx - 1]
-
             first_name = request.form.get(f"first_name_{idx}")
             last_name = request.form.get(f"last_name_{idx}")
-            email = request.form.get(f"email_{idx}")
-            phone = request.form.get(f"phone_number_{idx}")
-
-            # Per-passenger address info
-            address = request.form.get(f"address_{idx}")
-            city = request.form.get(f"city_{idx}")
-            state = request.form.get(f"state_{idx}")
-            zipcode = request.form.get(f"zipcode_{idx}")
-            country = request.form.get(f"country_{idx}")
 
             # Generate simple IDs
             passenger_id = "P" + uuid.uuid4().hex[:5].upper()
-            reservation_id = "R" + uuid.uuid4().hex[:5].upper()
+
+            passenger_rows.append([
+                passenger_id,
+                first_name,
+                last_name,
+                request.form.get(f"email_{idx}"),
+                request.form.get(f"phone_number_{idx}"),
+                # Per-passenger address info
+                request.form.get(f"address_{idx}"),
+                request.form.get(f"city_{idx}"),
+                request.form.get(f"state_{idx}"),
+                request.form.get(f"zipcode_{idx}"),
+                request.form.get(f"country_{idx}"),
+            ])
+            passenger_records.append((passenger_id, f"{first_name} {last_name}"))
+
+            # Same passenger on every leg, one reservation per seat
+            for leg_flight_id, seat_ids in legs:
+                reservation_id = "R" + uuid.uuid4().hex[:5].upper()
+                reservation_rows.append([reservation_id, passenger_id, seat_ids[idx - 1]])
+                reservation_records.append((reservation_id, seat_ids[idx - 1], passenger_id, leg_flight_id))
+
+        # Fare valid today (or on departure, see fares.FARE_DATE) for every
+        # selected seat, from the in-memory fare periods; no fare on file -> 0
+        seat_costs = {}
+        for leg_flight_id, seat_ids in legs:
+            seat_map = seat_inventory.get_seat_map(leg_flight_id)
+            for seat_id in seat_ids:
+                seat_costs[seat_id] = seat_map.fare_for(seat_id)
+
+        # Payment records (status N, due in 7 days)
+        due_date = date.today() + timedelta(days=7)
+        payment_rows = []
+        for reservation_id, seat_id, _, _ in reservation_records:
             payment_id = "PAY" + uuid.uuid4().hex[:5].upper()
+            amount = seat_costs.get(seat_id) or 0
+            payment_rows.append([payment_id, due_date, amount, reservation_id])
+            payment_records.append((payment_id, amount))
 
-            # Insert passenger
-            cursor.execute(
+        try:
+            cursor.executemany(
                 """
                 INSERT INTO main_passenger
                 (passenger_id, first_name, last_name, email, phone_number,
                  address, city, state, zipcode, country)
                 VALUES (:1, :2, :3, :4, :5, :6, :7, :8, :9, :10)
                 """,
-                [
-                    passenger_id,
-                    first_name,
-                    last_name,
-                    email,
-                    phone,
-                    address,
-                    city,
-                    state,
-                    zipcode,
-                    country,
-                ],
+                passenger_rows,
             )
 
-            # Insert reservation (date_of_reservation = today via SYSDATE)
-            cursor.execute(
+            # date_of_reservation = today via SYSDATE
+            cursor.executemany(
                 """
                 INSERT INTO main_reservation
                 (reservation_id, passenger_id, seat_id, date_of_reservation)
                 VALUES (:1, :2, :3, SYSDATE)
                 """,
-                [reservation_id, passenger_id, seat_id],
+                reservation_rows,
             )
 
-            # Look up cost for the selected seat (take any available cost, default 0)
-            cursor.execute(
-                """
-                SELECT NVL(MAX(cost), 0)
-                FROM main_flightcost
-                WHERE seat_id = :1
-                """,
-                [seat_id],
-            )
-            row = cursor.fetchone()
-            amount = row[0] if row and row[0] is not None else 0
-
-            # Insert payment record (status N, due in 7 days)
-            due_date = date.today() + timedelta(days=7)
-            cursor.execute(
+            cursor.executemany(
                 """
                 INSERT INTO main_paymentstatus
                 (payment_id, payment_status_yn, payment_due_date,
                  payment_amount, reservation_id)
                 VALUES (:1, 'N', :2, :3, :4)
                 """,
-                [payment_id, due_date, amount, reservation_id],
+                payment_rows,
             )
 
-            passenger_records.append((passenger_id, f"{first_name} {last_name}"))
-            reservation_records.append((reservation_id, seat_id, passenger_id))
-            payment_records.append((payment_id, amount))
+            # Seats booked per flight and class, in the same transaction; a
+            # class the counters say is full refuses the whole booking
+            booked = {}
+            for leg_flight_id, seat_ids in legs:
+                seat_map = seat_inventory.get_seat_map(leg_flight_id)
+                for seat_id in seat_ids:
+                    key = (leg_flight_id, seat_map.class_id_for(seat_id))
+                    booked[key] = booked.get(key, 0) + 1
+            sold_out = flight_summary.add_booked(cursor, booked)
+            if sold_out:
+                conn.rollback()
+                cursor.close()
+                error_message = (
+                    f"Sorry, {' and '.join(db.reference.class_name(class_id, class_id) for _, class_id in sold_out)} "
+                    f"on flight {sold_out[0][0]} just sold out. "
+                    f"Please choose a different class or flight."
+                )
+                return retry(error_message, 409)
+
+            conn.commit()
+        except db.IntegrityError:
+            # Lost the race on the active-reservation unique index
+            conn.rollback()
+            cursor.close()
+            for leg_flight_id, _ in legs:
+                seat_inventory.invalidate(leg_flight_id)
+            error_message = (
+                "Sorry, one of your seats was just taken. "
+                "Please choose different seats."
+            )
+            return retry(error_message, 409)
 
-        conn.commit()
         cursor.close()
-        conn.close()
+
+        # Flip the committed seats in the in-memory seat maps (the version
+        # bump sends searches back to the counters); they are booked now,
+        # so the holds on them go
+        for leg_flight_id, seat_ids in legs:
+            seat_inventory.mark_booked(leg_flight_id, seat_ids)
+            seat_holds.holds.release(session, leg_flight_id)
 
         # Use the first passenger/reservation/payment for confirmation display
+        # (reservations go outbound, return for each passenger in turn)
         primary_passenger_name = passenger_records[0][1] if passenger_records else "N/A"
         primary_reservation_id = reservation_records[0][0] if reservation_records else "N/A"
         primary_seat_id = reservation_records[0][1] if reservation_records else "N/A"
         primary_payment_id = payment_records[0][0] if payment_records else "N/A"
         primary_amount = payment_records[0][1] if payment_records else 0
 
+        return_leg = None
+        if return_flight_id:
+            return_leg = {
+                "flight_id": return_flight_id,
+                "seat_id": reservation_records[1][1],
+                "reservation_id": reservation_records[1][0],
+                "payment_id": payment_records[1][0],
+                "amount": payment_records[1][1],
+            }
+
         return render_template(
             "booking_confirmation.html",
             flight_id=flight_id,
@@ -353,70 +621,60 @@ def book_flight(flight_id):
             payment_id=primary_payment_id,
             amount=primary_amount,
             passengers_count=passengers_count,
+            return_leg=return_leg,
         )
 
     # ----------------- GET: SHOW SEAT MAP -----------------
+    return _booking_page(flight_id, passengers_count, return_flight_id=return_flight_id)
+
+# ----------------- CANCEL RESERVATION -----------------
+
+@app.route("/reservations/<reservation_id>/cancel", methods=["POST"])
+def cancel_reservation(reservation_id):
     conn = get_connection()
     cursor = conn.cursor()
 
-    # Flight info for top of page
     cursor.execute(
         """
-        SELECT
-            f.flight_id,
-            sa.airport_city AS source_city,
-            da.airport_city AS destination_city,
-            TO_CHAR(f.departure_date_time, 'YYYY-MM-DD HH24:MI'),
-            TO_CHAR(f.arrival_date_time,   'YYYY-MM-DD HH24:MI'),
-            f.airplane_type
-        FROM main_flightdetails f
-        JOIN main_airport sa ON sa.airport_id = f.source_airport_id
-        JOIN main_airport da ON da.airport_id = f.destination_airport_id
-        WHERE f.flight_id = :1
+        SELECT r.seat_id, s.flight_id, s.travel_class_id, r.status
+        FROM main_reservation r
+        JOIN main_seatdetails s ON s.seat_id = r.seat_id
+        WHERE r.reservation_id = :1
         """,
-        [flight_id],
+        [reservation_id],
     )
-    flight = cursor.fetchone()
+    row = cursor.fetchone()
+    if row is None:
+        cursor.close()
+        return jsonify({"error": "reservation not found"}), 404
+    seat_id, flight_id, class_id, status = row
 
-    # Seats + whether they are already booked
+    # Conditional on status so two cancels of one reservation only count once
     cursor.execute(
         """
-        SELECT
-            s.seat_id,
-            tc.name AS class_name,
-            fc.cost,
-            CASE
-                WHEN COUNT(r.reservation_id) > 0 THEN 1
-                ELSE 0
-            END AS is_booked
-        FROM main_seatdetails s
-        JOIN main_travelclass tc
-            ON tc.travel_class_id = s.travel_class_id
-        LEFT JOIN main_flightcost fc
-            ON fc.seat_id = s.seat_id
-        LEFT JOIN main_reservation r
-            ON r.seat_id = s.seat_id
-        WHERE s.flight_id = :1
-        GROUP BY
-            s.seat_id,
-            tc.name,
-            fc.cost
-        ORDER BY s.seat_id
+        UPDATE main_reservation
+        SET status = 'C'
+        WHERE reservation_id = :1
+          AND status = 'A'
         """,
-        [flight_id],
+        [reservation_id],
     )
-    seats = cursor.fetchall()
+    if cursor.rowcount != 1:
+        conn.rollback()
+        cursor.close()
+        return jsonify({"error": "reservation is already cancelled"}), 409
 
+    # Refused only if the counter is already at 0 (summary out of step);
+    # the cancellation stands either way
+    flight_summary.add_booked(cursor, {(flight_id, class_id): -1})
+    conn.commit()
     cursor.close()
-    conn.close()
 
-    return render_template(
-        "booking.html",
-        flight=flight,
-        seats=seats,
-        passengers=passengers_count,
-    )
+    # Seat is free again in the in-memory seat map (and, through the
+    # version bump, in search results)
+    seat_inventory.release(flight_id, [seat_id])
 
+    return jsonify({"reservation_id": reservation_id, "seat_id": seat_id, "status": "C"})
 
 if __name__ == "__main__":
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,361 @@
+"""Asyncio JSON API for flight search and seat availability.
+
+Serves the same GET /flights/search, /flights/<id>/seats and
+/flights/<id>/seat-map endpoints as routes/flights.py and routes/seats.py
+(same parameters, paging cursors, ETags and ndjson streaming) as a plain
+ASGI application. A request only holds a pooled connection (async_db.py)
+while its query runs and waits on the event loop instead of a worker
+thread, so one process can keep thousands of searches in flight against
+a pool of a few dozen sessions.
+
+Run from backend/ with any ASGI server, next to the Flask app and on the
+same SHARED_INVENTORY segment, e.g.
+
+    SHARED_INVENTORY=/dev/shm/railway-inventory uvicorn asgi:app --workers 4
+
+Booking, seat holds (seat_holds.py, so these seat endpoints do not
+mark held seats) and the HTML pages stay on the Flask app (app.py), in
+other processes. This app only learns of their bookings through the
+shared segment (seat bits, and the versions behind its ETags and search
+counters), so it refuses to start without one.
+"""
+import asyncio
+import json
+import logging
+import re
+from functools import wraps
+from itertools import islice
+from urllib.parse import parse_qsl
+
+from werkzeug.datastructures import MultiDict
+from werkzeug.http import http_date, parse_etags, quote_etag
+
+import async_db
+import db
+import flight_summary
+import inventory_version
+import search_index
+import seat_inventory
+import shared_inventory
+import sql_metrics
+from routes.flights import (
+    SORT_KEY_TYPES, SearchError, index_rows, search_criteria, search_query, search_row, sort_key,
+)
+from routes.paging import STREAM_ARRAYSIZE, PageError, encode_cursor, page_args
+from routes.seats import SEAT_KEY_TYPES, class_seats_left, seat_key, seat_rows
+
+log = logging.getLogger(__name__)
+
+if shared_inventory.segment is None:
+    raise RuntimeError("asgi.py needs SHARED_INVENTORY (the segment app.py books through); "
+                       "without it seat maps, search counters and ETags go stale")
+
+# ----------------- RESPONSES -----------------
+
+def _json(obj):
+    # Compact and key-sorted, like Flask's jsonify
+    return json.dumps(obj, default=str, separators=(",", ":"), sort_keys=True).encode()
+
+
+async def _respond(send, status, body=b"", content_type="application/json", headers=()):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", content_type.encode()),
+            (b"content-length", str(len(body)).encode()),
+            *headers,
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _error(send, status, message):
+    await _respond(send, status, _json({"error": message}))
+
+
+async def _json_page(send, items, limit, key, headers):
+    # items may hold one extra row (limit + 1) to tell whether more exist
+    headers = list(headers)
+    if limit is not None and len(items) > limit:
+        items = items[:limit]
+        headers.append((b"x-next-cursor", encode_cursor(key(items[-1])).encode()))
+    await _respond(send, 200, _json(items), headers=headers)
+
+
+async def _ndjson(send, rows, headers):
+    # One JSON object per line, one body chunk per batch of rows
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"application/x-ndjson"), *headers],
+    })
+    batch = []
+    async for row in rows:
+        batch.append(json.dumps(row, default=str) + "\n")
+        if len(batch) >= STREAM_ARRAYSIZE:
+            await send({"type": "http.response.body", "body": "".join(batch).encode(), "more_body": True})
+            batch = []
+    await send({"type": "http.response.body", "body": "".join(batch).encode()})
+
+
+# ----------------- ROW SOURCES -----------------
+
+async def _iterate(rows):
+    # Plain iterable (index or seat-map rows) as an async one
+    for row in rows:
+        yield row
+
+
+async def _limited(rows, limit):
+    # First `limit` rows (all if None), then stop reading the source
+    served = 0
+    try:
+        async for row in rows:
+            if limit and served >= limit:
+                break
+            yield row
+            served += 1
+    finally:
+        await rows.aclose()
+
+
+async def _take(rows, n):
+    return [row async for row in _limited(rows, n)]
+
+
+async def _fresh_seats(records):
+    # search_index.fresh_seats() over an async_db connection: re-read the
+    # counters of the flights booked or cancelled since they were read
+    versions = search_index.index.stale_seats(records)
+    if not versions:
+        return
+    async with async_db.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            await cursor.execute(*search_index.seats_query(list(versions)))
+            rows = await cursor.fetchall()
+        finally:
+            cursor.close()
+    search_index.index.set_seats(versions, rows)
+
+
+async def _search_rows_sql(source, destination, start_day, end_day, after, limit):
+    if flight_summary.stale():
+        await asyncio.to_thread(flight_summary.ensure_current, db.acquire)
+    async with async_db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.arraysize = STREAM_ARRAYSIZE
+        # One round trip for a whole page (+1 row to see if there is another)
+        cursor.prefetchrows = limit + 1 if limit else STREAM_ARRAYSIZE
+        try:
+            await cursor.execute(*search_query(source, destination, start_day, end_day, after))
+            while True:
+                rows = await cursor.fetchmany(STREAM_ARRAYSIZE)
+                if not rows:
+                    break
+                for row in rows:
+                    yield search_row(row)
+        finally:
+            cursor.close()
+
+
+# ----------------- CONDITIONAL GET -----------------
+
+def _not_modified(headers, etag):
+    # Same rule as inventory_version.not_modified, on raw ASGI headers
+    if_none_match = headers.get(b"if-none-match")
+    return if_none_match is not None and parse_etags(if_none_match.decode("latin-1")).contains_weak(etag)
+
+
+def conditional(version_for):
+    # Handler decorator: version read *before* the handler runs, like
+    # inventory_version.conditional
+    def decorator(handler):
+        @wraps(handler)
+        async def wrapper(send, args, headers, **params):
+            etag, last_modified = version_for(**params)
+            tags = [
+                (b"etag", quote_etag(etag, weak=True).encode()),
+                (b"last-modified", http_date(last_modified).encode()),
+                (b"cache-control", b"no-cache"),
+            ]
+            if _not_modified(headers, etag):
+                return await _respond(send, 304, headers=tags)
+            return await handler(send, args, tags, **params)
+        return wrapper
+    return decorator
+
+
+# ----------------- ENDPOINTS -----------------
+
+@conditional(inventory_version.search_etag)
+async def search_flights(send, args, tags):
+    try:
+        source, destination, start_day, end_day = search_criteria(args)
+        limit, after, stream = page_args(SORT_KEY_TYPES, args)
+    except (SearchError, PageError) as exc:
+        return await _error(send, 400, str(exc))
+
+    if search_index.is_ready():
+        records = search_index.index.flights(source, destination, start_day, end_day)
+        await _fresh_seats(records)
+        rows = _iterate(index_rows(search_index.fare_rows(records), after))
+    else:
+        rows = _search_rows_sql(source, destination, start_day, end_day, after, limit)
+
+    if stream:
+        return await _ndjson(send, _limited(rows, limit), tags)
+    items = await _take(rows, limit + 1 if limit else None)
+    await _json_page(send, items, limit, sort_key, tags)
+
+
+@conditional(inventory_version.flight_etag)
+async def get_seats(send, args, tags, flight_id):
+    try:
+        limit, after, stream = page_args(SEAT_KEY_TYPES, args)
+    except PageError as exc:
+        return await _error(send, 400, str(exc))
+
+    seat_map = await seat_inventory.get_seat_map_async(async_db.connection, flight_id)
+    seats = seat_rows(seat_map, after)
+
+    if stream:
+        return await _ndjson(send, _iterate(islice(seats, limit) if limit else seats), tags)
+    page = list(islice(seats, limit + 1) if limit else seats)
+    await _json_page(send, page, limit, seat_key, tags)
+
+
+@conditional(inventory_version.flight_etag)
+async def get_seat_map(send, args, tags, flight_id):
+    seat_map = await seat_inventory.get_seat_map_async(async_db.connection, flight_id)
+    if not len(seat_map):
+        return await _error(send, 404, "unknown flight")
+
+    async with async_db.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            await cursor.execute(flight_summary.SEATS_LEFT_QUERY, [flight_id])
+            counts = dict(await cursor.fetchall())
+        finally:
+            cursor.close()
+    body = dict(seat_map.compact(), seats_left=class_seats_left(counts))
+    await _respond(send, 200, _json(body), headers=tags)
+
+
+async def metrics(send, args, headers):
+    await _respond(send, 200, sql_metrics.render().encode(), "text/plain; version=0.0.4")
+
+
+async def stats_pool(send, args, headers):
+    await _respond(send, 200, _json(async_db.pool_stats()))
+
+
+async def stats_inventory(send, args, headers):
+    await _respond(send, 200, _json(seat_inventory.stats()))
+
+
+ROUTES = [
+    (re.compile(r"^/flights/search$"), search_flights),
+    (re.compile(r"^/flights/(?P<flight_id>[^/]+)/seats$"), get_seats),
+    (re.compile(r"^/flights/(?P<flight_id>[^/]+)/seat-map$"), get_seat_map),
+    (re.compile(r"^/metrics$"), metrics),
+    (re.compile(r"^/stats/pool$"), stats_pool),
+    (re.compile(r"^/stats/inventory$"), stats_inventory),
+]
+
+
+# ----------------- ASGI -----------------
+
+_refresher = None
+
+
+async def _refresh_reference():
+    # The reference cache loads synchronously; reload it on a thread well
+    # before the TTL so a request never has to
+    while True:
+        await asyncio.sleep(db.reference.ttl / 2)
+        try:
+            await asyncio.to_thread(db.reference.refresh)
+        except db.DatabaseError as exc:
+            log.warning("Reference data not refreshed: %s", exc)
+
+
+async def _startup():
+    # Warm the reference cache, bring the flight class summary up to date
+    # and load the search index (like the init_app hooks in app.py); all
+    # three are sync database work, so they run on a thread before
+    # serving starts.
+    global _refresher
+    await asyncio.to_thread(db.reference.refresh)
+    _refresher = asyncio.ensure_future(_refresh_reference())
+    try:
+        await asyncio.to_thread(flight_summary.ensure_current, db.acquire)
+    except db.DatabaseError as exc:
+        log.warning("Flight class summary not checked: %s", exc)
+
+    if not search_index.ENABLED:
+        return
+
+    def load():
+        conn = db.acquire()
+        try:
+            return search_index.index.load(conn)
+        finally:
+            conn.close()
+
+    try:
+        count = await asyncio.to_thread(load)
+        log.info("Search index loaded with %d flights", count)
+    except db.DatabaseError as exc:
+        log.warning("Search index not loaded, falling back to SQL: %s", exc)
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await _startup()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            if _refresher is not None:
+                _refresher.cancel()
+            await async_db.close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+
+    for pattern, handler in ROUTES:
+        match = pattern.match(scope["path"])
+        if match:
+            break
+    else:
+        return await _error(send, 404, "not found")
+
+    if scope["method"] not in ("GET", "HEAD"):
+        return await _error(send, 405, "method not allowed")
+
+    args = MultiDict(parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True))
+    headers = dict(scope["headers"])
+
+    started = False
+
+    async def tracked_send(message):
+        nonlocal started
+        started = started or message["type"] == "http.response.start"
+        await send(message)
+
+    try:
+        with sql_metrics.request_scope():
+            await handler(tracked_send, args, headers, **match.groupdict())
+    except async_db.DatabaseError:
+        log.exception("database error on %s", scope["path"])
+        if started:
+            raise   # mid-stream: let the server drop the connection
+        await _error(send, 503, "database unavailable")
@@ -0,0 +1,248 @@
+"""Fingerprinted, precompressed static assets.
+
+The site pages pull a dozen jQuery plugins and stylesheets from
+main/static one request at a time, with default cache headers. The build
+step turns each {% call bundle('site.css') %} ... {% endcall %} block of
+tags in the templates into one concatenated, minified file, names every
+output after a hash of its content, writes a .gz sibling for text assets
+and records the names in a manifest:
+
+    python assets.py            # -> main/static/build/ + manifest.json
+
+init_app() then makes the templates use the manifest: bundle() emits one
+tag for the built file and url_for('static', ...) resolves to the
+fingerprinted copy of a file. Anything under build/ is served with a
+one-year immutable Cache-Control and, for clients that accept gzip, from
+its precompressed sibling. Without a manifest (development) bundle()
+emits the original tags and static files are served as before.
+
+Images and fonts referenced from the bundled CSS are fingerprinted too
+and the url(...)s rewritten, so the bundles can be cached forever. JS is
+minified with rjsmin when it is installed (most of it ships .min
+already); CSS always is, with a small comment and whitespace stripper.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+
+from flask import request, send_from_directory, url_for
+from markupsafe import Markup, escape
+
+try:
+    import rjsmin
+except ImportError:   # optional: JS bundles are then only concatenated
+    rjsmin = None
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main")
+STATIC_DIR = os.path.join(ROOT, "static")
+TEMPLATE_DIR = os.path.join(ROOT, "templates")
+BUILD = "build"     # under STATIC_DIR; everything in it is content-addressed
+MANIFEST = os.path.join(STATIC_DIR, BUILD, "manifest.json")
+
+# Worth a .gz sibling (fonts in woff/woff2 and images are compressed already)
+COMPRESSIBLE = (".css", ".js", ".svg", ".ttf", ".eot", ".json")
+
+ONE_YEAR = 365 * 24 * 60 * 60
+
+_BUNDLE_BLOCK = re.compile(
+    r"{%-?\s*call\s+bundle\(\s*'([^']+)'\s*\)\s*-?%}(.*?){%-?\s*endcall\s*-?%}", re.S)
+_STATIC_REF = re.compile(r"url_for\(\s*'static'\s*,\s*filename\s*=\s*'([^']+)'\s*\)")
+_CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+_CSS_COMMENT = re.compile(r"/\*.*?\*/", re.S)
+_CSS_SPACE = re.compile(r"\s+")
+_CSS_PUNCT = re.compile(r"\s*([{};,>])\s*")
+
+
+# ----------------- BUILD -----------------
+
+def find_bundles(template_dir=TEMPLATE_DIR):
+    # {bundle name: [static files in tag order]}; a name used by several
+    # templates must list the same files everywhere
+    bundles = {}
+    for name in sorted(os.listdir(template_dir)):
+        if not name.endswith(".html"):
+            continue
+        with open(os.path.join(template_dir, name), encoding="utf-8") as f:
+            text = f.read()
+        for bundle, body in _BUNDLE_BLOCK.findall(text):
+            files = _STATIC_REF.findall(body)
+            if bundles.setdefault(bundle, files) != files:
+                raise ValueError(f"{name}: bundle {bundle!r} lists different files than another template")
+    return bundles
+
+
+def _hashed(path, content):
+    # "css/site.css" -> "build/css/site.3f2a9c1b.css"
+    stem, ext = posixpath.splitext(path)
+    return posixpath.join(BUILD, f"{stem}.{hashlib.sha256(content).hexdigest()[:12]}{ext}")
+
+
+def minify_css(text):
+    text = _CSS_COMMENT.sub("", text)
+    text = _CSS_SPACE.sub(" ", text)
+    return _CSS_PUNCT.sub(r"\1", text).replace(";}", "}").strip()
+
+
+def minify_js(text):
+    return rjsmin.jsmin(text) if rjsmin else text
+
+
+class _Builder:
+
+    def __init__(self, static_dir):
+        self.static_dir = static_dir
+        self.files = {}   # source path -> fingerprinted path, both relative to static/
+
+    def _write(self, path, content):
+        target = os.path.join(self.static_dir, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "wb") as f:
+            f.write(content)
+        if path.endswith(COMPRESSIBLE):
+            packed = gzip.compress(content, 9, mtime=0)
+            if len(packed) < len(content):
+                with open(target + ".gz", "wb") as f:
+                    f.write(packed)
+
+    def file(self, path):
+        # Fingerprinted copy of one static file
+        if path not in self.files:
+            with open(os.path.join(self.static_dir, path), "rb") as f:
+                content = f.read()
+            self.files[path] = _hashed(path, content)
+            self._write(self.files[path], content)
+        return self.files[path]
+
+    def _rewrite_urls(self, css, source):
+        # url(...) in a source stylesheet, made relative to where the
+        # bundle ends up and pointed at fingerprinted copies
+        source_dir = posixpath.dirname(source)
+
+        def rewrite(match):
+            quote, ref = match.groups()
+            if re.match(r"(?:[a-z]+:|/|#)", ref, re.I):
+                return match.group(0)   # data:, absolute and fragment urls
+            path, sep, suffix = ref, "", ""
+            split = re.search(r"[?#]", ref)
+            if split:   # icon fonts carry ?v=... and #iefix suffixes
+                path, sep, suffix = ref[:split.start()], ref[split.start()], ref[split.start() + 1:]
+            target = posixpath.normpath(posixpath.join(source_dir, path))
+            if not os.path.isfile(os.path.join(self.static_dir, target)):
+                return match.group(0)
+            built = posixpath.relpath(self.file(target), BUILD + "/css")
+            return f"url({quote}{built}{sep}{suffix}{quote})"
+        return _CSS_URL.sub(rewrite, css)
+
+    def bundle(self, name, sources):
+        kind = posixpath.splitext(name)[1]
+        parts = []
+        for source in sources:
+            with open(os.path.join(self.static_dir, source), encoding="utf-8") as f:
+                text = f.read()
+            if kind == ".css":
+                parts.append(minify_css(self._rewrite_urls(text, source)))
+            else:
+                parts.append(minify_js(text))
+        # ";" keeps one script's missing trailing semicolon from running
+        # into the next
+        content = ("\n" if kind == ".css" else "\n;\n").join(parts).encode()
+        path = _hashed(posixpath.join(kind[1:], name), content)
+        self._write(path, content)
+        return path
+
+
+def build(static_dir=STATIC_DIR, template_dir=TEMPLATE_DIR, manifest=MANIFEST):
+    # Rebuild build/ from scratch; -> the manifest dict
+    shutil.rmtree(os.path.join(static_dir, BUILD), ignore_errors=True)
+    builder = _Builder(static_dir)
+    bundles = {name: builder.bundle(name, sources) for name, sources in find_bundles(template_dir).items()}
+
+    # Every other static file a template names directly
+    for name in sorted(os.listdir(template_dir)):
+        if name.endswith(".html"):
+            with open(os.path.join(template_dir, name), encoding="utf-8") as f:
+                for path in _STATIC_REF.findall(_BUNDLE_BLOCK.sub("", f.read())):
+                    if os.path.isfile(os.path.join(static_dir, path)):
+                        builder.file(path)
+
+    result = {"bundles": bundles, "files": builder.files}
+    os.makedirs(os.path.dirname(manifest), exist_ok=True)
+    with open(manifest, "w") as f:
+        json.dump(result, f, indent=1, sort_keys=True)
+    return result
+
+
+# ----------------- SERVING -----------------
+
+def _load(manifest=MANIFEST):
+    try:
+        with open(manifest) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def init_app(app, manifest=MANIFEST):
+    built = _load(manifest)
+    static_view = app.view_functions["static"]
+
+    def bundle(name, caller):
+        # One tag for the built bundle, or the original tags in development
+        path = built["bundles"].get(name) if built else None
+        if path is None:
+            return caller()
+        href = escape(url_for("static", filename=path))
+        if name.endswith(".css"):
+            return Markup(f'<link rel="stylesheet" href="{href}">')
+        return Markup(f'<script src="{href}"></script>')
+
+    app.jinja_env.globals["bundle"] = bundle
+
+    if built:
+        @app.url_defaults
+        def fingerprint(endpoint, values):
+            if endpoint == "static":
+                values["filename"] = built["files"].get(values.get("filename"), values.get("filename"))
+
+    def static(filename):
+        if not filename.startswith(BUILD + "/"):
+            return static_view(filename=filename)
+
+        gz = "gzip" in request.accept_encodings and os.path.isfile(
+            os.path.join(app.static_folder, filename + ".gz"))
+        # Content-addressed: a new version is a new name, so cache for good
+        if gz:
+            response = send_from_directory(app.static_folder, filename + ".gz", max_age=ONE_YEAR,
+                                           mimetype=mimetypes.guess_type(filename)[0])
+            response.content_encoding = "gzip"
+        else:
+            response = send_from_directory(app.static_folder, filename, max_age=ONE_YEAR)
+        if filename.endswith(COMPRESSIBLE):
+            response.vary.add("Accept-Encoding")
+        response.cache_control.immutable = True
+        return response
+
+    app.view_functions["static"] = static
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build fingerprinted, precompressed static bundles.")
+    parser.add_argument("--static", default=STATIC_DIR, help="static directory")
+    parser.add_argument("--templates", default=TEMPLATE_DIR, help="template directory")
+    args = parser.parse_args(argv)
+
+    result = build(args.static, args.templates, os.path.join(args.static, BUILD, "manifest.json"))
+    for name, path in sorted(result["bundles"].items()):
+        size = os.path.getsize(os.path.join(args.static, path))
+        print(f"{name:12s} {path} ({size:,} bytes)")
+    print(f"{len(result['files'])} files fingerprinted")
+
+
+if __name__ == "__main__":
+    main()
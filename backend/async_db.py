@@ -0,0 +1,83 @@
+# async_db.py -- the asyncio twin of db.py, for asgi.py
+import time
+from contextlib import asynccontextmanager
+
+import config
+import sql_metrics
+
+# ----------------- DRIVER SELECTION -----------------
+# Same DB_BACKEND switch as db.py. Oracle uses oracledb's asyncio pool;
+# SQLite runs the sync driver on worker threads.
+
+if config.DB_BACKEND == "sqlite":
+    import sqlite_db as driver
+
+    async def _connect():
+        return await driver.connect_async(config.SQLITE_PATH)
+
+elif config.DB_BACKEND == "oracle":
+    import oracle as driver
+
+    async def _connect():
+        return await driver.connect_async()
+
+else:
+    raise RuntimeError(f"Unknown DB_BACKEND {config.DB_BACKEND!r} (expected 'oracle' or 'sqlite')")
+
+IntegrityError = driver.IntegrityError
+DatabaseError = driver.DatabaseError
+
+# Only touched from the event loop thread, so no lock
+_stats = {
+    "checkouts": 0,
+    "checkout_failures": 0,
+    "wait_time_total": 0.0,
+    "wait_time_max": 0.0,
+}
+
+
+async def acquire():
+    # Check a connection out of the pool, recording how long we waited.
+    # The caller must await close() on it; prefer connection() below.
+    started = time.perf_counter()
+    try:
+        conn = await _connect()
+    except driver.DatabaseError:
+        _stats["checkout_failures"] += 1
+        raise
+    waited = time.perf_counter() - started
+    sql_metrics.observe_pool_wait(waited)
+
+    _stats["checkouts"] += 1
+    _stats["wait_time_total"] += waited
+    if waited > _stats["wait_time_max"]:
+        _stats["wait_time_max"] = waited
+    return sql_metrics.wrap_async(conn)
+
+
+@asynccontextmanager
+async def connection():
+    # Hold a pooled connection only for the queries inside the block, so
+    # a request waiting on anything else never pins a session.
+    conn = await acquire()
+    try:
+        yield conn
+    except Exception:
+        # Never hand a connection with half a transaction back to the pool
+        await conn.rollback()
+        raise
+    finally:
+        await conn.close()
+
+
+async def close():
+    await driver.close_async_pool()
+
+
+def pool_stats():
+    stats = dict(_stats)
+    checkouts = stats["checkouts"]
+    stats["wait_time_avg"] = stats["wait_time_total"] / checkouts if checkouts else 0.0
+    stats["backend"] = config.DB_BACKEND
+    stats.update(driver.async_pool_counts())
+    return stats
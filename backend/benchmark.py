@@ -0,0 +1,233 @@
+"""End-to-end latency benchmark for the booking web tier.
+
+Seeds a synthetic schedule into a throwaway SQLite database, then drives
+backend/app.py through its real routes (full WSGI stack, in process) one
+endpoint at a time at the requested concurrency, and reports throughput
+and p50/p95/p99 latency per endpoint.
+
+    python benchmark.py --days 7 --flights-per-route 3 --concurrency 8
+    python benchmark.py --requests 500 --output bench.json
+
+The JSON written with --output is stable across runs with the same
+arguments, so two releases can be diffed directly.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import synthetic_data
+
+SEAT_LETTERS = ["A", "B", "C", "D", "E", "F"]
+
+ENDPOINTS = [
+    "home",
+    "search_form",
+    "search_api",
+    "seats_api",
+    "booking_page",
+    "booking_submit",
+]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    synthetic_data.add_arguments(parser)
+    parser.add_argument("--seat-rows", type=int, default=30, help="rows of 6 seats per aircraft")
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=4, help="concurrent clients")
+    parser.add_argument("--warmup", type=int, default=10, help="unmeasured requests per endpoint")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="comma-separated subset to run")
+    parser.add_argument("--db", help="SQLite file to use (default: a temp file)")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    return parser.parse_args(argv)
+
+
+# ----------------- DATASET -----------------
+
+def seed_dataset(conn, args, rng):
+    # The benchmark's dataset is synthetic_data's, with its cabin layout
+    spec = synthetic_data.DatasetSpec(
+        airports=args.airports,
+        days=args.days,
+        flights_per_route=args.flights_per_route,
+        layout=synthetic_data.Layout.from_rows(args.seat_rows),
+        fill=args.fill,
+    )
+    return synthetic_data.generate(conn, spec, rng)
+
+
+# ----------------- WORKLOAD -----------------
+
+class Workload:
+    """Builds one request per call for each endpoint, from the seeded schedule."""
+
+    def __init__(self, flights, args):
+        self.flights = flights
+        self.seat_rows = args.seat_rows
+        self._lock = threading.Lock()
+        self._rng = random.Random(args.seed)
+        self._counter = 0
+
+    def _pick(self):
+        with self._lock:
+            self._counter += 1
+            return self._rng.choice(self.flights), self._counter
+
+    def request(self, endpoint):
+        # -> (method, path, form data or None)
+        (flight_id, src, dst, departure, _, _), n = self._pick()
+        day = departure.date().isoformat()
+
+        if endpoint == "home":
+            return "GET", "/", None
+        if endpoint == "search_form":
+            return "POST", "/search_flights", {
+                "departure_city": src, "arrival_city": dst, "departure_date": day,
+                "travel_class": "ECO", "passengers": "1", "trip_type": "one_way",
+            }
+        if endpoint == "search_api":
+            return "GET", f"/flights/search?source={src}&destination={dst}&date={day}", None
+        if endpoint == "seats_api":
+            return "GET", f"/flights/{flight_id}/seats", None
+        if endpoint == "booking_page":
+            return "GET", f"/book/{flight_id}?passengers=1", None
+        if endpoint == "booking_submit":
+            with self._lock:
+                seat = f"{flight_id}-{self._rng.randint(1, self.seat_rows)}{self._rng.choice(SEAT_LETTERS)}"
+            return "POST", f"/book/{flight_id}", {
+                "passengers": "1", "seat_ids": seat,
+                "first_name_1": "Bench", "last_name_1": f"Run{n}", "email_1": "bench@example.com",
+                "phone_number_1": "0300", "address_1": "Street", "city_1": "Karachi",
+                "state_1": "Sindh", "zipcode_1": "75300", "country_1": "Pakistan",
+            }
+        raise ValueError(f"unknown endpoint {endpoint!r}")
+
+
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def run_endpoint(app, workload, endpoint, args):
+    local = threading.local()
+
+    def one(_):
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = app.test_client()
+        method, path, data = workload.request(endpoint)
+        started = time.perf_counter()
+        response = client.open(path, method=method, data=data)
+        elapsed = time.perf_counter() - started
+        return elapsed, response.status_code
+
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        list(pool.map(one, range(args.warmup)))
+
+        started = time.perf_counter()
+        results = list(pool.map(one, range(args.requests)))
+        wall = time.perf_counter() - started
+
+    latencies = sorted(r[0] * 1000.0 for r in results)
+    statuses = {}
+    for _, status in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    errors = sum(count for status, count in statuses.items() if status.startswith("5"))
+
+    return {
+        "requests": len(results),
+        "errors": errors,
+        "statuses": dict(sorted(statuses.items())),
+        "throughput_rps": round(len(results) / wall, 2) if wall else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "max_ms": round(latencies[-1], 3),
+    }
+
+
+def print_report(report):
+    print(f"\nDataset: {report['dataset']}")
+    print(f"Concurrency: {report['params']['concurrency']}, "
+          f"requests/endpoint: {report['params']['requests']}\n")
+    header = f"{'endpoint':<16}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}  statuses"
+    print(header)
+    print("-" * len(header))
+    for name, r in report["endpoints"].items():
+        print(f"{name:<16}{r['throughput_rps']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}"
+              f"{r['p99_ms']:>10}{r['errors']:>8}  {r['statuses']}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        sys.exit(f"Unknown endpoint(s): {', '.join(sorted(unknown))}")
+
+    # Point the backend at a fresh SQLite file *before* importing it:
+    # config reads the environment at import time.
+    tmpdir = None
+    if args.db:
+        db_path = args.db
+    else:
+        tmpdir = tempfile.mkdtemp(prefix="flight-bench-")
+        db_path = os.path.join(tmpdir, "bench.sqlite3")
+    os.environ["DB_BACKEND"] = "sqlite"
+    os.environ["SQLITE_PATH"] = db_path
+
+    import db
+
+    rng = random.Random(args.seed)
+    conn = db.get_connection()
+    print("Seeding benchmark dataset...")
+    started = time.perf_counter()
+    dataset, flights = seed_dataset(conn, args, rng)
+    conn.close()
+    dataset["seed_seconds"] = round(time.perf_counter() - started, 2)
+
+    from app import app   # loads the search index from the seeded data
+
+    workload = Workload(flights, args)
+    results = {}
+    for endpoint in endpoints:
+        print(f"Running {endpoint}...")
+        results[endpoint] = run_endpoint(app, workload, endpoint, args)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": "sqlite",
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+        },
+        "params": {k: v for k, v in vars(args).items() if k not in ("output", "db")},
+        "dataset": dataset,
+        "endpoints": results,
+    }
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2, sort_keys=True)
+        print(f"\nWrote {args.output}")
+
+    if tmpdir:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
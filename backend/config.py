@@ -0,0 +1,34 @@
+# config.py
+import os
+
+# Which storage driver get_connection() hands out: "oracle" or "sqlite"
+DB_BACKEND = os.environ.get("DB_BACKEND", "oracle").lower()
+
+# ----------------- ORACLE -----------------
+# Defaults match the local XE setup; override with environment variables.
+
+ORACLE_USER = os.environ.get("ORACLE_USER", "flight_app_user")
+ORACLE_PASSWORD = os.environ.get("ORACLE_PASSWORD", "flight123")
+ORACLE_DSN = os.environ.get("ORACLE_DSN", "localhost:1521/XEPDB1")
+
+POOL_MIN = int(os.environ.get("ORACLE_POOL_MIN", "2"))
+POOL_MAX = int(os.environ.get("ORACLE_POOL_MAX", "10"))
+POOL_INCREMENT = int(os.environ.get("ORACLE_POOL_INCREMENT", "1"))
+STMT_CACHE_SIZE = int(os.environ.get("ORACLE_STMT_CACHE_SIZE", "40"))
+# Connections idle longer than this (seconds) are pinged when checked out,
+# so a dead session is replaced instead of failing the request.
+PING_INTERVAL = int(os.environ.get("ORACLE_PING_INTERVAL", "60"))
+# How long (seconds) a request waits for a free connection before failing.
+POOL_WAIT_TIMEOUT = int(os.environ.get("ORACLE_POOL_WAIT_TIMEOUT", "5"))
+# Sessions in the asyncio pool used by asgi.py. Thousands of concurrent
+# requests share these; a request only holds one while a query runs.
+ASYNC_POOL_MAX = int(os.environ.get("ORACLE_ASYNC_POOL_MAX", "20"))
+
+# ----------------- SQLITE -----------------
+# File is created (and the schema migrated from main/models.py) on first use.
+# Use ":memory:" for a throwaway database shared by the whole process.
+
+SQLITE_PATH = os.environ.get(
+    "SQLITE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "flights.sqlite3"),
+)
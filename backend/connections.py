@@ -0,0 +1,128 @@
+"""Multi-leg (connecting) itineraries over the in-memory schedule.
+
+The search index already holds every flight, grouped by origin and
+sorted by departure; read as a time-expanded graph, each flight is an
+edge from (source, departure) to (destination, arrival), and a
+connection is any flight out of the arrival airport that leaves at least
+min_connection later. A best-first search over partial itineraries then
+returns the cheapest (or earliest-arriving) ones first, without the SQL
+self-join a multi-leg query would need. The graph follows the index, so
+flights added through search_index.refresh_flights() are searchable at
+once.
+"""
+import heapq
+from datetime import datetime, timedelta
+from itertools import count
+
+import search_index
+
+CHEAPEST = "cheapest"
+EARLIEST = "earliest"
+SORT_ORDERS = (CHEAPEST, EARLIEST)
+
+# Most connections a caller may ask for (3 legs)
+MAX_CONNECTIONS = 2
+DEFAULT_MIN_CONNECTION = timedelta(minutes=45)
+
+# A connecting flight must leave within this long of landing
+MAX_LAYOVER = timedelta(hours=12)
+
+DEFAULT_RESULTS = 10
+MAX_RESULTS = 50
+
+# Partial itineraries popped per search before giving up -- keeps one
+# request bounded however dense the network gets
+MAX_EXPANSIONS = 20000
+
+
+class Itinerary:
+    __slots__ = ("legs", "total_fare")
+
+    def __init__(self, legs, total_fare):
+        self.legs = legs                 # ((FlightRecord, class_name, fare), ...)
+        self.total_fare = total_fare
+
+    @property
+    def departure(self):
+        return self.legs[0][0].departure
+
+    @property
+    def arrival(self):
+        return self.legs[-1][0].arrival
+
+    @property
+    def connections(self):
+        return len(self.legs) - 1
+
+
+def _fare(record, travel_class):
+    # (class_name, fare) to quote for this flight: the named class, or the
+    # cheapest one when no class was asked for. None if not sold.
+    if travel_class is None:
+        return record.fares[0] if record.fares else None
+    for class_name, fare in record.fares:
+        if class_name == travel_class:
+            return class_name, fare
+    return None
+
+
+def search(source, destination, day, max_connections=1,
+           min_connection=DEFAULT_MIN_CONNECTION, sort=CHEAPEST,
+           travel_class=None, k=DEFAULT_RESULTS):
+    # Up to k itineraries from source (leaving on day) to destination with
+    # at most max_connections stops, best first by sort order. Needs the
+    # search index to be loaded.
+    index = search_index.index
+    max_connections = min(max_connections, MAX_CONNECTIONS)
+
+    # Both orders only grow as an itinerary is extended (fares are >= 0
+    # and every leg lands later), so the first complete itineraries popped
+    # are the best ones.
+    if sort == EARLIEST:
+        def priority(total, record):
+            return (record.arrival, total)
+    else:
+        def priority(total, record):
+            return (total, record.arrival)
+
+    heap = []
+    tie = count()   # never compare the legs tuples themselves
+
+    def push(legs, total):
+        heapq.heappush(heap, (priority(total, legs[-1][0]), next(tie), legs, total))
+
+    start = datetime.combine(day, datetime.min.time())
+    for record in index.departures(source, start, start + timedelta(days=1)):
+        fare = _fare(record, travel_class)
+        if fare is not None and (max_connections or record.destination == destination):
+            push(((record,) + fare,), fare[1])
+
+    results = []
+    expansions = 0
+    while heap and len(results) < k and expansions < MAX_EXPANSIONS:
+        _, _, legs, total = heapq.heappop(heap)
+        expansions += 1
+
+        last = legs[-1][0]
+        if last.destination == destination:
+            results.append(Itinerary(legs, total))
+            continue
+
+        # Never revisit an airport; on the last allowed leg only a flight
+        # straight to the destination is worth queuing
+        visited = {source}
+        visited.update(leg[0].destination for leg in legs)
+        final_leg = len(legs) == max_connections
+
+        for record in index.departures(last.destination,
+                                       last.arrival + min_connection,
+                                       last.arrival + MAX_LAYOVER):
+            if final_leg and record.destination != destination:
+                continue
+            if record.destination in visited:
+                continue
+            fare = _fare(record, travel_class)
+            if fare is not None:
+                push(legs + ((record,) + fare,), total + fare[1])
+
+    return results
@@ -0,0 +1,104 @@
+# db.py
+import threading
+import time
+
+from flask import g, has_app_context
+
+import config
+import reference_data
+import sql_metrics
+
+# ----------------- DRIVER SELECTION -----------------
+# Both drivers expose connect(), pool_counts(), IntegrityError and
+# DatabaseError; everything else in the backend only talks to this module.
+
+if config.DB_BACKEND == "sqlite":
+    import sqlite_db as driver
+
+    def _connect():
+        return driver.connect(config.SQLITE_PATH)
+
+elif config.DB_BACKEND == "oracle":
+    import oracle as driver
+
+    def _connect():
+        return driver.connect()
+
+else:
+    raise RuntimeError(f"Unknown DB_BACKEND {config.DB_BACKEND!r} (expected 'oracle' or 'sqlite')")
+
+IntegrityError = driver.IntegrityError
+DatabaseError = driver.DatabaseError
+
+_stats_lock = threading.Lock()
+_stats = {
+    "checkouts": 0,
+    "checkout_failures": 0,
+    "wait_time_total": 0.0,
+    "wait_time_max": 0.0,
+}
+
+
+def acquire():
+    # Check a connection out of the driver, recording how long we waited.
+    started = time.perf_counter()
+    try:
+        conn = _connect()
+    except driver.DatabaseError:
+        with _stats_lock:
+            _stats["checkout_failures"] += 1
+        raise
+    waited = time.perf_counter() - started
+    sql_metrics.observe_pool_wait(waited)
+
+    with _stats_lock:
+        _stats["checkouts"] += 1
+        _stats["wait_time_total"] += waited
+        if waited > _stats["wait_time_max"]:
+            _stats["wait_time_max"] = waited
+    # Every statement on this connection is timed for /metrics
+    return sql_metrics.wrap(conn)
+
+
+# Airports, travel classes and services, shared by every request
+reference = reference_data.ReferenceCache(acquire)
+
+
+def get_connection():
+    # Inside a Flask request every caller shares one connection, which is
+    # released by release_connection() on teardown.
+    # Outside an app context (scripts like seed_db.py) the caller owns the
+    # connection and must close() it.
+    if not has_app_context():
+        return acquire()
+
+    if "db_conn" not in g:
+        g.db_conn = acquire()
+    return g.db_conn
+
+
+def release_connection(exc=None):
+    conn = g.pop("db_conn", None)
+    if conn is None:
+        return
+    try:
+        # Never hand a connection with half a transaction back to the pool
+        if exc is not None:
+            conn.rollback()
+    finally:
+        conn.close()
+
+
+def init_app(app):
+    app.teardown_appcontext(release_connection)
+
+
+def pool_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+
+    checkouts = stats["checkouts"]
+    stats["wait_time_avg"] = stats["wait_time_total"] / checkouts if checkouts else 0.0
+    stats["backend"] = config.DB_BACKEND
+    stats.update(driver.pool_counts())
+    return stats
@@ -0,0 +1,112 @@
+"""Date-aware fare resolution.
+
+main_flightcost holds one row per seat per validity period. A seat's
+periods are kept here as sorted interval lists, so the fare valid on a
+given day is a bisect rather than a scan over every historic row; a
+travel class's lowest fare is precomputed the same way, as a step
+function over the union of its seats' periods.
+
+Which day a fare has to be valid on is set by FARE_DATE: "booking"
+(today -- validity is a sales window) or "departure" (the flight's
+departure date -- validity is a travel window).
+"""
+import os
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+
+BOOKING = "booking"
+DEPARTURE = "departure"
+
+FARE_DATE = os.environ.get("FARE_DATE", BOOKING).lower()
+if FARE_DATE not in (BOOKING, DEPARTURE):
+    raise RuntimeError(f"Unknown FARE_DATE {FARE_DATE!r} (expected 'booking' or 'departure')")
+
+_ONE_DAY = timedelta(days=1)
+
+
+def quote_day(departure):
+    # The day a fare for a flight departing at `departure` must be valid on
+    if FARE_DATE == DEPARTURE:
+        return departure.date()
+    return date.today()
+
+
+def sql_valid_on(fc="fc", f="f"):
+    # The same rule as a SQL predicate, for the paths that still price in SQL
+    day = f"TRUNC({f}.departure_date_time)" if FARE_DATE == DEPARTURE else "TRUNC(SYSDATE)"
+    return f"{fc}.valid_from_date <= {day} AND {fc}.valid_to_date >= {day}"
+
+
+def _segments(bounds, quote):
+    # Non-overlapping (start, end, cost) runs from quote(day) evaluated at
+    # each boundary; adjacent runs with the same cost are merged.
+    segments = []
+    for start, next_start in zip(bounds, bounds[1:]):
+        cost = quote(start)
+        if cost is None:
+            continue
+        end = next_start - _ONE_DAY
+        if segments and segments[-1][2] == cost and segments[-1][1] + _ONE_DAY == start:
+            segments[-1] = (segments[-1][0], end, cost)
+        else:
+            segments.append((start, end, cost))
+    return segments
+
+
+class FarePeriods:
+    __slots__ = ("starts", "ends", "costs")
+
+    def __init__(self, periods=()):
+        # periods: [(valid_from, valid_to, cost), ...], both ends inclusive
+        periods = sorted(((_day(a), _day(b), cost) for a, b, cost in periods), key=lambda p: p[0])
+        if any(b[0] <= a[1] for a, b in zip(periods, periods[1:])):
+            # Overlapping periods: the one that starts latest wins. Flatten
+            # once here so on() stays a single bisect.
+            def quote(day):
+                covering = [p for p in periods if p[0] <= day <= p[1]]
+                return covering[-1][2] if covering else None
+            periods = _segments(_bounds(periods), quote)
+
+        self.starts = [p[0] for p in periods]
+        self.ends = [p[1] for p in periods]
+        self.costs = [p[2] for p in periods]
+
+    def __bool__(self):
+        return bool(self.starts)
+
+    def periods(self):
+        return list(zip(self.starts, self.ends, self.costs))
+
+    def on(self, day):
+        # Fare valid on day, or None
+        i = bisect_right(self.starts, day) - 1
+        if i >= 0 and self.ends[i] >= day:
+            return self.costs[i]
+        return None
+
+
+def _day(value):
+    # Oracle DATE columns come back as datetimes
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _bounds(periods):
+    bounds = set()
+    for start, end, _ in periods:
+        bounds.add(start)
+        bounds.add(end + _ONE_DAY)
+    return sorted(bounds)
+
+
+def lowest(seat_periods):
+    # Step function of the lowest fare across several seats' FarePeriods:
+    # one segment per stretch of days over which the minimum is constant.
+    # Seats in a class usually share the same periods; quote each set once
+    seat_periods = list({tuple(p.periods()): p for p in seat_periods if p}.values())
+
+    def quote(day):
+        quotes = [q for q in (p.on(day) for p in seat_periods) if q is not None]
+        return min(quotes) if quotes else None
+
+    bounds = _bounds(period for p in seat_periods for period in p.periods())
+    return FarePeriods(_segments(bounds, quote))
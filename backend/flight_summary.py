@@ -0,0 +1,274 @@
+"""Raw-SQL upkeep of main_flightclasssummary.
+
+One row per flight and travel class with the lowest fare valid on the
+quote day (see fares.py) and the seat counts, so the SQL search paths
+read a narrow table instead of aggregating every seat and fare row.
+seats_total is the class's seat rows on the flight, capped at its
+TravelClass.capacity, so seats added beyond what a class is configured to
+sell never count. seats_booked is also the booking counter: add_booked()
+refuses to take a class past seats_total, and searches leave sold-out
+classes out.
+The upkeep functions take the caller's cursor and never commit: the
+summary changes in the same transaction as the booking or cancellation
+behind it.
+
+Under FARE_DATE=booking min_fare is "lowest fare valid today", so each
+row records the day it was quoted on; ensure_current() re-derives the rows
+quoted on an earlier day before a process serves its first search of the
+day, and no daily rebuild is needed. It also builds the rows of any flight
+that has seats but no summary (seats written around rebuild(), or a
+database the table was never filled for), so a missing row is never read
+as "no fare" or "sold out"; init_app() runs it at startup.
+
+The Django side (main/signals.py) does the same for ORM writes such as
+fare edits in the admin.
+"""
+import logging
+import threading
+from datetime import date
+
+import db
+import fares
+
+log = logging.getLogger(__name__)
+
+_REBUILD_QUERY = """
+    INSERT INTO main_flightclasssummary
+        (flight_id, travel_class_id, min_fare, quote_day, seats_total, seats_booked)
+    SELECT
+        s.flight_id,
+        s.travel_class_id,
+        (
+            SELECT MIN(fc.cost)
+            FROM main_flightcost fc
+            JOIN main_seatdetails s2 ON s2.seat_id = fc.seat_id
+            JOIN main_flightdetails f ON f.flight_id = s2.flight_id
+            WHERE s2.flight_id = s.flight_id
+              AND s2.travel_class_id = s.travel_class_id
+              AND {valid}
+        ),
+        {quote_day},
+        CASE WHEN COUNT(s.seat_id) > tc.capacity THEN tc.capacity ELSE COUNT(s.seat_id) END,
+        COUNT(r.reservation_id)
+    FROM main_seatdetails s
+    JOIN main_travelclass tc ON tc.travel_class_id = s.travel_class_id
+    LEFT JOIN main_reservation r
+        ON r.seat_id = s.seat_id
+       AND r.status = 'A'
+    {where}
+    GROUP BY s.flight_id, s.travel_class_id, tc.capacity
+"""
+
+
+def _in(column, values, start=1):
+    binds = ", ".join(f":{i}" for i in range(start, start + len(values)))
+    return f"{column} IN ({binds})"
+
+
+def _quoted():
+    # Validity predicate, quote_day value and their binds for the rebuild.
+    # Booking mode binds today from here, as ensure_current() does, so the
+    # rows and the staleness check agree on what day it is.
+    if fares.FARE_DATE == fares.DEPARTURE:
+        return fares.sql_valid_on("fc", "f"), "NULL", []
+    today = date.today()
+    return "fc.valid_from_date <= :1 AND fc.valid_to_date >= :2", ":3", [today, today, today]
+
+
+def rebuild(cursor, flight_ids=None):
+    # Recompute the rows for these flights (all flights if None)
+    flight_ids = list(dict.fromkeys(flight_ids)) if flight_ids else None
+    valid, quote_day, binds = _quoted()
+
+    if flight_ids:
+        cursor.execute(
+            f"DELETE FROM main_flightclasssummary WHERE {_in('flight_id', flight_ids)}",
+            flight_ids,
+        )
+        where = f"WHERE {_in('s.flight_id', flight_ids, start=len(binds) + 1)}"
+        cursor.execute(
+            _REBUILD_QUERY.format(valid=valid, quote_day=quote_day, where=where),
+            binds + flight_ids,
+        )
+    else:
+        cursor.execute("DELETE FROM main_flightclasssummary")
+        cursor.execute(_REBUILD_QUERY.format(valid=valid, quote_day=quote_day, where=""), binds)
+    return cursor.rowcount
+
+
+# ----------------- QUOTE DAY -----------------
+
+# Rows quoted before today (or never, e.g. written before quote_day
+# existed) get min_fare re-derived for today. No table alias on the
+# UPDATE, so the same text runs on Oracle and sqlite.
+_REFRESH_QUERY = """
+    UPDATE main_flightclasssummary
+    SET min_fare = (
+            SELECT MIN(fc.cost)
+            FROM main_flightcost fc
+            JOIN main_seatdetails s ON s.seat_id = fc.seat_id
+            WHERE s.flight_id = main_flightclasssummary.flight_id
+              AND s.travel_class_id = main_flightclasssummary.travel_class_id
+              AND fc.valid_from_date <= :1
+              AND fc.valid_to_date >= :2
+        ),
+        quote_day = :3
+    WHERE quote_day < :4
+       OR quote_day IS NULL
+"""
+
+# Flights with a seat in a class that has no summary row
+_MISSING_QUERY = """
+    SELECT DISTINCT s.flight_id
+    FROM main_seatdetails s
+    WHERE NOT EXISTS (
+        SELECT 1
+        FROM main_flightclasssummary fs
+        WHERE fs.flight_id = s.flight_id
+          AND fs.travel_class_id = s.travel_class_id
+    )
+"""
+
+_quote_lock = threading.Lock()
+_current_day = None     # last day this process brought the table up to
+
+
+def stale():
+    # True until this process has run ensure_current() today
+    return _current_day != date.today()
+
+
+def backfill(cursor):
+    # Rebuild the flights with a class that has no row -> rows built
+    cursor.execute(_MISSING_QUERY)
+    flight_ids = [row[0] for row in cursor.fetchall()]
+    if not flight_ids:
+        return 0
+    log.warning("Building missing flight class summary rows for %d flights", len(flight_ids))
+    return rebuild(cursor, flight_ids)
+
+
+def ensure_current(acquire):
+    # Call before reading the summary: builds missing rows (backfill())
+    # and, under FARE_DATE=booking, re-derives min_fare for rows quoted on
+    # an earlier day. Runs on a connection of its own (acquire() ->
+    # connection) so it commits apart from the caller's transaction. Once
+    # per process per day; once any process has run it, the others' find
+    # nothing to do. -> rows written
+    global _current_day
+    if not stale():
+        return 0
+    with _quote_lock:
+        today = date.today()
+        if _current_day == today:
+            return 0
+        conn = acquire()
+        try:
+            cursor = conn.cursor()
+            written = backfill(cursor)
+            if fares.FARE_DATE == fares.BOOKING:
+                cursor.execute(_REFRESH_QUERY, [today, today, today, today])
+                written += cursor.rowcount
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
+        _current_day = today
+        return written
+
+
+def init_app(app):
+    # Bring the table up to date before serving. If the database is
+    # unreachable the app still starts; the first search tries again.
+    try:
+        ensure_current(db.acquire)
+    except db.DatabaseError as exc:
+        log.warning("Flight class summary not checked: %s", exc)
+
+
+def add_booked(cursor, counts):
+    # counts: {(flight_id, travel_class_id): change in booked seats}.
+    # Each counter moves only if it stays within 0..seats_total, decided
+    # by the UPDATE itself so concurrent bookings cannot oversell a class;
+    # a release only needs to stay above 0, so a class already over its
+    # capacity (lowered after the seats were sold) can still cancel.
+    # A flight with no summary row is rebuilt here, in the caller's
+    # transaction: the rebuild counts the reservations that transaction
+    # has already written, so the change is in it and is only refused if
+    # it oversells. Returns the keys that were refused (sold out); the
+    # caller rolls back.
+    refused = []
+    rebuilt = set()
+    for (flight_id, class_id), delta in counts.items():
+        if not delta:
+            continue
+        if flight_id not in rebuilt:
+            cursor.execute(
+                """
+                UPDATE main_flightclasssummary
+                SET seats_booked = seats_booked + :1
+                WHERE flight_id = :2
+                  AND travel_class_id = :3
+                  AND seats_booked + :4 >= 0
+                  AND (:5 < 0 OR seats_booked + :6 <= seats_total)
+                """,
+                [delta, flight_id, class_id, delta, delta, delta],
+            )
+            if cursor.rowcount == 1:
+                continue
+            if _counter(cursor, flight_id, class_id) is not None:
+                refused.append((flight_id, class_id))
+                continue
+            log.warning("No flight class summary row for %s/%s; rebuilding the flight", flight_id, class_id)
+            rebuild(cursor, [flight_id])
+            rebuilt.add(flight_id)
+
+        counter = _counter(cursor, flight_id, class_id)
+        if counter is None:
+            raise RuntimeError(f"No flight class summary row for {flight_id}/{class_id} after a rebuild")
+        seats_booked, seats_total = counter
+        if delta > 0 and seats_booked > seats_total:
+            refused.append((flight_id, class_id))
+    return refused
+
+
+def _counter(cursor, flight_id, class_id):
+    # (seats_booked, seats_total) of one class, or None if it has no row
+    cursor.execute(
+        """
+        SELECT seats_booked, seats_total
+        FROM main_flightclasssummary
+        WHERE flight_id = :1
+          AND travel_class_id = :2
+        """,
+        [flight_id, class_id],
+    )
+    return cursor.fetchone()
+
+
+SEATS_LEFT_QUERY = """
+    SELECT travel_class_id, seats_total - seats_booked
+    FROM main_flightclasssummary
+    WHERE flight_id = :1
+"""
+
+
+def seats_left(cursor, flight_id):
+    # {travel_class_id: seats still for sale} straight from the counters
+    cursor.execute(SEATS_LEFT_QUERY, [flight_id])
+    return dict(cursor.fetchall())
+
+
+if __name__ == "__main__":
+    # Backfill from the backend side: python flight_summary.py [FLIGHT_ID ...]
+    import sys
+
+    from db import get_connection
+
+    conn = get_connection()
+    cur = conn.cursor()
+    rows = rebuild(cur, sys.argv[1:] or None)
+    conn.commit()
+    cur.close()
+    conn.close()
+    print(f"Rebuilt {rows} flight class summary rows")
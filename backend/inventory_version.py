@@ -0,0 +1,117 @@
+"""Per-flight inventory versions for conditional GETs.
+
+Every change to a flight's reservations or fares bumps that flight's
+version (and a global one used for search results). Responses carry an
+ETag / Last-Modified derived from the version, so a client re-polling a
+seat map gets a 304 from a dict lookup instead of a database query.
+
+With SHARED_INVENTORY set, the versions are kept in the shared segment
+instead, so every worker on the host issues and honours the same tags.
+"""
+import threading
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import make_response, request
+
+import shared_inventory
+
+# Versions live in this process only; the start time in every ETag makes
+# sure a restarted worker never matches a tag it did not issue.
+_EPOCH = format(int(time.time()), "x")
+_STARTED = datetime.now(timezone.utc).replace(microsecond=0)
+
+_lock = threading.Lock()
+_flights = {}                  # flight_id -> (version, last_modified)
+_global = (0, _STARTED)        # bumped with every flight
+
+
+def bump(*flight_ids):
+    # Call after a reservation or fare change for these flights commits.
+    global _global
+    if shared_inventory.segment is not None:
+        shared_inventory.segment.bump(*flight_ids)
+        return
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    with _lock:
+        for flight_id in flight_ids:
+            version, _ = _flights.get(flight_id, (0, _STARTED))
+            _flights[flight_id] = (version + 1, now)
+        _global = (_global[0] + 1, now)
+
+
+def flight_version(flight_id):
+    if shared_inventory.segment is not None:
+        return shared_inventory.segment.flight_version(flight_id)
+    return _flights.get(flight_id, (0, _STARTED))
+
+
+def global_version():
+    if shared_inventory.segment is not None:
+        return shared_inventory.segment.global_version()
+    return _global
+
+
+def _epoch():
+    # The shared segment's creation time when there is one, so tags from
+    # any worker match
+    return shared_inventory.segment.epoch if shared_inventory.segment is not None else _EPOCH
+
+
+def flight_etag(flight_id):
+    version, last_modified = flight_version(flight_id)
+    return f"f-{_epoch()}-{version}", last_modified
+
+
+def flights_etag(*flight_ids):
+    # One tag for a page built from several flights (round-trip booking);
+    # None entries are skipped
+    versions = [flight_version(flight_id) for flight_id in flight_ids if flight_id]
+    tag = ".".join(str(version) for version, _ in versions)
+    return f"f-{_epoch()}-{tag}", max(last_modified for _, last_modified in versions)
+
+
+def search_etag():
+    # Search results can change when any flight's fares or seats do
+    version, last_modified = global_version()
+    return f"s-{_epoch()}-{version}", last_modified
+
+
+# ----------------- HTTP HELPERS -----------------
+
+def not_modified(etag):
+    # True if the client's cached copy (If-None-Match) is still current.
+    # If-Modified-Since is not honoured: HTTP dates stop at the second, so
+    # a booking in the same second as the cached copy would still match.
+    return bool(request.if_none_match) and request.if_none_match.contains_weak(etag)
+
+
+def tag(response, etag, last_modified):
+    response.set_etag(etag, weak=True)
+    response.last_modified = last_modified
+    # Let clients keep the body but always revalidate it
+    response.cache_control.no_cache = True
+    return response
+
+
+def conditional(version_for):
+    # View decorator for GETs. version_for(**view_args) -> (etag, last_modified)
+    # is read *before* the view runs, so a change that lands mid-request
+    # can only make the next check miss, never serve stale data as fresh.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != "GET":
+                return view(*args, **kwargs)
+
+            etag, last_modified = version_for(**kwargs)
+            if not_modified(etag):
+                return tag(make_response("", 304), etag, last_modified)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                tag(response, etag, last_modified)
+            return response
+        return wrapper
+    return decorator
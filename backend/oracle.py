@@ -1,9 +1,95 @@
+import threading
+
 import oracledb
 
+import config
+
+# Raised when an insert/update breaks a unique or foreign key constraint
+IntegrityError = oracledb.IntegrityError
+DatabaseError = oracledb.DatabaseError
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    # Created lazily so importing this module never opens sessions.
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = oracledb.create_pool(
+                    user=config.ORACLE_USER,
+                    password=config.ORACLE_PASSWORD,
+                    dsn=config.ORACLE_DSN,
+                    min=config.POOL_MIN,
+                    max=config.POOL_MAX,
+                    increment=config.POOL_INCREMENT,
+                    stmtcachesize=config.STMT_CACHE_SIZE,
+                    ping_interval=config.PING_INTERVAL,
+                    getmode=oracledb.POOL_GETMODE_TIMEDWAIT,
+                    wait_timeout=config.POOL_WAIT_TIMEOUT * 1000,
+                )
+    return _pool
+
+
+def connect():
+    # close() on the returned connection hands it back to the pool
+    return get_pool().acquire()
+
+
+# ----------------- ASYNCIO -----------------
+# A separate pool of asyncio (thin mode) connections for asgi.py. It has
+# to be created inside the running event loop, so also lazily.
+
+_async_pool = None
+
+
+def get_async_pool():
+    global _async_pool
+    if _async_pool is None:
+        _async_pool = oracledb.create_pool_async(
+            user=config.ORACLE_USER,
+            password=config.ORACLE_PASSWORD,
+            dsn=config.ORACLE_DSN,
+            min=config.POOL_MIN,
+            max=config.ASYNC_POOL_MAX,
+            increment=config.POOL_INCREMENT,
+            stmtcachesize=config.STMT_CACHE_SIZE,
+            ping_interval=config.PING_INTERVAL,
+            getmode=oracledb.POOL_GETMODE_TIMEDWAIT,
+            wait_timeout=config.POOL_WAIT_TIMEOUT * 1000,
+        )
+    return _async_pool
+
+
+async def connect_async():
+    # await close() on the returned connection hands it back to the pool
+    return await get_async_pool().acquire()
+
+
+async def close_async_pool():
+    global _async_pool
+    pool, _async_pool = _async_pool, None
+    if pool is not None:
+        await pool.close(force=True)
+
+
+def async_pool_counts():
+    pool = _async_pool
+    return {
+        "busy": pool.busy if pool is not None else 0,
+        "open": pool.opened if pool is not None else 0,
+        "min": config.POOL_MIN,
+        "max": config.ASYNC_POOL_MAX,
+    }
+
 
-def get_connection():
-    return oracledb.connect(
-        user="flight_app_user",
-        password="flight123",
-        dsn="localhost:1521/XEPDB1"
-    )
\ No newline at end of file
+def pool_counts():
+    pool = _pool
+    return {
+        "busy": pool.busy if pool is not None else 0,
+        "open": pool.opened if pool is not None else 0,
+        "min": config.POOL_MIN,
+        "max": config.POOL_MAX,
+    }
@@ -0,0 +1,140 @@
+"""Cache of rendered HTML pages, kept gzip-compressed.
+
+The marketing pages are large static templates and search results only
+change when inventory does, yet both went through Jinja on every hit.
+@cached stores a view's rendered body compressed, keyed by endpoint and
+the request fields that shape the page; a hit is written straight out,
+compressed for clients that accept gzip, without entering the view.
+
+Entries are evicted least recently used once PAGE_CACHE_MB is exceeded.
+Pages built from inventory are cached with versioned=True: they carry the
+inventory_version search version they were rendered at and are dropped
+once a booking, cancellation or invalidate() bumps it (with
+SHARED_INVENTORY set, bumps from every worker count). A ttl (PAGE_CACHE_TTL
+for the search pages) bounds what can change without a bump, such as
+which fare is valid today or edits made by another process.
+
+Used by app.py and main/app.py.
+"""
+import gzip
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import make_response, request
+
+import inventory_version
+
+MAX_BYTES = int(float(os.environ.get("PAGE_CACHE_MB", "16")) * 1024 * 1024)
+ENABLED = MAX_BYTES > 0
+
+# Upper bound (seconds) for inventory pages, e.g. across the fare day rollover
+TTL = float(os.environ.get("PAGE_CACHE_TTL", "300"))
+
+
+class _Page:
+    __slots__ = ("body", "mimetype", "version", "expires")
+
+    def __init__(self, body, mimetype, version, expires):
+        self.body = body            # gzip-compressed
+        self.mimetype = mimetype
+        self.version = version
+        self.expires = expires
+
+
+class PageCache:
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._pages = OrderedDict()   # key -> _Page, least recently used first
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key, version=None):
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None and (page.version != version or
+                                     (page.expires is not None and page.expires < time.monotonic())):
+                self._drop(key)
+                page = None
+            if page is None:
+                self.misses += 1
+                return None
+            self._pages.move_to_end(key)
+            self.hits += 1
+            return page
+
+    def put(self, key, body, mimetype, version=None, ttl=None):
+        page = _Page(gzip.compress(body, 6), mimetype, version,
+                     None if ttl is None else time.monotonic() + ttl)
+        if len(page.body) > self.max_bytes:
+            return page
+        with self._lock:
+            if key in self._pages:
+                self._drop(key)
+            self._pages[key] = page
+            self._size += len(page.body)
+            while self._size > self.max_bytes:
+                self._drop(next(iter(self._pages)))
+        return page
+
+    def _drop(self, key):
+        self._size -= len(self._pages.pop(key).body)
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            return {"pages": len(self._pages), "bytes": self._size, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses}
+
+
+cache = PageCache()
+
+
+def form_criteria(*fields):
+    # Key function for a form POST: just the fields the page is built
+    # from, in a fixed order (CSRF tokens, buttons etc. are ignored)
+    def criteria():
+        return tuple(request.form.get(field, "") for field in fields)
+    return criteria
+
+
+def _response(page):
+    if "gzip" in request.accept_encodings:
+        response = make_response(page.body)
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response = make_response(gzip.decompress(page.body))
+    response.mimetype = page.mimetype
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def cached(criteria=None, versioned=False, ttl=None):
+    # View decorator. criteria() -> hashable key part for the request (none
+    # for static pages). The version is read *before* the view renders,
+    # so a bump that lands mid-render only makes the page stale sooner.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return view(*args, **kwargs)
+
+            key = (request.endpoint, tuple(sorted(kwargs.items())), criteria() if criteria else ())
+            version = inventory_version.global_version()[0] if versioned else None
+            page = cache.get(key, version)
+            if page is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.direct_passthrough:
+                    return response
+                page = cache.put(key, response.get_data(), response.mimetype, version, ttl)
+            return _response(page)
+        return wrapper
+    return decorator
@@ -0,0 +1,127 @@
+"""Process-wide cache of the reference tables.
+
+Airports, travel classes, flight services and service offerings are a
+few dozen rows that only change through the admin, yet every search used
+to join or re-read them. ReferenceCache loads all four in one go and
+answers from dicts; it reloads once REFERENCE_TTL seconds have passed or
+after invalidate(). While one thread reloads, the others keep reading
+the previous snapshot.
+
+The class has no connection of its own, so each stack plugs in its own:
+backend/db.py and main/db.py hand it their connect functions, and the
+Django site (main/reference.py) its ORM connection.
+"""
+import os
+import threading
+import time
+
+TTL = float(os.environ.get("REFERENCE_TTL", "300"))
+
+_QUERIES = {
+    "airports": "SELECT airport_id, airport_city, airport_country FROM main_airport",
+    "classes": "SELECT travel_class_id, name, capacity FROM main_travelclass",
+    "services": "SELECT service_id, service_name FROM main_flightservice",
+    "offerings": """
+        SELECT travel_class_id, service_id, offered_yn, from_date, to_date
+        FROM main_serviceoffering
+    """,
+}
+
+
+class Snapshot:
+    __slots__ = ("airports", "classes", "services", "offerings", "loaded_at")
+
+    def __init__(self, rows):
+        self.airports = {row[0]: (row[1], row[2]) for row in rows["airports"]}   # id -> (city, country)
+        self.classes = {row[0]: (row[1], row[2]) for row in rows["classes"]}     # id -> (name, capacity)
+        self.services = {row[0]: row[1] for row in rows["services"]}             # id -> name
+        self.offerings = {}                                                       # class id -> [(service id, yn, from, to)]
+        for class_id, *offering in rows["offerings"]:
+            self.offerings.setdefault(class_id, []).append(tuple(offering))
+        self.loaded_at = time.monotonic()
+
+
+class ReferenceCache:
+
+    def __init__(self, connect, close=True, ttl=None):
+        # connect() -> DB-API connection, closed after each load if close
+        self._connect = connect
+        self._close = close
+        self.ttl = TTL if ttl is None else ttl
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            rows = {}
+            for name, query in _QUERIES.items():
+                cursor.execute(query)
+                rows[name] = cursor.fetchall()
+            cursor.close()
+        finally:
+            if self._close:
+                conn.close()
+        return Snapshot(rows)
+
+    def snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - snapshot.loaded_at < self.ttl:
+            return snapshot
+
+        # Expired: one thread reloads, the rest keep the old snapshot
+        if not self._lock.acquire(blocking=snapshot is None):
+            return snapshot
+        try:
+            current = self._snapshot
+            if current is not snapshot and current is not None:
+                return current   # reloaded while we waited
+            self._snapshot = self._load()
+            return self._snapshot
+        finally:
+            self._lock.release()
+
+    def refresh(self):
+        # Reload now; readers keep the old snapshot until the swap
+        with self._lock:
+            self._snapshot = self._load()
+        return self._snapshot
+
+    def invalidate(self):
+        # Next lookup reloads (other processes pick changes up via the TTL)
+        self._snapshot = None
+
+    # ----------------- LOOKUPS -----------------
+
+    def airport_city(self, airport_id, default=None):
+        airport = self.snapshot().airports.get(airport_id)
+        return airport[0] if airport else default
+
+    def airports(self):
+        # [(airport_id, city, country)] by city, for pickers
+        return sorted(((code, city, country) for code, (city, country)
+                       in self.snapshot().airports.items()), key=lambda a: a[1])
+
+    def class_name(self, travel_class_id, default=None):
+        travel_class = self.snapshot().classes.get(travel_class_id)
+        return travel_class[0] if travel_class else default
+
+    def services_for(self, travel_class_id, day=None):
+        # Names of the services a class offers (on day, if given)
+        snapshot = self.snapshot()
+        return [
+            snapshot.services.get(service_id, service_id)
+            for service_id, offered_yn, from_date, to_date
+            in snapshot.offerings.get(travel_class_id, ())
+            if offered_yn == "Y" and (day is None or from_date <= day <= to_date)
+        ]
+
+    def counts(self):
+        snapshot = self.snapshot()
+        return {
+            "airports": len(snapshot.airports),
+            "travel_classes": len(snapshot.classes),
+            "services": len(snapshot.services),
+            "offerings": sum(len(o) for o in snapshot.offerings.values()),
+        }
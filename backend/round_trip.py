@@ -0,0 +1,107 @@
+"""Round-trip search: outbound and return legs ranked by total fare.
+
+Both legs are read in one pass (one index lookup per leg, or a single
+query covering both routes), and itineraries are produced cheapest first
+by a k-way heap merge over the two fare-sorted leg lists, so pairs are
+built lazily in fare order instead of the whole outbound x return product.
+"""
+import heapq
+from datetime import timedelta
+
+from db import get_connection
+import search_index
+
+# Shortest gap allowed between landing on the outbound leg and taking off
+# on the return leg (matters when both legs are on the same day)
+MIN_TURNAROUND = timedelta(hours=2)
+
+# Itineraries shown on the round-trip results page
+DEFAULT_RESULTS = 20
+
+# Hard stop on heap pops per search, so a window where almost every pair
+# fails the turnaround check cannot degrade into the full cross product
+MAX_POPS_PER_RESULT = 50
+
+
+def search_legs(source, destination, outbound_day, return_day):
+    # -> (outbound rows, return rows), each [(record, class_name, fare), ...]
+    # cheapest first, like SearchIndex.search()
+    if search_index.is_ready():
+        return (
+            search_index.search(source, destination, outbound_day, outbound_day),
+            search_index.search(destination, source, return_day, return_day),
+        )
+
+    out_start, out_end = search_index.departure_window(outbound_day, outbound_day)
+    ret_start, ret_end = search_index.departure_window(return_day, return_day)
+    cursor = get_connection().cursor()
+    records = search_index.read_records(
+        cursor,
+        """
+        WHERE (f.source_airport_id      = :1
+           AND f.destination_airport_id = :2
+           AND f.departure_date_time   >= :3
+           AND f.departure_date_time    < :4)
+           OR (f.source_airport_id      = :5
+           AND f.destination_airport_id = :6
+           AND f.departure_date_time   >= :7
+           AND f.departure_date_time    < :8)
+        """,
+        [source, destination, out_start, out_end,
+         destination, source, ret_start, ret_end],
+    )
+    cursor.close()
+
+    outbound = [r for r in records.values()
+                if r.source == source and out_start <= r.departure < out_end]
+    inbound = [r for r in records.values()
+               if r.source == destination and ret_start <= r.departure < ret_end]
+    return search_index.fare_rows(outbound), search_index.fare_rows(inbound)
+
+
+def _connects(out_row, ret_row, min_turnaround):
+    return ret_row[0].departure >= out_row[0].arrival + min_turnaround
+
+
+def top_itineraries(outbound, inbound, k=DEFAULT_RESULTS, min_turnaround=MIN_TURNAROUND):
+    # k cheapest (total_fare, out_row, ret_row) with both legs in the same
+    # travel class. Leg lists must be sorted by fare (search_legs() does).
+    by_class = {}
+    for leg, rows in ((0, outbound), (1, inbound)):
+        for row in rows:
+            by_class.setdefault(row[1], ([], []))[leg].append(row)
+
+    # Seed each class with its cheapest pair. Popping (i, j) advances
+    # along the return list, and popping (i, 0) also brings in outbound
+    # i + 1, so every outbound row is reached in fare order however many
+    # of the cheaper ones fail the turnaround check.
+    heap = []
+    for class_name, (outs, rets) in by_class.items():
+        if outs and rets:
+            heap.append((outs[0][2] + rets[0][2], class_name, 0, 0))
+    heapq.heapify(heap)
+
+    itineraries = []
+    pops = 0
+    budget = k * MAX_POPS_PER_RESULT
+    while heap and len(itineraries) < k and pops < budget:
+        total, class_name, i, j = heapq.heappop(heap)
+        pops += 1
+        outs, rets = by_class[class_name]
+        if _connects(outs[i], rets[j], min_turnaround):
+            itineraries.append((total, outs[i], rets[j]))
+        if j + 1 < len(rets):
+            heapq.heappush(heap, (outs[i][2] + rets[j + 1][2], class_name, i, j + 1))
+        if j == 0 and i + 1 < len(outs):
+            heapq.heappush(heap, (outs[i + 1][2] + rets[0][2], class_name, i + 1, 0))
+    return itineraries
+
+
+def search(source, destination, outbound_day, return_day,
+           k=DEFAULT_RESULTS, outbound_flight=None):
+    # Cheapest k itineraries; outbound_flight pins the outbound leg to a
+    # flight the customer already picked.
+    outbound, inbound = search_legs(source, destination, outbound_day, return_day)
+    if outbound_flight:
+        outbound = [row for row in outbound if row[0].flight_id == outbound_flight]
+    return top_itineraries(outbound, inbound, k)
@@ -1,20 +1,120 @@
+from datetime import timedelta
+from itertools import islice
+
 from flask import Blueprint, request, jsonify
-from oracle import get_connection
+from db import acquire, get_connection
+import connections
+import flight_summary
+import inventory_version
+import round_trip
+import search_index
+from routes.paging import (
+    MAX_PAGE_SIZE, NUMBER, TEXT, PageError, STREAM_ARRAYSIZE, iter_cursor, json_page, ndjson_response,
+    page_args,
+)
 
 flights_bp = Blueprint("flights", __name__)
 
 @flights_bp.route("/search", methods=["GET"])
+@inventory_version.conditional(inventory_version.search_etag)
 def search_flights():
-    source = request.args.get("source")
-    destination = request.args.get("destination")
+    try:
+        source, destination, start_day, end_day = search_criteria(request.args)
+        limit, after, stream = page_args(SORT_KEY_TYPES)
+    except (SearchError, PageError) as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    if search_index.is_ready():
+        rows = index_rows(search_index.search(source, destination, start_day, end_day), after)
+    else:
+        rows = _search_rows_sql(source, destination, start_day, end_day, after, limit)
+
+    if stream:
+        return ndjson_response(islice(rows, limit) if limit else rows)
+
+    flights = list(islice(rows, limit + 1) if limit else rows)
+    if hasattr(rows, "close"):
+        rows.close()   # stop reading the database cursor early
+    return json_page(flights, limit, sort_key)
+
+# ----------------- SEARCH HELPERS -----------------
+# Shared with the asyncio app (asgi.py), which serves the same endpoint.
+
+class SearchError(ValueError):
+    pass
+
+def search_criteria(args):
+    # -> (source, destination, start_day, end_day) from the query string.
+    # ?date=YYYY-MM-DD for one day, or ?date_from=...&date_to=... (inclusive,
+    # either side optional) for a range.
+    source = args.get("source")
+    destination = args.get("destination")
 
     if not source or not destination:
-        return jsonify({"error": "source and destination are required"}), 400
+        raise SearchError("source and destination are required")
 
-    conn = get_connection()
-    cursor = conn.cursor()
+    start_day = end_day = None
+    for param in ("date", "date_from", "date_to"):
+        value = args.get(param)
+        if value is None:
+            continue
+        day = search_index.parse_day(value)
+        if day is None:
+            raise SearchError(f"{param} must be YYYY-MM-DD")
+        if param in ("date", "date_from"):
+            start_day = day
+        if param in ("date", "date_to"):
+            end_day = day
 
-    query = """
+    if start_day and end_day and start_day > end_day:
+        raise SearchError("date_from must not be after date_to")
+
+    return source, destination, start_day, end_day
+
+def sort_key(flight):
+    # Result order, and what the paging cursor encodes
+    return (flight["lowest_price"], flight["flight_id"], flight["travel_class"])
+
+SORT_KEY_TYPES = (NUMBER, TEXT, TEXT)
+
+def index_rows(fare_rows, after):
+    # Result rows from the in-memory index (search_index.fare_rows()),
+    # after the keyset if given
+    return (
+        {
+            "flight_id": record.flight_id,
+            "source": record.source,
+            "destination": record.destination,
+            "departure": record.departure_str,
+            "arrival": record.arrival_str,
+            "airplane_type": record.airplane_type,
+            "lowest_price": lowest_price,
+            "travel_class": class_name,
+            "seats_left": record.seats_left.get(class_name),
+        }
+        for record, class_name, lowest_price in fare_rows
+        if after is None or (lowest_price, record.flight_id, class_name) > after
+    )
+
+def search_query(source, destination, start_day, end_day, after):
+    # -> (sql, binds) for one page of results from the summary table
+    window_start, window_end = search_index.departure_window(start_day, end_day)
+    binds = [source, destination, window_start, window_end]
+
+    # Keyset continuation: only rows that sort after the last row served
+    keyset = ""
+    if after is not None:
+        keyset = """
+          AND (fs.min_fare > :5
+            OR (fs.min_fare = :6 AND f.flight_id > :7)
+            OR (fs.min_fare = :8 AND f.flight_id = :9 AND tc.name > :10))"""
+        price, flight_id, class_name = after
+        binds.extend([price, price, flight_id, price, flight_id, class_name])
+
+    # One narrow row per flight and class from the summary table
+    # (flight_summary.py) instead of aggregating every seat and fare;
+    # seats left come from its counters and sold-out classes drop out
+    query = f"""
         SELECT 
             f.flight_id,
             f.source_airport_id,
@@ -22,43 +122,170 @@ def search_flights():
             TO_CHAR(f.departure_date_time, 'YYYY-MM-DD HH24:MI'),
             TO_CHAR(f.arrival_date_time, 'YYYY-MM-DD HH24:MI'),
             f.airplane_type,
-            MIN(fc.cost) AS lowest_price,
-            tc.name AS travel_class
+            fs.min_fare AS lowest_price,
+            tc.name AS travel_class,
+            fs.seats_total - fs.seats_booked AS seats_left
         FROM main_flightdetails f
-        JOIN main_seatdetails s ON s.flight_id = f.flight_id
-        JOIN main_travelclass tc ON tc.travel_class_id = s.travel_class_id
-        JOIN main_flightcost fc ON fc.seat_id = s.seat_id
+        JOIN main_flightclasssummary fs ON fs.flight_id = f.flight_id
+        JOIN main_travelclass tc ON tc.travel_class_id = fs.travel_class_id
         WHERE f.source_airport_id = :1 
           AND f.destination_airport_id = :2
-        GROUP BY 
-            f.flight_id,
-            f.source_airport_id,
-            f.destination_airport_id,
-            f.departure_date_time,
-            f.arrival_date_time,
-            f.airplane_type,
-            tc.name
-        ORDER BY lowest_price
+          AND f.departure_date_time >= :3
+          AND f.departure_date_time < :4
+          AND fs.min_fare IS NOT NULL
+          AND fs.seats_booked < fs.seats_total{keyset}
+        ORDER BY lowest_price, f.flight_id, tc.name
     """
+    return query, binds
+
+def search_row(row):
+    return {
+        "flight_id": row[0],
+        "source": row[1],
+        "destination": row[2],
+        "departure": row[3],
+        "arrival": row[4],
+        "airplane_type": row[5],
+        "lowest_price": row[6],
+        "travel_class": row[7],
+        "seats_left": row[8],
+    }
+
+def _search_rows_sql(source, destination, start_day, end_day, after, limit):
+    flight_summary.ensure_current(acquire)
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.arraysize = STREAM_ARRAYSIZE
+    # One round trip for a whole page (+1 row to see if there is another)
+    cursor.prefetchrows = limit + 1 if limit else STREAM_ARRAYSIZE
+
+    cursor.execute(*search_query(source, destination, start_day, end_day, after))
+
+    for row in iter_cursor(cursor):
+        yield search_row(row)
+
+@flights_bp.route("/round-trip", methods=["GET"])
+@inventory_version.conditional(inventory_version.search_etag)
+def search_round_trip():
+    source = request.args.get("source")
+    destination = request.args.get("destination")
+    if not source or not destination:
+        return jsonify({"error": "source and destination are required"}), 400
+
+    outbound_day = search_index.parse_day(request.args.get("date"))
+    return_day = search_index.parse_day(request.args.get("return_date"))
+    if outbound_day is None or return_day is None:
+        return jsonify({"error": "date and return_date must be YYYY-MM-DD"}), 400
+    if return_day < outbound_day:
+        return jsonify({"error": "return_date must not be before date"}), 400
+
+    try:
+        limit = int(request.args.get("limit", round_trip.DEFAULT_RESULTS))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        return jsonify({"error": f"limit must be between 1 and {MAX_PAGE_SIZE}"}), 400
+
+    # Cheapest itineraries first; a top-k list, so there is no next page
+    itineraries = round_trip.search(source, destination, outbound_day, return_day, k=limit)
+    return jsonify([
+        {
+            "total_price": total,
+            "travel_class": outbound[1],
+            "outbound": _leg(outbound),
+            "return": _leg(inbound),
+        }
+        for total, outbound, inbound in itineraries
+    ])
+
+def _leg(row):
+    record, _, price = row
+    return {
+        "flight_id": record.flight_id,
+        "source": record.source,
+        "destination": record.destination,
+        "departure": record.departure_str,
+        "arrival": record.arrival_str,
+        "airplane_type": record.airplane_type,
+        "price": price,
+    }
+
+@flights_bp.route("/connections", methods=["GET"])
+@inventory_version.conditional(inventory_version.search_etag)
+def search_connections():
+    source = request.args.get("source")
+    destination = request.args.get("destination")
+    if not source or not destination:
+        return jsonify({"error": "source and destination are required"}), 400
+
+    day = search_index.parse_day(request.args.get("date"))
+    if day is None:
+        return jsonify({"error": "date must be YYYY-MM-DD"}), 400
+
+    sort = request.args.get("sort", connections.CHEAPEST)
+    if sort not in connections.SORT_ORDERS:
+        return jsonify({"error": f"sort must be one of {', '.join(connections.SORT_ORDERS)}"}), 400
+
+    try:
+        max_connections = int(request.args.get("max_connections", 1))
+        min_connection = int(request.args.get("min_connection",
+                                              connections.DEFAULT_MIN_CONNECTION.seconds // 60))
+        limit = int(request.args.get("limit", connections.DEFAULT_RESULTS))
+    except ValueError:
+        return jsonify({"error": "max_connections, min_connection and limit must be integers"}), 400
+    if not 0 <= max_connections <= connections.MAX_CONNECTIONS:
+        return jsonify({"error": f"max_connections must be between 0 and {connections.MAX_CONNECTIONS}"}), 400
+    if min_connection < 0:
+        return jsonify({"error": "min_connection must not be negative"}), 400
+    if not 1 <= limit <= connections.MAX_RESULTS:
+        return jsonify({"error": f"limit must be between 1 and {connections.MAX_RESULTS}"}), 400
+
+    # The connection graph is the in-memory index; there is no SQL fallback
+    if not search_index.is_ready():
+        return jsonify({"error": "connection search is unavailable until the search index is loaded"}), 503
+
+    itineraries = connections.search(
+        source, destination, day,
+        max_connections=max_connections,
+        min_connection=timedelta(minutes=min_connection),
+        sort=sort,
+        travel_class=request.args.get("travel_class") or None,
+        k=limit,
+    )
+    return jsonify([
+        {
+            "total_price": itinerary.total_fare,
+            "departure": itinerary.departure.strftime(search_index.DISPLAY_FORMAT),
+            "arrival": itinerary.arrival.strftime(search_index.DISPLAY_FORMAT),
+            "connections": itinerary.connections,
+            "legs": [
+                dict(_leg((record, class_name, price)), travel_class=class_name)
+                for record, class_name, price in itinerary.legs
+            ],
+        }
+        for itinerary in itineraries
+    ])
 
-    cursor.execute(query, [source, destination])
+# Rebuild index entries after flights or fares change.
+# Body: {"flight_ids": ["PK301", ...]} refreshes just those; no body reloads all.
+@flights_bp.route("/index/refresh", methods=["POST"])
+def refresh_search_index():
+    if not search_index.ENABLED:
+        return jsonify({"error": "search index is disabled"}), 409
 
-    flights = []
-    for row in cursor:
-        flights.append({
-            "flight_id": row[0],
-            "source": row[1],
-            "destination": row[2],
-            "departure": row[3],
-            "arrival": row[4],
-            "airplane_type": row[5],
-            "lowest_price": row[6],
-            "travel_class": row[7]
-        })
+    payload = request.get_json(silent=True) or {}
+    flight_ids = payload.get("flight_ids")
 
-    cursor.close()
-    conn.close()
+    if flight_ids:
+        refreshed = search_index.refresh_flights(flight_ids)
+    else:
+        refreshed = search_index.reload()
 
-    return jsonify(flights)
+    return jsonify({"refreshed": refreshed, "indexed_flights": len(search_index.index)})
 
-# http://127.0.0.1:5000/flights/search?source=KHI&destination=DXB
\ No newline at end of file
+# http://127.0.0.1:5000/flights/search?source=KHI&destination=DXB
+# http://127.0.0.1:5000/flights/search?source=KHI&destination=DXB&date=2025-11-15
+# http://127.0.0.1:5000/flights/search?source=KHI&destination=DXB&limit=20  (next page: &cursor=<X-Next-Cursor>)
+# http://127.0.0.1:5000/flights/search?source=KHI&destination=DXB&format=ndjson
+# http://127.0.0.1:5000/flights/connections?source=KHI&destination=PEW&date=2025-11-15&max_connections=2&sort=earliest
+# http://127.0.0.1:5000/flights/round-trip?source=KHI&destination=DXB&date=2025-11-15&return_date=2025-11-20
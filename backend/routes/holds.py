@@ -0,0 +1,55 @@
+from flask import Blueprint, request, jsonify
+import seat_holds
+import seat_inventory
+
+holds_bp = Blueprint("holds", __name__)
+
+def _hold_body(flight_id, seat_ids, expires_in):
+    return {
+        "flight_id": flight_id,
+        "seat_ids": list(seat_ids),
+        "expires_in": None if expires_in is None else round(expires_in),
+    }
+
+# Body: {"seat_ids": ["PK301-8E", ...]} replaces this session's hold on the
+# flight (an empty list releases it); the hold lasts seat_holds.TTL seconds
+@holds_bp.route("/<flight_id>/hold", methods=["PUT"])
+def hold_seats(flight_id):
+    payload = request.get_json(silent=True) or {}
+    seat_ids = payload.get("seat_ids")
+    if not isinstance(seat_ids, list) or not all(isinstance(s, str) for s in seat_ids):
+        return jsonify({"error": "seat_ids must be a list of seat ids"}), 400
+    if len(set(seat_ids)) > seat_holds.MAX_SEATS:
+        return jsonify({"error": f"at most {seat_holds.MAX_SEATS} seats can be held"}), 400
+
+    seat_map = seat_inventory.get_seat_map(flight_id)
+    if not len(seat_map):
+        return jsonify({"error": "unknown flight"}), 404
+    unknown = [seat_id for seat_id in seat_ids if seat_id not in seat_map.positions]
+    if unknown:
+        return jsonify({"error": "unknown seats", "seat_ids": unknown}), 400
+
+    # Booked seats first (the seat map), then other sessions' holds
+    session = seat_holds.session_id()
+    taken = [seat_id for seat_id in seat_ids if seat_map.is_booked(seat_id)]
+    taken = taken or seat_holds.holds.hold(session, flight_id, seat_ids)
+    if taken:
+        return jsonify({"error": "seats are no longer available", "seat_ids": taken}), 409
+
+    return jsonify(_hold_body(flight_id, *seat_holds.holds.get(session, flight_id)))
+
+@holds_bp.route("/<flight_id>/hold", methods=["GET"])
+def get_hold(flight_id):
+    session = seat_holds.session_id(start=False)
+    if session is None:
+        return jsonify(_hold_body(flight_id, (), None))
+    return jsonify(_hold_body(flight_id, *seat_holds.holds.get(session, flight_id)))
+
+@holds_bp.route("/<flight_id>/hold", methods=["DELETE"])
+def release_hold(flight_id):
+    session = seat_holds.session_id(start=False)
+    released = seat_holds.holds.release(session, flight_id) if session else ()
+    return jsonify({"flight_id": flight_id, "released": list(released)})
+
+# curl -X PUT -H 'Content-Type: application/json' -d '{"seat_ids": ["PK301-8E"]}' \
+#      -c jar -b jar http://127.0.0.1:5000/flights/PK301/hold
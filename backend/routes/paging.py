@@ -0,0 +1,98 @@
+import base64
+import json
+
+from flask import Response, jsonify, request, stream_with_context
+
+# Upper bound for ?limit= so one page can never be the whole table
+MAX_PAGE_SIZE = 1000
+
+# Rows per fetch when streaming from a database cursor
+STREAM_ARRAYSIZE = 500
+
+
+# Element types of a sort key, for checking a decoded cursor
+NUMBER = (int, float)
+TEXT = (str,)
+
+
+class PageError(ValueError):
+    pass
+
+
+def encode_cursor(key):
+    # Opaque continuation token: the sort key of the last row served
+    raw = json.dumps(list(key), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token, key_types):
+    # key_types: one tuple of accepted types per sort key element (NUMBER,
+    # TEXT); a token of another shape is a client error, not a 500 from
+    # comparing it with real keys
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise PageError("cursor is not valid")
+    if not isinstance(key, list) or len(key) != len(key_types):
+        raise PageError("cursor is not valid")
+    for value, types in zip(key, key_types):
+        if isinstance(value, bool) or not isinstance(value, types):
+            raise PageError("cursor is not valid")
+    return tuple(key)
+
+
+def page_args(key_types, args=None):
+    # -> (limit or None, after_key or None, stream?) from the query string
+    # (the current request's, unless another mapping is passed). key_types
+    # describes the endpoint's sort key, see decode_cursor().
+    args = request.args if args is None else args
+    limit = args.get("limit")
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise PageError("limit must be an integer")
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise PageError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+    token = args.get("cursor")
+    after = decode_cursor(token, key_types) if token else None
+
+    stream = args.get("format") == "ndjson"
+    return limit, after, stream
+
+
+def json_page(items, limit, sort_key):
+    # items may hold one extra row (limit + 1) to tell whether more exist.
+    # The body stays a plain JSON list; the next page's token goes in a header.
+    next_cursor = None
+    if limit is not None and len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(sort_key(items[-1]))
+
+    response = jsonify(items)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
+
+
+def ndjson_response(items):
+    # One JSON object per line, produced lazily from any iterable
+    def generate():
+        for item in items:
+            yield json.dumps(item, default=str) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+def iter_cursor(cursor, arraysize=STREAM_ARRAYSIZE):
+    # Rows in arraysize batches, so memory stays flat however many rows match
+    try:
+        while True:
+            rows = cursor.fetchmany(arraysize)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        cursor.close()
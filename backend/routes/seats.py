@@ -1,38 +1,73 @@
+from itertools import islice
+
 from flask import Blueprint, jsonify
-from oracle import get_connection
+import db
+from db import get_connection
+import flight_summary
+import inventory_version
+import seat_holds
+import seat_inventory
+from routes.paging import TEXT, PageError, json_page, ndjson_response, page_args
 
 seats_bp = Blueprint("seats", __name__)
 
+# Seats held by a checkout session (seat_holds.py) are marked is_held and
+# count as unavailable, so the tags also follow the flight's holds
+
 @seats_bp.route("/<flight_id>/seats", methods=["GET"])
+@inventory_version.conditional(seat_holds.flight_etag)
 def get_seats(flight_id):
-    conn = get_connection()
-    cur = conn.cursor()
-
-    query = """
-    SELECT
-        s.seat_id,
-        tc.name AS class_name,
-        fc.cost
-    FROM main_seatdetails s
-    JOIN main_travelclass tc ON s.travel_class_id = tc.travel_class_id
-    LEFT JOIN main_flightcost fc ON fc.seat_id = s.seat_id
-    WHERE s.flight_id = :1
-    ORDER BY tc.name, s.seat_id
-    """
-
-    cur.execute(query, [flight_id])
-    rows = cur.fetchall()
-
-    seats = [
-        {
-            "seat_id": r[0],
-            "class": r[1],
-            "price": r[2],
-        }
-        for r in rows
-    ]
+    try:
+        limit, after, stream = page_args(SEAT_KEY_TYPES)
+    except PageError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    seats = seat_rows(seat_inventory.get_seat_map(flight_id), after, seat_holds.holds.held(flight_id))
+
+    if stream:
+        return ndjson_response(islice(seats, limit) if limit else seats)
+
+    page = list(islice(seats, limit + 1) if limit else seats)
+    return json_page(page, limit, seat_key)
 
-    cur.close()
-    conn.close()
+@seats_bp.route("/<flight_id>/seat-map", methods=["GET"])
+@inventory_version.conditional(seat_holds.flight_etag)
+def get_seat_map(flight_id):
+    # Compact form for booking.html (see SeatMap.compact): a run per
+    # cabin section and one bit per seat instead of an object per seat
+    seat_map = seat_inventory.get_seat_map(flight_id)
+    if not len(seat_map):
+        return jsonify({"error": "unknown flight"}), 404
 
-    return jsonify(seats)
\ No newline at end of file
+    cursor = get_connection().cursor()
+    try:
+        counts = flight_summary.seats_left(cursor, flight_id)
+    finally:
+        cursor.close()
+    compact = seat_map.compact(seat_holds.holds.held(flight_id))
+    return jsonify(dict(compact, seats_left=class_seats_left(counts)))
+
+# Shared with the asyncio app (asgi.py)
+def seat_key(seat):
+    return (seat["class"], seat["seat_id"])
+
+SEAT_KEY_TYPES = (TEXT, TEXT)
+
+def class_seats_left(counts):
+    # {travel_class_id: n} from flight_summary -> {class name: n}
+    return {db.reference.class_name(class_id, class_id): left for class_id, left in counts.items()}
+
+def seat_rows(seat_map, after=None, held=frozenset()):
+    # Same order the SQL used to return: by class name, then seat id
+    return (
+        {
+            "seat_id": seat_id,
+            "class": class_name,
+            "price": price,
+            "is_booked": bool(is_booked),
+            "is_held": seat_id in held,
+        }
+        for seat_id, class_name, price, is_booked
+        in sorted(seat_map.rows(), key=lambda r: (r[1], r[0]))
+        if after is None or (class_name, seat_id) > after
+    )
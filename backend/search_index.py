@@ -0,0 +1,446 @@
+"""Process-local flight search index.
+
+Flights are kept by (source, destination, departure day) with city names,
+times and the lowest fare per travel class already attached (as dated
+periods, see fares.py), so a search is a dict lookup instead of a
+five-way join and a GROUP BY over every seat. The index is loaded once
+at startup and refreshed per flight when flights or fares change; until
+it is loaded, callers fall back to SQL.
+
+Each flight also carries the seats left per class, read from the
+flight_summary counters together with the flight's inventory_version.
+Every booking and cancellation bumps that version, so search() re-reads
+the counters of just the flights whose version moved before answering;
+with SHARED_INVENTORY set the versions are host-wide and this covers
+bookings made by any worker (asgi.py included). Sold-out classes are
+left out of every search. Connection searches (connections.py) use the
+counters as last read; the conditional counter update at booking time is
+what actually stops a class being oversold.
+"""
+import logging
+import os
+import threading
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta
+
+import db
+from db import get_connection, DatabaseError
+import fares
+import inventory_version
+
+log = logging.getLogger(__name__)
+
+ENABLED = os.environ.get("SEARCH_INDEX", "on").lower() not in ("0", "off", "false")
+
+DISPLAY_FORMAT = "%Y-%m-%d %H:%M"
+
+# Accepted spellings for dates coming from the search form and JSON API
+DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%Y")
+
+# Bounds used for the open side of a departure window
+OPEN_START = datetime(1900, 1, 1)
+OPEN_END = datetime(9999, 12, 31)
+
+_LOAD_QUERY = """
+    SELECT
+        f.flight_id,
+        f.source_airport_id,
+        f.destination_airport_id,
+        f.departure_date_time,
+        f.arrival_date_time,
+        f.airplane_type
+    FROM main_flightdetails f
+    {where}
+"""
+
+# Every fare period of every seat, for the same flights as _LOAD_QUERY
+_FARES_QUERY = """
+    SELECT
+        f.flight_id,
+        s.travel_class_id,
+        fc.seat_id,
+        fc.valid_from_date,
+        fc.valid_to_date,
+        fc.cost
+    FROM main_flightdetails f
+    JOIN main_seatdetails s    ON s.flight_id              = f.flight_id
+    JOIN main_flightcost fc    ON fc.seat_id               = s.seat_id
+    {where}
+"""
+
+# Booked-seat counters per class, for the same flights as _LOAD_QUERY
+_SEATS_QUERY = """
+    SELECT
+        f.flight_id,
+        fs.travel_class_id,
+        fs.seats_total - fs.seats_booked
+    FROM main_flightdetails f
+    JOIN main_flightclasssummary fs ON fs.flight_id = f.flight_id
+    {where}
+"""
+
+
+class FlightRecord:
+    __slots__ = (
+        "flight_id",
+        "source",
+        "destination",
+        "source_city",
+        "destination_city",
+        "departure",
+        "arrival",
+        "airplane_type",
+        "class_fares",
+        "seats_left",
+        "seats_version",
+    )
+
+    def __init__(self, flight_id, source, destination, source_city,
+                 destination_city, departure, arrival, airplane_type):
+        self.flight_id = flight_id
+        self.source = source
+        self.destination = destination
+        self.source_city = source_city
+        self.destination_city = destination_city
+        self.departure = departure
+        self.arrival = arrival
+        self.airplane_type = airplane_type
+        self.class_fares = ()   # ((class_name, fares.FarePeriods of the lowest fare), ...)
+        self.seats_left = {}    # class_name -> seats still for sale (replaced, never mutated)
+        self.seats_version = None   # inventory_version of the flight when seats_left was read
+
+    @property
+    def key(self):
+        return (self.source, self.destination, self.departure.date())
+
+    @property
+    def fares(self):
+        # ((class_name, lowest_fare), ...) cheapest first, for the classes
+        # with a fare valid on this flight's quote day and seats left (a
+        # class without a counter yet is not treated as sold out)
+        day = fares.quote_day(self.departure)
+        quotes = []
+        for class_name, periods in self.class_fares:
+            if self.seats_left.get(class_name, 1) <= 0:
+                continue
+            lowest = periods.on(day)
+            if lowest is not None:
+                quotes.append((class_name, lowest))
+        quotes.sort(key=lambda fare: fare[1])
+        return tuple(quotes)
+
+    @property
+    def departure_str(self):
+        return self.departure.strftime(DISPLAY_FORMAT)
+
+    @property
+    def arrival_str(self):
+        return self.arrival.strftime(DISPLAY_FORMAT)
+
+    def __lt__(self, other):
+        return (self.departure, self.flight_id) < (other.departure, other.flight_id)
+
+
+def read_records(cursor, where="", params=None):
+    # -> {flight_id: FlightRecord} for flights matching the WHERE clause
+    def run(query):
+        if params is None:
+            cursor.execute(query.format(where=where))
+        else:
+            cursor.execute(query.format(where=where), params)
+
+    # City and class names come from the reference cache, not joins
+    reference = db.reference
+    run(_LOAD_QUERY)
+    records = {
+        flight_id: FlightRecord(flight_id, source, destination,
+                                reference.airport_city(source, source),
+                                reference.airport_city(destination, destination),
+                                departure, arrival, airplane_type)
+        for flight_id, source, destination, departure, arrival, airplane_type in cursor
+    }
+
+    # flight_id -> class_name -> seat_id -> [(valid_from, valid_to, cost)]
+    periods = {}
+    run(_FARES_QUERY)
+    for flight_id, class_id, seat_id, valid_from, valid_to, cost in cursor:
+        class_name = reference.class_name(class_id, class_id)
+        periods.setdefault(flight_id, {}).setdefault(class_name, {}) \
+            .setdefault(seat_id, []).append((valid_from, valid_to, cost))
+
+    for flight_id, classes in periods.items():
+        record = records.get(flight_id)
+        if record is None:
+            continue
+        record.class_fares = tuple(
+            (class_name, fares.lowest([fares.FarePeriods(p) for p in seats.values()]))
+            for class_name, seats in sorted(classes.items())
+        )
+
+    # Versions first: a booking that lands after them is seen next time
+    for flight_id, record in records.items():
+        record.seats_version = _seats_version(flight_id)
+    run(_SEATS_QUERY)
+    for flight_id, class_id, left in cursor:
+        record = records.get(flight_id)
+        if record is not None:
+            record.seats_left[reference.class_name(class_id, class_id)] = left
+    return records
+
+
+def _seats_version(flight_id):
+    return inventory_version.flight_version(flight_id)[0]
+
+
+def seats_query(flight_ids):
+    # -> (sql, binds) re-reading the seat counters of these flights
+    binds = ", ".join(f":{i}" for i in range(1, len(flight_ids) + 1))
+    return _SEATS_QUERY.format(where=f"WHERE f.flight_id IN ({binds})"), list(flight_ids)
+
+
+def fare_rows(records):
+    # One (record, class_name, lowest_fare) row per flight and class,
+    # cheapest first -- the same shape the SQL search returns.
+    rows = [
+        (record, class_name, lowest)
+        for record in records
+        for class_name, lowest in record.fares
+    ]
+    # Ties broken by flight and class so the order is total (the JSON
+    # API pages through it with a keyset cursor)
+    rows.sort(key=lambda row: (row[2], row[0].flight_id, row[1]))
+    return rows
+
+
+class SearchIndex:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_key = {}     # (source, destination, day) -> [FlightRecord] by departure
+        self._by_route = {}   # (source, destination) -> sorted [day, ...]
+        self._by_flight = {}  # flight_id -> FlightRecord
+        # source -> [(departure, flight_id, FlightRecord)] by departure: every
+        # flight leaving an airport, i.e. the edges of the connection graph
+        self._by_origin = {}
+        self.loaded = False
+
+    # ----------------- BUILDING -----------------
+
+    @staticmethod
+    def _fetch(cursor, flight_ids=None):
+        if flight_ids:
+            binds = ", ".join(f":{i}" for i in range(1, len(flight_ids) + 1))
+            return read_records(cursor, f"WHERE f.flight_id IN ({binds})", list(flight_ids))
+        return read_records(cursor)
+
+    def _unlink(self, record):
+        # Replace lists rather than mutating them so readers never see a
+        # half-updated bucket.
+        key = record.key
+        bucket = [r for r in self._by_key.get(key, ()) if r.flight_id != record.flight_id]
+        if bucket:
+            self._by_key[key] = bucket
+        else:
+            self._by_key.pop(key, None)
+            days = [d for d in self._by_route.get(key[:2], ()) if d != key[2]]
+            if days:
+                self._by_route[key[:2]] = days
+            else:
+                self._by_route.pop(key[:2], None)
+        self._by_flight.pop(record.flight_id, None)
+
+        departures = [d for d in self._by_origin.get(record.source, ()) if d[1] != record.flight_id]
+        if departures:
+            self._by_origin[record.source] = departures
+        else:
+            self._by_origin.pop(record.source, None)
+
+    def _link(self, record, origin=True):
+        key = record.key
+        bucket = list(self._by_key.get(key, ()))
+        insort(bucket, record)
+        if len(bucket) == 1:
+            days = list(self._by_route.get(key[:2], ()))
+            insort(days, key[2])
+            self._by_route[key[:2]] = days
+        self._by_key[key] = bucket
+        self._by_flight[record.flight_id] = record
+
+        if origin:
+            departures = list(self._by_origin.get(record.source, ()))
+            insort(departures, (record.departure, record.flight_id, record))
+            self._by_origin[record.source] = departures
+
+    def load(self, conn):
+        cursor = conn.cursor()
+        cursor.arraysize = 1000
+        records = self._fetch(cursor)
+        cursor.close()
+
+        # Build off to the side and swap in, so searches during a reload
+        # see either the old index or the new one.
+        fresh = SearchIndex()
+        for record in records.values():
+            fresh._link(record, origin=False)
+            fresh._by_origin.setdefault(record.source, []).append(
+                (record.departure, record.flight_id, record)
+            )
+        for departures in fresh._by_origin.values():
+            departures.sort()
+
+        with self._lock:
+            self._by_key = fresh._by_key
+            self._by_route = fresh._by_route
+            self._by_flight = fresh._by_flight
+            self._by_origin = fresh._by_origin
+            self.loaded = True
+        inventory_version.bump(*records)
+        return len(records)
+
+    def refresh(self, conn, flight_ids):
+        # Re-read just these flights; ids no longer in the database drop out.
+        flight_ids = list(dict.fromkeys(flight_ids))
+        if not flight_ids:
+            return 0
+        cursor = conn.cursor()
+        records = self._fetch(cursor, flight_ids)
+        cursor.close()
+
+        with self._lock:
+            for flight_id in flight_ids:
+                old = self._by_flight.get(flight_id)
+                if old is not None:
+                    self._unlink(old)
+                new = records.get(flight_id)
+                if new is not None:
+                    self._link(new)
+        inventory_version.bump(*flight_ids)
+        return len(records)
+
+    # ----------------- LOOKUPS -----------------
+
+    def get(self, flight_id):
+        return self._by_flight.get(flight_id)
+
+    def flights(self, source, destination, start_day=None, end_day=None):
+        # Flights departing between start_day and end_day (inclusive; None
+        # leaves that side open). Only days inside the window are touched.
+        days = self._by_route.get((source, destination), ())
+        lo = bisect_left(days, start_day) if start_day is not None else 0
+        hi = bisect_right(days, end_day) if end_day is not None else len(days)
+
+        flights = []
+        for day in days[lo:hi]:
+            flights.extend(self._by_key.get((source, destination, day), ()))
+        return flights
+
+    def departures(self, source, start, end):
+        # Flights leaving source with start <= departure < end (datetimes)
+        departures = self._by_origin.get(source, ())
+        lo = bisect_left(departures, (start,))
+        hi = bisect_left(departures, (end,))
+        return [d[2] for d in departures[lo:hi]]
+
+    def search(self, source, destination, start_day=None, end_day=None):
+        return fare_rows(self.flights(source, destination, start_day, end_day))
+
+    # ----------------- SEAT COUNTERS -----------------
+
+    @staticmethod
+    def stale_seats(records):
+        # {flight_id: current version} of the records whose seat counters
+        # were read before their flight's last booking or cancellation
+        versions = {}
+        for record in records:
+            version = _seats_version(record.flight_id)
+            if version != record.seats_version:
+                versions[record.flight_id] = version
+        return versions
+
+    def set_seats(self, versions, rows):
+        # versions from stale_seats(), rows from seats_query() run after it
+        reference = db.reference
+        seats_left = {flight_id: {} for flight_id in versions}
+        for flight_id, class_id, left in rows:
+            seats_left[flight_id][reference.class_name(class_id, class_id)] = left
+        with self._lock:
+            for flight_id, version in versions.items():
+                record = self._by_flight.get(flight_id)
+                if record is not None:
+                    record.seats_left = seats_left[flight_id]
+                    record.seats_version = version
+
+    def __len__(self):
+        return len(self._by_flight)
+
+
+index = SearchIndex()
+
+
+def parse_day(value):
+    # 'YYYY-MM-DD' (or the datepicker's MM/DD/YYYY) -> date; None if unusable
+    if not value:
+        return None
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value.strip(), fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def departure_window(start_day, end_day):
+    # Half-open [start, end) datetime bounds for a sargable range predicate
+    # on departure_date_time. An open side (None) becomes a far-away
+    # sentinel so the SQL text, and its cached plan, never changes.
+    start = datetime.combine(start_day, datetime.min.time()) if start_day else OPEN_START
+    end = datetime.combine(end_day + timedelta(days=1), datetime.min.time()) if end_day else OPEN_END
+    return start, end
+
+
+def is_ready():
+    return ENABLED and index.loaded
+
+
+def init_app(app):
+    # Warm the index at startup. If the database is unreachable the app
+    # still starts and searches use SQL until the index is reloaded.
+    if not ENABLED:
+        return
+    with app.app_context():
+        try:
+            count = index.load(get_connection())
+            log.info("Search index loaded with %d flights", count)
+        except DatabaseError as exc:
+            log.warning("Search index not loaded, falling back to SQL: %s", exc)
+
+
+def refresh_flights(flight_ids):
+    # Call after flights or fares change, with the affected flight ids.
+    if not is_ready():
+        return 0
+    return index.refresh(get_connection(), flight_ids)
+
+
+def fresh_seats(records):
+    # Re-read the seat counters of the records that are behind their
+    # flight's version (one query for all of them); asgi.py does the same
+    # over async_db
+    versions = index.stale_seats(records)
+    if versions:
+        cursor = get_connection().cursor()
+        cursor.execute(*seats_query(list(versions)))
+        index.set_seats(versions, cursor.fetchall())
+        cursor.close()
+    return records
+
+
+def search(source, destination, start_day=None, end_day=None):
+    # SearchIndex.search() with current seat counters
+    return fare_rows(fresh_seats(index.flights(source, destination, start_day, end_day)))
+
+
+def reload():
+    if not ENABLED:
+        return 0
+    return index.load(get_connection())
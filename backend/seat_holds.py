@@ -0,0 +1,198 @@
+"""Temporary seat holds during checkout.
+
+A customer who picks seats on the booking page gets them held for
+HOLD_TTL seconds, keyed to a checkout session cookie, so nobody else can
+pick the same seats before the form is submitted. Held seats show as
+unavailable in /flights/<id>/seat-map and /flights/<id>/seats; booking
+takes the seats through the same hold (acquiring it if the page never
+did) and drops it once the reservation commits, so the seats go straight
+from held to booked.
+
+Holds expire from a heap ordered by deadline: every call first pops the
+holds that are due, so expiry costs O(log n) per hold and nothing ever
+scans. Re-holding (changing the selection or extending it) replaces the
+hold, and the old heap entry is skipped when it comes up.
+
+Holds live in this process, next to the booking routes (asgi.py does not
+serve holds and its seat endpoints do not show them). Run the booking
+app as one process per host, or route a checkout session to one worker,
+for holds to cover every request; the booking itself never relies on a
+hold for correctness, only _claim_seats and the unique index do.
+"""
+import heapq
+import itertools
+import os
+import secrets
+import threading
+import time
+from datetime import datetime, timezone
+
+from flask import g, request
+
+import inventory_version
+
+TTL = float(os.environ.get("HOLD_TTL", "600"))           # seconds
+MAX_SEATS = int(os.environ.get("HOLD_MAX_SEATS", "9"))    # per session and flight
+
+COOKIE = "checkout_session"
+
+# Hold versions live in this process only, like inventory_version's
+_EPOCH = format(int(time.time()), "x")
+
+
+class _Hold:
+    __slots__ = ("session", "flight_id", "seat_ids", "expires")
+
+    def __init__(self, session, flight_id, seat_ids, expires):
+        self.session = session
+        self.flight_id = flight_id
+        self.seat_ids = seat_ids      # tuple, in the order they were picked
+        self.expires = expires        # time.monotonic() deadline
+
+
+class HoldRegistry:
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._holds = {}       # (session, flight_id) -> _Hold
+        self._by_flight = {}   # flight_id -> {seat_id: _Hold}
+        self._heap = []        # (expires, seq, _Hold); superseded entries skipped
+        self._seq = itertools.count()
+        self._versions = {}    # flight_id -> (version, last_modified)
+        self.expired = 0
+
+    # ----------------- INTERNALS (caller holds _lock) -----------------
+
+    def _changed(self, flight_id):
+        version, _ = self._versions.get(flight_id, (0, None))
+        self._versions[flight_id] = (version + 1, datetime.now(timezone.utc).replace(microsecond=0))
+
+    def _drop(self, hold):
+        del self._holds[(hold.session, hold.flight_id)]
+        seats = self._by_flight[hold.flight_id]
+        for seat_id in hold.seat_ids:
+            if seats.get(seat_id) is hold:
+                del seats[seat_id]
+        if not seats:
+            del self._by_flight[hold.flight_id]
+        self._changed(hold.flight_id)
+
+    def _expire(self):
+        now = self.clock()
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            _, _, hold = heapq.heappop(heap)
+            if self._holds.get((hold.session, hold.flight_id)) is hold:
+                self._drop(hold)
+                self.expired += 1
+
+    def _others(self, session, flight_id, seat_ids):
+        seats = self._by_flight.get(flight_id, {})
+        return [seat_id for seat_id in seat_ids
+                if seat_id in seats and seats[seat_id].session != session]
+
+    # ----------------- API -----------------
+
+    def hold(self, session, flight_id, seat_ids, ttl=TTL):
+        # Replace the session's hold on this flight with these seats.
+        # -> seats held by other sessions (nothing changes then), or []
+        seat_ids = tuple(dict.fromkeys(seat_ids))
+        with self._lock:
+            self._expire()
+            taken = self._others(session, flight_id, seat_ids)
+            if taken:
+                return taken
+
+            old = self._holds.get((session, flight_id))
+            if old is not None:
+                self._drop(old)
+            if seat_ids:
+                hold = _Hold(session, flight_id, seat_ids, self.clock() + ttl)
+                self._holds[(session, flight_id)] = hold
+                seats = self._by_flight.setdefault(flight_id, {})
+                for seat_id in seat_ids:
+                    seats[seat_id] = hold
+                heapq.heappush(self._heap, (hold.expires, next(self._seq), hold))
+                self._changed(flight_id)
+            return []
+
+    def release(self, session, flight_id):
+        # Drop the session's hold on this flight -> the seat ids it held
+        with self._lock:
+            self._expire()
+            hold = self._holds.get((session, flight_id))
+            if hold is None:
+                return ()
+            self._drop(hold)
+            return hold.seat_ids
+
+    def get(self, session, flight_id):
+        # -> (seat_ids, seconds left) of the session's hold, or ((), None)
+        with self._lock:
+            self._expire()
+            hold = self._holds.get((session, flight_id))
+            if hold is None:
+                return (), None
+            return hold.seat_ids, hold.expires - self.clock()
+
+    def held(self, flight_id):
+        # Seat ids on this flight held by any session
+        with self._lock:
+            self._expire()
+            return frozenset(self._by_flight.get(flight_id, ()))
+
+    def version(self, flight_id):
+        # (version, last_modified) of the flight's holds; 0 if never held
+        with self._lock:
+            self._expire()
+            return self._versions.get(flight_id, (0, None))
+
+    def stats(self):
+        with self._lock:
+            self._expire()
+            return {
+                "holds": len(self._holds),
+                "seats": sum(len(seats) for seats in self._by_flight.values()),
+                "heap": len(self._heap),
+                "expired": self.expired,
+            }
+
+
+holds = HoldRegistry()
+
+
+def flight_etag(flight_id):
+    # inventory_version.flight_etag plus the flight's hold version, for
+    # the seat endpoints: a seat being held or let go changes what they show
+    etag, last_modified = inventory_version.flight_etag(flight_id)
+    version, changed = holds.version(flight_id)
+    if not version:
+        return etag, last_modified
+    return f"{etag}-h{_EPOCH}.{version}", max(last_modified, changed)
+
+
+# ----------------- CHECKOUT SESSION -----------------
+
+def session_id(start=True):
+    # The request's checkout session, started (and the cookie set on the
+    # way out, see init_app) if it does not have one yet; None instead if
+    # start is False
+    session = request.cookies.get(COOKIE)
+    if session and len(session) <= 64:
+        return session
+    if not start:
+        return g.get("checkout_session")
+    if "checkout_session" not in g:
+        g.checkout_session = secrets.token_urlsafe(18)
+    return g.checkout_session
+
+
+def init_app(app):
+    @app.after_request
+    def set_session_cookie(response):
+        session = g.pop("checkout_session", None)
+        if session is not None:
+            response.set_cookie(COOKIE, session, httponly=True, samesite="Lax",
+                                secure=request.is_secure)
+        return response
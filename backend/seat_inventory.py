@@ -0,0 +1,466 @@
+"""Per-flight seat availability kept in memory.
+
+Each flight's seats are laid out once in seat_id order; class and fare
+periods live in static per-seat arrays and bookings in a bit array indexed by the
+same position. The map is built from the database the first time a
+flight is viewed and updated in place when a reservation commits, so the
+seat map no longer needs a GROUP BY over main_reservation per page view.
+
+With SHARED_INVENTORY set, the bits and resolved fares of each map live
+in a file mapped by every worker (see shared_inventory.py) instead, so
+all workers see one copy. A flight the file has no room for is built
+from the database on every view rather than kept in this process, where
+other workers' bookings would never reach it.
+"""
+import asyncio
+import base64
+import re
+import threading
+from array import array
+
+import db
+from db import get_connection
+import fares
+import inventory_version
+import shared_inventory
+
+_SEATS_QUERY = """
+    SELECT
+        s.seat_id,
+        s.travel_class_id,
+        f.departure_date_time
+    FROM main_seatdetails s
+    JOIN main_flightdetails f
+        ON f.flight_id = s.flight_id
+    WHERE s.flight_id = :1
+    ORDER BY s.seat_id
+"""
+
+_FARES_QUERY = """
+    SELECT
+        fc.seat_id,
+        fc.valid_from_date,
+        fc.valid_to_date,
+        fc.cost
+    FROM main_flightcost fc
+    JOIN main_seatdetails s ON s.seat_id = fc.seat_id
+    WHERE s.flight_id = :1
+"""
+
+_BOOKED_QUERY = """
+    SELECT DISTINCT r.seat_id
+    FROM main_reservation r
+    JOIN main_seatdetails s ON s.seat_id = r.seat_id
+    WHERE s.flight_id = :1
+      AND r.status = 'A'
+"""
+
+NO_FARE = float("nan")
+
+# "12C" -> (12, "C"), for putting seat codes in cabin order
+_SEAT_CODE = re.compile(r"(\d+)(\D+)$")
+
+
+class SeatMap:
+    __slots__ = ("flight_id", "seat_ids", "positions", "class_names",
+                 "class_ids", "seat_class", "departure", "periods", "fares", "fares_day",
+                 "booked", "_wire", "_lock")
+
+    def __init__(self, flight_id, seat_rows, departure=None, seat_periods=None):
+        # seat_rows: [(seat_id, class_name, travel_class_id), ...] in seat_id order;
+        # seat_periods: {seat_id: fares.FarePeriods}
+        self.flight_id = flight_id
+        self.seat_ids = tuple(row[0] for row in seat_rows)
+        self.positions = {seat_id: i for i, seat_id in enumerate(self.seat_ids)}
+
+        class_names = []
+        class_ids = []
+        class_pos = {}
+        self.seat_class = array("B")
+        for _, class_name, class_id in seat_rows:
+            if class_name not in class_pos:
+                class_pos[class_name] = len(class_names)
+                class_names.append(class_name)
+                class_ids.append(class_id)
+            self.seat_class.append(class_pos[class_name])
+        self.class_names = tuple(class_names)
+        self.class_ids = tuple(class_ids)
+
+        # Every fare period per seat; `fares` holds the ones valid on
+        # fares_day, re-resolved when the quote day moves on
+        self.departure = departure
+        seat_periods = seat_periods or {}
+        self.periods = tuple(seat_periods.get(seat_id) for seat_id in self.seat_ids)
+        self.fares = array("d")
+        self.fares_day = None
+
+        self.booked = bytearray((len(self.seat_ids) + 7) // 8)
+        self._wire = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.seat_ids)
+
+    # ----------------- BITS -----------------
+
+    def _is_set(self, pos):
+        return self.booked[pos >> 3] >> (pos & 7) & 1
+
+    def _bits(self):
+        # The bitmask as of now, for reading many seats at once
+        return self.booked
+
+    def is_booked(self, seat_id):
+        pos = self.positions.get(seat_id)
+        return pos is not None and bool(self._is_set(pos))
+
+    def mark_booked(self, seat_ids, booked=True):
+        with self._lock:
+            for seat_id in seat_ids:
+                pos = self.positions.get(seat_id)
+                if pos is None:
+                    continue
+                if booked:
+                    self.booked[pos >> 3] |= 1 << (pos & 7)
+                else:
+                    self.booked[pos >> 3] &= ~(1 << (pos & 7)) & 0xFF
+
+    def class_id_for(self, seat_id):
+        pos = self.positions.get(seat_id)
+        return None if pos is None else self.class_ids[self.seat_class[pos]]
+
+    def booked_count(self):
+        return sum(bin(byte).count("1") for byte in self._bits())
+
+    def stale(self):
+        # True once the map must be rebuilt from the database
+        return False
+
+    # ----------------- FARES -----------------
+
+    def _quote_day(self):
+        return fares.quote_day(self.departure) if self.departure else None
+
+    def _resolve(self, day):
+        quotes = (None if p is None else p.on(day) for p in self.periods)
+        return array("d", (NO_FARE if q is None else float(q) for q in quotes))
+
+    def _current_fares(self):
+        day = self._quote_day()
+        if day != self.fares_day:
+            # Swap in whole so readers never see a half-resolved array
+            self.fares, self.fares_day = self._resolve(day), day
+        return self.fares
+
+    def fare(self, pos):
+        fare = self._current_fares()[pos]
+        return None if fare != fare else fare   # NaN -> no fare valid today
+
+    def fare_for(self, seat_id):
+        # Exact fare as stored (not the float copy) valid on the quote day
+        pos = self.positions.get(seat_id)
+        if pos is None or self.periods[pos] is None:
+            return None
+        return self.periods[pos].on(fares.quote_day(self.departure))
+
+    # ----------------- VIEWS -----------------
+
+    def rows(self):
+        # (seat_id, class_name, fare, is_booked) in seat_id order -- the
+        # tuple shape booking.html has always consumed.
+        seat_fares = self._current_fares()
+        bits = self._bits()
+        return [
+            (
+                seat_id,
+                self.class_names[self.seat_class[pos]],
+                None if seat_fares[pos] != seat_fares[pos] else seat_fares[pos],
+                bits[pos >> 3] >> (pos & 7) & 1,
+            )
+            for pos, seat_id in enumerate(self.seat_ids)
+        ]
+
+    # ----------------- WIRE FORMAT -----------------
+
+    def _layout(self):
+        # (layout, prefix, positions in layout order), worked out once.
+        # The layout names the cabin by row runs, e.g.
+        # "1-3:ABCD,4-30:ABCDEF" (rows 1 to 3 with seats A-D, ...); a seat
+        # code that is not <row><letter> gets a "~CODE" entry of its own.
+        # Every flight flown with the same cabin has the same layout.
+        if self._wire is None:
+            prefix = f"{self.flight_id}-"
+            if not all(seat_id.startswith(prefix) for seat_id in self.seat_ids):
+                prefix = ""
+            codes = [seat_id[len(prefix):] for seat_id in self.seat_ids]
+            parsed = [_SEAT_CODE.match(code) for code in codes]
+
+            def cabin_order(pos):
+                match = parsed[pos]
+                return (0, codes[pos], "") if match is None else (int(match.group(1)), "", match.group(2))
+
+            order = tuple(sorted(range(len(codes)), key=cabin_order))
+
+            sections = []   # [first row, last row, letters] or [code]
+            for pos in order:
+                match = parsed[pos]
+                if match is None:
+                    sections.append([codes[pos]])
+                    continue
+                row, letter = int(match.group(1)), match.group(2)
+                if len(letter) > 1 or (sections and len(sections[-1]) == 3
+                                       and sections[-1][1] == row and letter in sections[-1][2]):
+                    sections.append([f"{row}{letter}"])   # not a one-letter seat: spell it out
+                elif sections and len(sections[-1]) == 3 and sections[-1][1] == row:
+                    sections[-1][2] += letter
+                else:
+                    sections.append([row, row, letter])
+            # Merge consecutive rows with the same seats into one run
+            merged = []
+            for section in sections:
+                last = merged[-1] if merged else None
+                if (last and len(last) == 3 and len(section) == 3 and last[1] + 1 == section[0]
+                        and last[2] == section[2]):
+                    last[1] = section[1]
+                else:
+                    merged.append(section)
+            layout = ",".join(
+                f"~{section[0]}" if len(section) == 1
+                else f"{section[0]}:{section[2]}" if section[0] == section[1]
+                else f"{section[0]}-{section[1]}:{section[2]}"
+                for section in merged
+            )
+            self._wire = (layout, prefix, order)
+        return self._wire
+
+    def compact(self, held=()):
+        # The seat map in a few hundred bytes whatever the aircraft size:
+        # the layout, class/fare runs and base64 booked and held (seat ids
+        # in `held`, see seat_holds.py) bitmasks, all in layout order
+        # (bit i % 8 of byte i // 8 = seat i)
+        layout, prefix, order = self._layout()
+        seat_fares = self._current_fares()
+        bits = self._bits()
+        held_at = {self.positions[seat_id] for seat_id in held if seat_id in self.positions}
+
+        runs = []
+        booked = bytearray((len(order) + 7) // 8)
+        held_bits = bytearray(len(booked))
+        for i, pos in enumerate(order):
+            fare = seat_fares[pos]
+            fare = None if fare != fare else int(fare) if fare.is_integer() else fare
+            if runs and runs[-1][1] == self.seat_class[pos] and runs[-1][2] == fare:
+                runs[-1][0] += 1
+            else:
+                runs.append([1, self.seat_class[pos], fare])
+            if bits[pos >> 3] >> (pos & 7) & 1:
+                booked[i >> 3] |= 1 << (i & 7)
+            if pos in held_at:
+                held_bits[i >> 3] |= 1 << (i & 7)
+
+        return {
+            "flight_id": self.flight_id,
+            "layout": layout,
+            "prefix": prefix,
+            "classes": list(self.class_names),
+            "runs": runs,            # [seat count, class index, fare]
+            "booked": base64.b64encode(booked).decode(),
+            "held": base64.b64encode(held_bits).decode(),
+        }
+
+
+class SharedSeatMap(SeatMap):
+    # A SeatMap whose booked bits and resolved fares are a block of
+    # shared_inventory.segment. Seat ids, classes and fare periods never
+    # change while the block lives, so each worker keeps its own copy of
+    # those; a block rebuilt in place has a new generation.
+    __slots__ = ("segment", "offset", "generation")
+
+    def __init__(self, seat_map, segment, offset, generation):
+        for name in ("flight_id", "seat_ids", "positions", "class_names", "class_ids",
+                     "seat_class", "departure", "periods", "_wire", "_lock"):
+            setattr(self, name, getattr(seat_map, name))
+        self.booked = None
+        self.fares = None
+        self.fares_day = None
+        self.segment = segment
+        self.offset = offset
+        self.generation = generation
+
+    def _is_set(self, pos):
+        return self.segment.is_set(self.offset, pos)
+
+    def _bits(self):
+        return self.segment.booked(self.offset)
+
+    def mark_booked(self, seat_ids, booked=True):
+        positions = [self.positions[seat_id] for seat_id in seat_ids if seat_id in self.positions]
+        self.segment.set_bits(self.offset, positions, booked)
+
+    def stale(self):
+        # Invalidated by some worker (and maybe rebuilt since, for a seat
+        # layout this map does not have): rebuild from the database
+        return self.segment.is_dead(self.offset) or self.segment.generation(self.offset) != self.generation
+
+    def _current_fares(self):
+        day = self._quote_day()
+        ordinal = day.toordinal() if day else 0
+        stored_day, seat_fares = self.segment.fares(self.offset)
+        if stored_day != ordinal:
+            # First worker to notice the quote day moved re-resolves for all
+            seat_fares = self._resolve(day)
+            self.segment.set_fares(self.offset, ordinal, seat_fares)
+        return seat_fares
+
+
+def _share(seat_map):
+    # Move a freshly built map's bits and fares into the shared segment
+    # (or adopt the block another worker already published for it)
+    segment = shared_inventory.segment
+    if segment is None:
+        return seat_map
+    seat_fares = seat_map._current_fares()
+    day = seat_map.fares_day
+    block = segment.attach(seat_map.flight_id, seat_map.booked, day.toordinal() if day else 0, seat_fares)
+    return seat_map if block is None else SharedSeatMap(seat_map, segment, *block)
+
+
+_maps = {}
+_maps_lock = threading.Lock()
+
+
+def _assemble(flight_id, rows, fare_rows, booked_rows):
+    periods = {}
+    for seat_id, valid_from, valid_to, cost in fare_rows:
+        periods.setdefault(seat_id, []).append((valid_from, valid_to, cost))
+
+    # Class names from the reference cache rather than a join per build
+    seat_map = SeatMap(
+        flight_id,
+        [(seat_id, db.reference.class_name(class_id, class_id), class_id) for seat_id, class_id, _ in rows],
+        rows[0][2] if rows else None,
+        {seat_id: fares.FarePeriods(p) for seat_id, p in periods.items()},
+    )
+    seat_map.mark_booked(row[0] for row in booked_rows)
+    return seat_map
+
+
+def _remember(seat_map):
+    if not len(seat_map):
+        # Unknown flight (or no seats yet): don't pin an empty map
+        return seat_map
+
+    with _maps_lock:
+        # Another request may have built it meanwhile; keep the first one
+        current = _maps.get(seat_map.flight_id)
+        if current is not None and not current.stale():
+            return current
+        seat_map = _share(seat_map)
+        if shared_inventory.segment is not None and not isinstance(seat_map, SharedSeatMap):
+            # No room in the segment: serve this build once, don't keep it
+            _maps.pop(seat_map.flight_id, None)
+            return seat_map
+        _maps[seat_map.flight_id] = seat_map
+        return seat_map
+
+
+def _build(conn, flight_id):
+    cursor = conn.cursor()
+    cursor.arraysize = 500
+    cursor.execute(_SEATS_QUERY, [flight_id])
+    rows = cursor.fetchall()
+    cursor.execute(_FARES_QUERY, [flight_id])
+    fare_rows = cursor.fetchall()
+    cursor.execute(_BOOKED_QUERY, [flight_id])
+    booked_rows = cursor.fetchall()
+    cursor.close()
+    return _assemble(flight_id, rows, fare_rows, booked_rows)
+
+
+def get_seat_map(flight_id):
+    seat_map = _maps.get(flight_id)
+    if seat_map is not None and not seat_map.stale():
+        return seat_map
+    return _remember(_build(get_connection(), flight_id))
+
+
+# ----------------- ASYNCIO -----------------
+# For asgi.py: the same maps, built over an async_db connection.
+# Concurrent misses on one flight share a single build.
+
+_pending = {}   # flight_id -> asyncio.Task building its map
+
+
+async def _build_async(connect, flight_id):
+    async with connect() as conn:
+        cursor = conn.cursor()
+        cursor.arraysize = 500
+        await cursor.execute(_SEATS_QUERY, [flight_id])
+        rows = await cursor.fetchall()
+        await cursor.execute(_FARES_QUERY, [flight_id])
+        fare_rows = await cursor.fetchall()
+        await cursor.execute(_BOOKED_QUERY, [flight_id])
+        booked_rows = await cursor.fetchall()
+        cursor.close()
+    return _remember(_assemble(flight_id, rows, fare_rows, booked_rows))
+
+
+async def get_seat_map_async(connect, flight_id):
+    # connect: async_db.connection, only entered on a cache miss
+    seat_map = _maps.get(flight_id)
+    if seat_map is not None and not seat_map.stale():
+        return seat_map
+
+    task = _pending.get(flight_id)
+    if task is None:
+        task = asyncio.ensure_future(_build_async(connect, flight_id))
+        _pending[flight_id] = task
+        task.add_done_callback(lambda _: _pending.pop(flight_id, None))
+    # shield: one caller going away must not cancel everyone else's build
+    return await asyncio.shield(task)
+
+
+def _update(flight_id, seat_ids, booked):
+    seat_map = _maps.get(flight_id)
+    if seat_map is not None:
+        seat_map.mark_booked(seat_ids, booked)
+    elif shared_inventory.segment is not None:
+        # Published by another worker, but this one has no seat positions
+        # for it: have everyone rebuild it from the database instead
+        shared_inventory.segment.kill([flight_id])
+    inventory_version.bump(flight_id)
+
+
+def mark_booked(flight_id, seat_ids):
+    # Call after the reservation transaction has committed.
+    _update(flight_id, seat_ids, True)
+
+
+def release(flight_id, seat_ids):
+    # Call after a cancellation commits.
+    _update(flight_id, seat_ids, False)
+
+
+def stats():
+    # Maps held by this process, and the shared segment's usage if any
+    segment = shared_inventory.segment
+    return {
+        "maps": len(_maps),
+        "shared": None if segment is None else segment.usage(),
+    }
+
+
+def invalidate(flight_id=None):
+    # Drop cached maps so the next view rebuilds them from the database
+    # (e.g. after seats or fares were edited outside this process).
+    with _maps_lock:
+        if flight_id is None:
+            flight_ids = list(_maps)
+            _maps.clear()
+        else:
+            flight_ids = [flight_id]
+            _maps.pop(flight_id, None)
+    if shared_inventory.segment is not None:
+        # Other workers' maps of these flights go stale too
+        shared_inventory.segment.kill(None if flight_id is None else flight_ids)
+    inventory_version.bump(*flight_ids)
@@ -1,6 +1,6 @@
 from datetime import datetime, date, timedelta
-from oracle import get_connection
-import oracledb
+from db import get_connection
+import flight_summary
 
 
 def seed():
@@ -53,26 +53,26 @@ def seed():
     flights = [
     (
         "PK301", "KHI", "DXB",
-        oracledb.Timestamp(2025, 11, 15, 10, 0, 0),
-        oracledb.Timestamp(2025, 11, 15, 14, 0, 0),
+        datetime(2025, 11, 15, 10, 0, 0),
+        datetime(2025, 11, 15, 14, 0, 0),
         "Airbus A320",
     ),
     (
         "PK302", "DXB", "KHI",
-        oracledb.Timestamp(2025, 11, 16, 18, 0, 0),
-        oracledb.Timestamp(2025, 11, 16, 22, 0, 0),
+        datetime(2025, 11, 16, 18, 0, 0),
+        datetime(2025, 11, 16, 22, 0, 0),
         "Boeing 737",
     ),
     (
         "PK101", "KHI", "LHE",
-        oracledb.Timestamp(2025, 11, 17, 9, 0, 0),
-        oracledb.Timestamp(2025, 11, 17, 10, 30, 0),
+        datetime(2025, 11, 17, 9, 0, 0),
+        datetime(2025, 11, 17, 10, 30, 0),
         "Airbus A320",
     ),
     (
         "PK102", "LHE", "KHI",
-        oracledb.Timestamp(2025, 11, 17, 18, 0, 0),
-        oracledb.Timestamp(2025, 11, 17, 19, 30, 0),
+        datetime(2025, 11, 17, 18, 0, 0),
+        datetime(2025, 11, 17, 19, 30, 0),
         "Boeing 737",
     ),
     ]
@@ -214,6 +214,9 @@ def seed():
         flight_costs,
     )
 
+    print("Building flight class summary...")
+    flight_summary.rebuild(cur)
+
     conn.commit()
     cur.close()
     conn.close()
@@ -0,0 +1,392 @@
+"""Seat inventory shared by every worker process on a host.
+
+With SHARED_INVENTORY set to a file path (best on tmpfs, e.g.
+/dev/shm/railway-inventory), seat_inventory keeps each flight's booked
+bitmask and resolved fare vector in that file, mmap'd by all workers,
+instead of in per-process arrays. The memory is paid once per host
+rather than once per worker, a booking made in one worker shows up in
+the others on their next read, and invalidating a flight reaches every
+worker. inventory_version reads its versions from here too, so an ETag
+issued by one worker is honoured (or refused) by all of them.
+
+Writes (publishing a flight, bookings, cancellations, fare re-resolves,
+version bumps) take an exclusive flock on the file, so there is a single
+writer at a time. Readers never lock: each flight block starts with a
+sequence number that is odd while a write is in progress (a seqlock), and
+a reader copies what it needs and retries if the sequence moved.
+
+Layout (little-endian):
+
+    header      magic, size, created, used, flights, slots, version, modified,
+                fallbacks
+    directory   slots x (flight_id, block offset)
+    blocks      per flight: seq, version, modified, seats, fares_day, dead,
+                generation, fares (float64 per seat), booked (bits, padded
+                to 8 bytes)
+
+Invalidating a flight marks its block dead. The next build of the flight
+rewrites that block in place when the seat count is unchanged (bumping
+its generation, so every worker drops the seat layout it had for it) and
+only appends a new block when the flight's seats were added or removed;
+the old block is then left dead. Space is never reclaimed otherwise, so
+recreate the file when it fills up or the database is reloaded:
+
+    python shared_inventory.py --reset
+
+A flight that does not fit is counted in the header's fallbacks and built
+from the database on every view instead (a process-local copy would miss
+the other workers' bookings); usage() and /stats/inventory show both the
+dead space and the fallbacks.
+"""
+import argparse
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+log = logging.getLogger(__name__)
+
+PATH = os.environ.get("SHARED_INVENTORY", "")
+SIZE = int(os.environ.get("SHARED_INVENTORY_MB", "64")) * 1024 * 1024
+SLOTS = int(os.environ.get("SHARED_INVENTORY_FLIGHTS", "65536"))
+
+_MAGIC = b"RMSINV01"
+_HEADER = struct.Struct("<8sQdQIIQdQ")    # 64 bytes
+_ENTRY = struct.Struct("<24sQ")            # flight_id, block offset
+_BLOCK = struct.Struct("<QQdIiII")         # seq, version, modified, seats, fares_day, dead, generation
+_SEQ = struct.Struct("<Q")
+_VERSION = struct.Struct("<Qd")            # version, modified (after seq in a block)
+_FARES_DAY = struct.Struct("<i")
+_DEAD = struct.Struct("<I")
+_GENERATION = struct.Struct("<I")
+_FALLBACKS = struct.Struct("<Q")
+
+# Offsets of the mutable header fields
+_USED_AT = 24
+_FLIGHTS_AT = 32
+_VERSION_AT = 40
+_FALLBACKS_AT = 56
+
+_FIELD_VERSION = _SEQ.size
+_FIELD_FARES_DAY = _SEQ.size + _VERSION.size + 4
+_FIELD_DEAD = _FIELD_FARES_DAY + 4
+_FIELD_GENERATION = _FIELD_DEAD + 4
+
+
+def _bitmask_size(seats):
+    return ((seats + 7) // 8 + 7) & ~7
+
+
+def _block_size(seats):
+    return _BLOCK.size + 8 * seats + _bitmask_size(seats)
+
+
+def _utc(timestamp):
+    return datetime.fromtimestamp(int(timestamp), timezone.utc)
+
+
+class Segment:
+
+    def __init__(self, path, size=SIZE, slots=SLOTS):
+        self.path = path
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            self._init_file(fd, size, slots)
+            self.size = os.fstat(fd).st_size
+            self.mm = mmap.mmap(fd, self.size)
+        finally:
+            os.close(fd)
+
+        _, _, self.created, _, _, self.slots, _, _, _ = _HEADER.unpack_from(self.mm, 0)
+        self.epoch = format(int(self.created), "x")
+
+        self._offsets = {}    # flight_id -> live block offset, as seen by this process
+        self._scanned = 0     # directory entries already read into _offsets
+        self._lock = threading.Lock()
+        self._lock_fd = None
+        self._lock_pid = None
+        self._warned = False
+
+    @staticmethod
+    def _init_file(fd, size, slots):
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            header = os.pread(fd, _HEADER.size, 0)
+            if len(header) == _HEADER.size and header[:8] == _MAGIC:
+                return
+            now = time.time()
+            os.ftruncate(fd, 0)
+            os.ftruncate(fd, size)
+            directory_end = _HEADER.size + slots * _ENTRY.size
+            os.pwrite(fd, _HEADER.pack(_MAGIC, size, now, directory_end, 0, slots, 0, now, 0), 0)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+    # ----------------- WRITER LOCK -----------------
+
+    @contextmanager
+    def _writer(self):
+        # flock excludes other processes, the thread lock other threads of
+        # this one. The lock fd is opened per process: a descriptor
+        # inherited across fork would share its flock with the parent.
+        with self._lock:
+            if self._lock_pid != os.getpid():
+                self._lock_fd = os.open(self.path, os.O_RDWR)
+                self._lock_pid = os.getpid()
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _writing(self, offset):
+        # Seqlock write section for one block (caller holds _writer)
+        seq = _SEQ.unpack_from(self.mm, offset)[0]
+        _SEQ.pack_into(self.mm, offset, seq + 1)
+        try:
+            yield
+        finally:
+            _SEQ.pack_into(self.mm, offset, seq + 2)
+
+    def _read(self, offset, copy):
+        # copy() retried until no write overlapped it
+        while True:
+            seq = _SEQ.unpack_from(self.mm, offset)[0]
+            if seq & 1:
+                time.sleep(0)
+                continue
+            value = copy()
+            if _SEQ.unpack_from(self.mm, offset)[0] == seq:
+                return value
+
+    # ----------------- DIRECTORY -----------------
+
+    def _scan(self):
+        # Pick up entries other processes appended since the last scan;
+        # a later entry for the same flight replaces a dead one
+        flights = struct.unpack_from("<I", self.mm, _FLIGHTS_AT)[0]
+        for n in range(self._scanned, flights):
+            raw_id, offset = _ENTRY.unpack_from(self.mm, _HEADER.size + n * _ENTRY.size)
+            self._offsets[raw_id.rstrip(b"\0").decode()] = offset
+        self._scanned = flights
+
+    def find(self, flight_id):
+        # Offset of the flight's live block, or None
+        offset = self._offsets.get(flight_id)
+        if offset is None or self.is_dead(offset):
+            self._scan()
+            offset = self._offsets.get(flight_id)
+        if offset is None or self.is_dead(offset):
+            return None
+        return offset
+
+    def _fill(self, offset, booked, fares_day, fares):
+        # Write a block's fares and bits (caller holds _writer)
+        seats = len(fares)
+        fares_at = offset + _BLOCK.size
+        self.mm[fares_at:fares_at + 8 * seats] = fares.tobytes()
+        booked_at = fares_at + 8 * seats
+        bitmask = _bitmask_size(seats)
+        self.mm[booked_at:booked_at + bitmask] = bytes(booked).ljust(bitmask, b"\0")
+        _FARES_DAY.pack_into(self.mm, offset + _FIELD_FARES_DAY, fares_day or 0)
+
+    def _refuse(self, flight_id):
+        # Count a flight that did not fit (caller holds _writer)
+        fallbacks = _FALLBACKS.unpack_from(self.mm, _FALLBACKS_AT)[0]
+        _FALLBACKS.pack_into(self.mm, _FALLBACKS_AT, fallbacks + 1)
+        if not self._warned:
+            self._warned = True
+            log.warning("Shared inventory %s is full; %s and any other flight that does not fit "
+                        "is read from the database on every view", self.path, flight_id)
+
+    def attach(self, flight_id, booked, fares_day, fares):
+        # Publish a freshly built flight -> (block offset, generation). If
+        # another worker published it first, its block wins (it has seen
+        # every booking since). None if the flight does not fit.
+        raw_id = flight_id.encode()
+        with self._writer():
+            offset = self.find(flight_id)
+            if offset is not None:
+                return offset, self.generation(offset)
+
+            seats = len(fares)
+            offset = self._offsets.get(flight_id)
+            if offset is not None and _BLOCK.unpack_from(self.mm, offset)[3] == seats:
+                # Its own dead block fits: rebuild in place. The version
+                # carries on (ETags must not repeat) and the generation
+                # moves, so workers holding the old layout rebuild theirs.
+                generation = self.generation(offset) + 1
+                with self._writing(offset):
+                    self._fill(offset, booked, fares_day, fares)
+                    version, _ = _VERSION.unpack_from(self.mm, offset + _FIELD_VERSION)
+                    _VERSION.pack_into(self.mm, offset + _FIELD_VERSION, version + 1, time.time())
+                    _GENERATION.pack_into(self.mm, offset + _FIELD_GENERATION, generation)
+                    _DEAD.pack_into(self.mm, offset + _FIELD_DEAD, 0)
+                return offset, generation
+
+            _, _, _, used, flights, _, _, _, _ = _HEADER.unpack_from(self.mm, 0)
+            if len(raw_id) > 24 or flights >= self.slots or used + _block_size(seats) > self.size:
+                self._refuse(flight_id)
+                return None
+
+            offset = used
+            _BLOCK.pack_into(self.mm, offset, 0, 0, time.time(), seats, 0, 0, 0)
+            self._fill(offset, booked, fares_day, fares)
+
+            # The entry goes in before the count that makes it visible
+            _ENTRY.pack_into(self.mm, _HEADER.size + flights * _ENTRY.size, raw_id, offset)
+            struct.pack_into("<Q", self.mm, _USED_AT, used + _block_size(seats))
+            struct.pack_into("<I", self.mm, _FLIGHTS_AT, flights + 1)
+        self._offsets[flight_id] = offset
+        return offset, 0
+
+    def kill(self, flight_ids=None):
+        # Mark blocks dead so every worker rebuilds those flights (all if None)
+        with self._writer():
+            self._scan()
+            ids = self._offsets if flight_ids is None else flight_ids
+            for flight_id in list(ids):
+                offset = self._offsets.get(flight_id)
+                if offset is not None:
+                    with self._writing(offset):
+                        _DEAD.pack_into(self.mm, offset + _FIELD_DEAD, 1)
+
+    def is_dead(self, offset):
+        return bool(_DEAD.unpack_from(self.mm, offset + _FIELD_DEAD)[0])
+
+    def generation(self, offset):
+        # Moves each time the block is rebuilt in place
+        return _GENERATION.unpack_from(self.mm, offset + _FIELD_GENERATION)[0]
+
+    # ----------------- BLOCKS -----------------
+
+    def _bits_at(self, offset):
+        seats = _BLOCK.unpack_from(self.mm, offset)[3]
+        start = offset + _BLOCK.size + 8 * seats
+        return start, start + (seats + 7) // 8
+
+    def is_set(self, offset, pos):
+        # One byte: always read whole, no retry needed
+        start, _ = self._bits_at(offset)
+        return self.mm[start + (pos >> 3)] >> (pos & 7) & 1
+
+    def booked(self, offset):
+        start, end = self._bits_at(offset)
+        return self._read(offset, lambda: self.mm[start:end])
+
+    def set_bits(self, offset, positions, booked=True):
+        start, _ = self._bits_at(offset)
+        with self._writer(), self._writing(offset):
+            for pos in positions:
+                at = start + (pos >> 3)
+                if booked:
+                    self.mm[at] |= 1 << (pos & 7)
+                else:
+                    self.mm[at] &= ~(1 << (pos & 7)) & 0xFF
+
+    def fares(self, offset):
+        # (fares_day ordinal or 0, array of float64 fares)
+        seats = _BLOCK.unpack_from(self.mm, offset)[3]
+        start = offset + _BLOCK.size
+
+        def copy():
+            return (_FARES_DAY.unpack_from(self.mm, offset + _FIELD_FARES_DAY)[0],
+                    array("d", self.mm[start:start + 8 * seats]))
+        return self._read(offset, copy)
+
+    def set_fares(self, offset, fares_day, fares):
+        start = offset + _BLOCK.size
+        with self._writer(), self._writing(offset):
+            self.mm[start:start + 8 * len(fares)] = fares.tobytes()
+            _FARES_DAY.pack_into(self.mm, offset + _FIELD_FARES_DAY, fares_day or 0)
+
+    # ----------------- VERSIONS -----------------
+
+    def bump(self, *flight_ids):
+        now = time.time()
+        with self._writer():
+            for flight_id in flight_ids:
+                offset = self.find(flight_id)
+                if offset is not None:
+                    version, _ = _VERSION.unpack_from(self.mm, offset + _FIELD_VERSION)
+                    _VERSION.pack_into(self.mm, offset + _FIELD_VERSION, version + 1, now)
+            version, _ = _VERSION.unpack_from(self.mm, _VERSION_AT)
+            _VERSION.pack_into(self.mm, _VERSION_AT, version + 1, now)
+
+    def flight_version(self, flight_id):
+        # (version, last_modified); a flight not published yet is at 0.
+        # A flight rebuilt in a new block restarts at 0, so its version is
+        # offset-qualified. Once some flight has not fit, an unpublished
+        # flight may be one that is being booked without a block, so it
+        # follows the global version instead.
+        offset = self.find(flight_id)
+        if offset is None:
+            if _FALLBACKS.unpack_from(self.mm, _FALLBACKS_AT)[0]:
+                version, modified = self.global_version()
+                return f"g{version}", modified
+            return 0, _utc(self.created)
+        version, modified = _VERSION.unpack_from(self.mm, offset + _FIELD_VERSION)
+        return f"{offset:x}.{version}", _utc(modified)
+
+    def global_version(self):
+        version, modified = _VERSION.unpack_from(self.mm, _VERSION_AT)
+        return version, _utc(modified)
+
+    def usage(self):
+        # Directory walk for the dead blocks: call it for stats, not per request
+        _, _, _, used, flights, _, _, _, fallbacks = _HEADER.unpack_from(self.mm, 0)
+        dead = dead_bytes = 0
+        for n in range(flights):
+            offset = _ENTRY.unpack_from(self.mm, _HEADER.size + n * _ENTRY.size)[1]
+            if self.is_dead(offset):
+                dead += 1
+                dead_bytes += _block_size(_BLOCK.unpack_from(self.mm, offset)[3])
+        return {
+            "flights": flights,
+            "slots": self.slots,
+            "bytes_used": used,
+            "bytes": self.size,
+            "dead_blocks": dead,
+            "dead_bytes": dead_bytes,
+            "fallbacks": fallbacks,
+            "full": bool(fallbacks),
+        }
+
+
+def reset(path=PATH):
+    # Start over with an empty file (workers map the new one on restart)
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+    return Segment(path)
+
+
+segment = Segment(PATH) if PATH else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--path", default=PATH, help="segment file (default: $SHARED_INVENTORY)")
+    parser.add_argument("--reset", action="store_true", help="recreate the file empty")
+    args = parser.parse_args(argv)
+    if not args.path:
+        parser.error("no segment file: set SHARED_INVENTORY or pass --path")
+
+    shared = reset(args.path) if args.reset else Segment(args.path)
+    usage = shared.usage()
+    print(f"{args.path}: {usage['flights']:,}/{usage['slots']:,} flights, "
+          f"{usage['bytes_used'] / 2**20:.1f}/{usage['bytes'] / 2**20:.0f} MB, "
+          f"{usage['dead_blocks']:,} dead ({usage['dead_bytes'] / 2**20:.1f} MB), "
+          f"{usage['fallbacks']:,} fallbacks")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+"""SQL instrumentation shared by the backend and main/ Flask apps.
+
+Connections handed out by db.acquire() (and main/db.py) are wrapped so
+every execute/executemany is timed and every fetched row counted, keyed
+by a normalised form of the statement text. Per request we also count
+round trips (Flask requests through g, ASGI ones inside request_scope()),
+and db.acquire() reports how long it waited for the pool.
+Statements slower than SLOW_QUERY_MS are logged with their bind values
+redacted. render() returns everything in Prometheus text format.
+The asyncio connections from async_db.py are wrapped the same way.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+
+from flask import Response, g, has_request_context
+
+slow_log = logging.getLogger("sql.slow")
+
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "250"))
+
+# Histogram upper bounds (seconds / counts); +Inf is implied
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+ROUND_TRIP_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+_BIND_LIST = re.compile(r"\(\s*:\w+(?:\s*,\s*:\w+)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "total", "count")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        i = 0
+        for bound in self.bounds:
+            if value <= bound:
+                break
+            i += 1
+        self.counts[i] += 1
+        self.total += value
+        self.count += 1
+
+    def lines(self, name, labels=""):
+        sep = "," if labels else ""
+        cumulative = 0
+        for bound, n in zip(self.bounds + ("+Inf",), self.counts):
+            cumulative += n
+            yield f'{name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}'
+        suffix = f"{{{labels}}}" if labels else ""
+        yield f"{name}_sum{suffix} {self.total:.6f}"
+        yield f"{name}_count{suffix} {self.count}"
+
+
+class StatementStats:
+    __slots__ = ("sql", "duration", "rows", "errors", "slow")
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.rows = 0
+        self.errors = 0
+        self.slow = 0
+
+
+_lock = threading.Lock()
+_statements = {}                               # statement id -> StatementStats
+_round_trips = Histogram(ROUND_TRIP_BUCKETS)   # per request
+_pool_wait = Histogram(DURATION_BUCKETS)
+
+# Round trips of the current non-Flask request, as a one-item list so
+# work handed to asyncio.to_thread (which copies the context) adds to it
+_scope_trips = ContextVar("sql_round_trips", default=None)
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(sql):
+    # -> (statement id, normalised text). IN-lists of any length share one
+    # entry, so "IN (:1, :2)" and "IN (:1, :2, :3)" are the same statement.
+    text = _SPACE.sub(" ", _BIND_LIST.sub("(:...)", sql)).strip()
+    return hashlib.sha1(text.encode()).hexdigest()[:10], text
+
+
+def redact(params, many=False):
+    # Bind *types* only -- values may be names, emails or card details
+    if many:
+        rows = list(params) if params is not None else []
+        return f"{len(rows)} rows of {redact(rows[0]) if rows else '[]'}"
+    if params is None:
+        return "[]"
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in params.items()) + "}"
+    return "[" + ", ".join(type(v).__name__ for v in params) + "]"
+
+
+def _stats_for(statement_id, text):
+    stats = _statements.get(statement_id)
+    if stats is None:
+        with _lock:
+            stats = _statements.setdefault(statement_id, StatementStats(text))
+    return stats
+
+
+def _count_round_trip():
+    if has_request_context():
+        g.sql_round_trips = g.get("sql_round_trips", 0) + 1
+        return
+    trips = _scope_trips.get()
+    if trips is not None:
+        trips[0] += 1
+
+
+def _observe_round_trips(trips):
+    if trips:
+        with _lock:
+            _round_trips.observe(trips)
+
+
+@contextmanager
+def request_scope():
+    # Counts the round trips of one request served outside Flask (asgi.py)
+    trips = [0]
+    token = _scope_trips.set(trips)
+    try:
+        yield
+    finally:
+        _scope_trips.reset(token)
+        _observe_round_trips(trips[0])
+
+
+def observe_pool_wait(seconds):
+    with _lock:
+        _pool_wait.observe(seconds)
+
+
+@contextmanager
+def _timed(sql, params, many=False):
+    # Time one execute/executemany against its statement's stats
+    statement_id, text = fingerprint(sql)
+    stats = _stats_for(statement_id, text)
+    _count_round_trip()
+
+    started = time.perf_counter()
+    try:
+        yield stats
+    except Exception:
+        with _lock:
+            stats.errors += 1
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        slow = elapsed * 1000.0 >= SLOW_QUERY_MS
+        with _lock:
+            stats.duration.observe(elapsed)
+            if slow:
+                stats.slow += 1
+        if slow:
+            slow_log.warning(
+                "slow query %.1f ms [%s] %s binds=%s",
+                elapsed * 1000.0, statement_id, text, redact(params, many),
+            )
+
+
+# ----------------- WRAPPERS -----------------
+
+class InstrumentedCursor:
+    __slots__ = ("_cursor", "_stats")
+
+    def __init__(self, cursor):
+        object.__setattr__(self, "_cursor", cursor)
+        object.__setattr__(self, "_stats", None)
+
+    # arraysize, prefetchrows, description, rowcount ... pass straight through
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._cursor, name, value)
+
+    def _run(self, method, sql, params, kwargs, many=False):
+        with _timed(sql, params or kwargs or None, many) as stats:
+            object.__setattr__(self, "_stats", stats)
+            if params is None:
+                return method(sql, **kwargs)
+            return method(sql, params, **kwargs)
+
+    def execute(self, sql, params=None, **kwargs):
+        return self._run(self._cursor.execute, sql, params, kwargs)
+
+    def executemany(self, sql, params, **kwargs):
+        return self._run(self._cursor.executemany, sql, params, kwargs, many=True)
+
+    def _add_rows(self, n):
+        if self._stats is not None and n:
+            with _lock:
+                self._stats.rows += n
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._add_rows(1)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        self._add_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._add_rows(len(rows))
+        return rows
+
+    def __iter__(self):
+        n = 0
+        try:
+            for row in self._cursor:
+                n += 1
+                yield row
+        finally:
+            self._add_rows(n)
+
+    def close(self):
+        self._cursor.close()
+
+
+class InstrumentedConnection:
+    __slots__ = ("_conn",)
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._conn.cursor(*args, **kwargs))
+
+    def commit(self):
+        _count_round_trip()
+        return self._conn.commit()
+
+    def rollback(self):
+        _count_round_trip()
+        return self._conn.rollback()
+
+    def close(self):
+        return self._conn.close()
+
+
+def wrap(conn):
+    return conn if conn is None or isinstance(conn, InstrumentedConnection) else InstrumentedConnection(conn)
+
+
+class AsyncInstrumentedCursor(InstrumentedCursor):
+    # Same accounting for asyncio cursors (oracledb AsyncCursor, or
+    # sqlite_db.AsyncCursor), whose execute and fetch calls are coroutines
+    __slots__ = ()
+
+    async def _run_async(self, method, sql, params, kwargs, many=False):
+        with _timed(sql, params or kwargs or None, many) as stats:
+            object.__setattr__(self, "_stats", stats)
+            if params is None:
+                return await method(sql, **kwargs)
+            return await method(sql, params, **kwargs)
+
+    async def execute(self, sql, params=None, **kwargs):
+        return await self._run_async(self._cursor.execute, sql, params, kwargs)
+
+    async def executemany(self, sql, params, **kwargs):
+        return await self._run_async(self._cursor.executemany, sql, params, kwargs, many=True)
+
+    async def fetchone(self):
+        row = await self._cursor.fetchone()
+        if row is not None:
+            self._add_rows(1)
+        return row
+
+    async def fetchmany(self, *args, **kwargs):
+        rows = await self._cursor.fetchmany(*args, **kwargs)
+        self._add_rows(len(rows))
+        return rows
+
+    async def fetchall(self):
+        rows = await self._cursor.fetchall()
+        self._add_rows(len(rows))
+        return rows
+
+
+class AsyncInstrumentedConnection(InstrumentedConnection):
+    __slots__ = ()
+
+    def cursor(self, *args, **kwargs):
+        return AsyncInstrumentedCursor(self._conn.cursor(*args, **kwargs))
+
+    async def commit(self):
+        _count_round_trip()
+        return await self._conn.commit()
+
+    async def rollback(self):
+        _count_round_trip()
+        return await self._conn.rollback()
+
+    async def close(self):
+        return await self._conn.close()
+
+
+def wrap_async(conn):
+    return conn if conn is None or isinstance(conn, AsyncInstrumentedConnection) else AsyncInstrumentedConnection(conn)
+
+
+# ----------------- EXPOSITION -----------------
+
+def _end_request(exc=None):
+    # teardown_request runs after a streamed body is fully sent, so rows
+    # fetched by an ndjson generator still count toward this request
+    _observe_round_trips(g.pop("sql_round_trips", 0))
+
+
+def _label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render():
+    with _lock:
+        statements = sorted(_statements.items())
+        lines = [
+            "# HELP sql_statement_duration_seconds Time spent in execute/executemany per statement.",
+            "# TYPE sql_statement_duration_seconds histogram",
+        ]
+        for statement_id, stats in statements:
+            lines.extend(stats.duration.lines("sql_statement_duration_seconds", f'statement="{statement_id}"'))
+
+        for name, attr, help_text in (
+            ("sql_statement_rows_fetched_total", "rows", "Rows fetched per statement."),
+            ("sql_statement_errors_total", "errors", "Executions that raised per statement."),
+            ("sql_slow_queries_total", "slow", f"Executions slower than {SLOW_QUERY_MS:g} ms per statement."),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for statement_id, stats in statements:
+                lines.append(f'{name}{{statement="{statement_id}"}} {getattr(stats, attr)}')
+
+        lines.append("# HELP sql_statement_info Normalised SQL text for each statement id.")
+        lines.append("# TYPE sql_statement_info gauge")
+        for statement_id, stats in statements:
+            lines.append(f'sql_statement_info{{statement="{statement_id}",sql="{_label(stats.sql)}"}} 1')
+
+        lines.append("# HELP sql_round_trips_per_request Database round trips made by one HTTP request.")
+        lines.append("# TYPE sql_round_trips_per_request histogram")
+        lines.extend(_round_trips.lines("sql_round_trips_per_request"))
+
+        lines.append("# HELP sql_pool_wait_seconds Time spent waiting to check a connection out.")
+        lines.append("# TYPE sql_pool_wait_seconds histogram")
+        lines.extend(_pool_wait.lines("sql_pool_wait_seconds"))
+    return "\n".join(lines) + "\n"
+
+
+def metrics_response():
+    return Response(render(), mimetype="text/plain; version=0.0.4")
+
+
+def init_app(app):
+    app.teardown_request(_end_request)
@@ -0,0 +1,370 @@
+"""In-process SQLite stand-in for the Oracle schema.
+
+The schema comes from main/models.py (via the Django migrations) and the
+Oracle-only bits of our SQL (TO_CHAR, NVL, SYSDATE, TRUNC, TO_DATE and
+:1-style binds) are shimmed, so the same queries run unchanged on a box
+without a database server.
+"""
+import asyncio
+import os
+import re
+import sqlite3
+import sys
+import threading
+from datetime import date, datetime
+from functools import lru_cache
+
+IntegrityError = sqlite3.IntegrityError
+DatabaseError = sqlite3.DatabaseError
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# ":memory:" maps to one shared-cache database for the whole process
+MEMORY_URI = "file:flights?mode=memory&cache=shared"
+
+_bootstrapped = set()
+_bootstrap_lock = threading.Lock()
+_keepalive = {}   # path -> connection keeping a shared in-memory db alive
+
+_stats_lock = threading.Lock()
+_open_connections = 0
+
+
+# ----------------- TYPE ADAPTERS -----------------
+# Store datetimes the way Django's sqlite backend does, and hand DATE /
+# TIMESTAMP columns back as Python objects like oracledb would.
+
+sqlite3.register_adapter(datetime, lambda v: v.isoformat(" "))
+sqlite3.register_adapter(date, lambda v: v.isoformat())
+sqlite3.register_converter("datetime", lambda v: datetime.fromisoformat(v.decode()))
+sqlite3.register_converter("date", lambda v: date.fromisoformat(v.decode()[:10]))
+
+
+# ----------------- ORACLE FUNCTION SHIMS -----------------
+
+# Longest tokens first so HH24 wins over HH and MM over M-anything
+_ORACLE_FORMAT = [
+    ("YYYY", "%Y"),
+    ("HH24", "%H"),
+    ("HH12", "%I"),
+    ("MON", "%b"),
+    ("MM", "%m"),
+    ("DD", "%d"),
+    ("HH", "%I"),
+    ("MI", "%M"),
+    ("SS", "%S"),
+    ("AM", "%p"),
+    ("PM", "%p"),
+]
+_FORMAT_RE = re.compile("|".join(token for token, _ in _ORACLE_FORMAT))
+_FORMAT_MAP = dict(_ORACLE_FORMAT)
+
+
+@lru_cache(maxsize=64)
+def _strftime_format(oracle_format):
+    return _FORMAT_RE.sub(lambda m: _FORMAT_MAP[m.group(0)], oracle_format)
+
+
+def _to_datetime(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
+
+def _to_char(value, fmt=None):
+    if value is None:
+        return None
+    if fmt is None:
+        return str(value)
+    return _to_datetime(value).strftime(_strftime_format(fmt))
+
+
+def _to_date(value, fmt=None):
+    if value is None:
+        return None
+    if fmt is None:
+        return _to_datetime(value).isoformat(" ")
+    parsed = datetime.strptime(value, _strftime_format(fmt))
+    # Date-only formats compare against TRUNC(...), which yields 'YYYY-MM-DD'
+    if "HH" in fmt or "MI" in fmt:
+        return parsed.isoformat(" ")
+    return parsed.date().isoformat()
+
+
+def _trunc(value):
+    if value is None:
+        return None
+    return _to_datetime(value).date().isoformat()
+
+
+def _sysdate():
+    return datetime.now().replace(microsecond=0).isoformat(" ")
+
+
+def _nvl(value, default):
+    return default if value is None else value
+
+
+# ----------------- SQL TRANSLATION -----------------
+
+_POSITIONAL_BIND_RE = re.compile(r"(?<![\w:]):(\d+)\b")
+_SYSDATE_RE = re.compile(r"\bSYSDATE\b(?!\s*\()", re.IGNORECASE)
+# SQLite locks the whole database on write, so row locks are a no-op here;
+# the unique indexes still catch any race.
+_FOR_UPDATE_RE = re.compile(r"\s+FOR\s+UPDATE(\s+SKIP\s+LOCKED|\s+NOWAIT)?", re.IGNORECASE)
+
+
+@lru_cache(maxsize=512)
+def translate(sql):
+    # :1 -> ?1 keeps positional binds positional; :name binds are native
+    sql = _POSITIONAL_BIND_RE.sub(r"?\1", sql)
+    sql = _SYSDATE_RE.sub("SYSDATE()", sql)
+    sql = _FOR_UPDATE_RE.sub("", sql)
+    return sql
+
+
+# ----------------- DB-API WRAPPERS -----------------
+
+class Cursor:
+    """Thin wrapper so callers can keep passing Oracle-flavoured SQL."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        # Accepted for oracledb compatibility; SQLite has no prefetch
+        self.prefetchrows = None
+
+    @property
+    def arraysize(self):
+        return self._cursor.arraysize
+
+    @arraysize.setter
+    def arraysize(self, value):
+        self._cursor.arraysize = value
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def execute(self, sql, params=None, **kwargs):
+        if kwargs:
+            params = kwargs
+        self._cursor.execute(translate(sql), params if params is not None else ())
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self._cursor.executemany(translate(sql), seq_of_params)
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=None):
+        if size is None:
+            return self._cursor.fetchmany()
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def close(self):
+        self._cursor.close()
+
+
+class Connection:
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._closed = False
+
+    def cursor(self):
+        return Cursor(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        global _open_connections
+        if self._closed:
+            return
+        self._closed = True
+        self._conn.close()
+        with _stats_lock:
+            _open_connections -= 1
+
+
+# ----------------- SCHEMA BOOTSTRAP -----------------
+
+def _database_name(path):
+    return MEMORY_URI if path == ":memory:" else path
+
+
+def bootstrap_schema(path):
+    # Run the main app's migrations against the SQLite file, so the schema
+    # always follows main/models.py. Done once per path per process.
+    if path in _bootstrapped:
+        return
+
+    with _bootstrap_lock:
+        if path in _bootstrapped:
+            return
+
+        name = _database_name(path)
+        if path == ":memory:" and path not in _keepalive:
+            _keepalive[path] = sqlite3.connect(name, uri=True, check_same_thread=False)
+
+        if REPO_ROOT not in sys.path:
+            sys.path.insert(0, REPO_ROOT)
+
+        import django
+        from django.conf import settings
+        from django.core.management import call_command
+
+        if not settings.configured:
+            settings.configure(
+                INSTALLED_APPS=["main"],
+                DATABASES={
+                    "default": {
+                        "ENGINE": "django.db.backends.sqlite3",
+                        "NAME": name,
+                    }
+                },
+                DEFAULT_AUTO_FIELD="django.db.models.BigAutoField",
+                USE_TZ=False,
+            )
+            django.setup()
+
+        call_command("migrate", "main", verbosity=0)
+        _bootstrapped.add(path)
+
+
+# ----------------- CONNECTIONS -----------------
+
+def connect(path):
+    global _open_connections
+    bootstrap_schema(path)
+
+    raw = sqlite3.connect(
+        _database_name(path),
+        uri=path == ":memory:",
+        detect_types=sqlite3.PARSE_DECLTYPES,
+        check_same_thread=False,
+        timeout=5.0,
+    )
+    raw.execute("PRAGMA foreign_keys = ON")
+    if path != ":memory:":
+        raw.execute("PRAGMA journal_mode = WAL")
+        raw.execute("PRAGMA synchronous = NORMAL")
+
+    raw.create_function("TO_CHAR", 1, _to_char, deterministic=True)
+    raw.create_function("TO_CHAR", 2, _to_char, deterministic=True)
+    raw.create_function("TO_DATE", 1, _to_date, deterministic=True)
+    raw.create_function("TO_DATE", 2, _to_date, deterministic=True)
+    raw.create_function("TRUNC", 1, _trunc, deterministic=True)
+    raw.create_function("NVL", 2, _nvl, deterministic=True)
+    raw.create_function("SYSDATE", 0, _sysdate)
+
+    with _stats_lock:
+        _open_connections += 1
+    return Connection(raw)
+
+
+def pool_counts():
+    # No pool: every checkout is a fresh (cheap) connection
+    with _stats_lock:
+        open_now = _open_connections
+    return {"busy": open_now, "open": open_now, "min": 0, "max": None}
+
+
+# ----------------- ASYNCIO -----------------
+# SQLite has no asyncio driver; each call runs on a worker thread so the
+# event loop is never blocked. Good enough for development and tests of
+# asgi.py -- the Oracle pool is the one built for concurrency.
+
+class AsyncCursor:
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    @property
+    def arraysize(self):
+        return self._cursor.arraysize
+
+    @arraysize.setter
+    def arraysize(self, value):
+        self._cursor.arraysize = value
+
+    @property
+    def prefetchrows(self):
+        return self._cursor.prefetchrows
+
+    @prefetchrows.setter
+    def prefetchrows(self, value):
+        self._cursor.prefetchrows = value
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    async def execute(self, sql, params=None, **kwargs):
+        await asyncio.to_thread(self._cursor.execute, sql, params, **kwargs)
+        return self
+
+    async def executemany(self, sql, seq_of_params):
+        await asyncio.to_thread(self._cursor.executemany, sql, seq_of_params)
+        return self
+
+    async def fetchone(self):
+        return await asyncio.to_thread(self._cursor.fetchone)
+
+    async def fetchmany(self, size=None):
+        return await asyncio.to_thread(self._cursor.fetchmany, size)
+
+    async def fetchall(self):
+        return await asyncio.to_thread(self._cursor.fetchall)
+
+    def close(self):
+        self._cursor.close()
+
+
+class AsyncConnection:
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self):
+        return AsyncCursor(self._conn.cursor())
+
+    async def commit(self):
+        await asyncio.to_thread(self._conn.commit)
+
+    async def rollback(self):
+        await asyncio.to_thread(self._conn.rollback)
+
+    async def close(self):
+        await asyncio.to_thread(self._conn.close)
+
+
+async def connect_async(path):
+    return AsyncConnection(await asyncio.to_thread(connect, path))
+
+
+async def close_async_pool():
+    pass
+
+
+def async_pool_counts():
+    return pool_counts()
@@ -0,0 +1,311 @@
+"""Deterministic synthetic dataset for load testing.
+
+Builds a schedule of every route between N airports, flown F times a day
+for D days, with a cabin layout per aircraft, a fare per seat and a
+booking fill rate. Everything is drawn from one seeded random.Random, so
+the same parameters always give the same rows.
+
+Seats, fares, passengers and reservations are produced in one pass and
+written with executemany in CHUNK_SIZE batches, committing after each, so
+memory does not grow with the dataset: millions of seats take minutes,
+not gigabytes. Run against an empty schema (ids are not checked).
+
+    python synthetic_data.py --airports 12 --days 30 --flights-per-route 4
+    python synthetic_data.py --layout FIR:2,BUS:4,ECO:30 --fill 0.8 --passengers 50000
+
+DB_BACKEND / SQLITE_PATH / ORACLE_* pick the database, as for the app.
+"""
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+
+AIRPORTS = [
+    ("KHI", "Karachi"), ("LHE", "Lahore"), ("ISB", "Islamabad"),
+    ("PEW", "Peshawar"), ("UET", "Quetta"), ("MUX", "Multan"),
+    ("DXB", "Dubai"), ("SKT", "Sialkot"), ("LYP", "Faisalabad"),
+    ("GWD", "Gwadar"), ("SKZ", "Sukkur"), ("BHV", "Bahawalpur"),
+]
+
+CLASSES = {
+    # travel_class_id: (name, base fare)
+    "FIR": ("First Class", 500),
+    "BUS": ("Business", 300),
+    "ECO": ("Economy", 100),
+}
+
+AIRCRAFT = ("Airbus A320", "Boeing 737", "Airbus A321")
+
+BASE_DAY = date(2025, 11, 10)
+
+# Rows per executemany (and per commit)
+CHUNK_SIZE = 20000
+
+
+class Layout:
+    # Cabin rows front to back: [(travel_class_id, rows), ...], every row
+    # with the same seat letters
+    __slots__ = ("cabins", "letters")
+
+    def __init__(self, cabins, letters="ABCDEF"):
+        unknown = [class_id for class_id, _ in cabins if class_id not in CLASSES]
+        if unknown:
+            raise ValueError(f"unknown travel class {unknown[0]!r} (expected one of {', '.join(CLASSES)})")
+        self.cabins = [(class_id, rows) for class_id, rows in cabins if rows > 0]
+        self.letters = letters
+
+    @classmethod
+    def parse(cls, text, letters="ABCDEF"):
+        # "BUS:3,FIR:2,ECO:25"
+        cabins = []
+        for part in text.split(","):
+            class_id, _, rows = part.strip().partition(":")
+            cabins.append((class_id.strip().upper(), int(rows)))
+        return cls(cabins, letters)
+
+    @classmethod
+    def from_rows(cls, rows):
+        # The benchmark's layout: rows 1-3 Business, 4-5 First, rest Economy
+        return cls([("BUS", min(rows, 3)), ("FIR", min(max(rows - 3, 0), 2)), ("ECO", max(rows - 5, 0))])
+
+    def seats(self):
+        # (row number, letter, travel_class_id) in seat order
+        row = 0
+        for class_id, rows in self.cabins:
+            for _ in range(rows):
+                row += 1
+                for letter in self.letters:
+                    yield row, letter, class_id
+
+    def capacity(self, class_id):
+        return sum(rows for cid, rows in self.cabins if cid == class_id) * len(self.letters)
+
+    def __len__(self):
+        return sum(rows for _, rows in self.cabins) * len(self.letters)
+
+    def __str__(self):
+        return ",".join(f"{class_id}:{rows}" for class_id, rows in self.cabins)
+
+
+class DatasetSpec:
+    __slots__ = ("airports", "days", "flights_per_route", "layout", "fill", "passengers", "start_day")
+
+    def __init__(self, airports=6, days=3, flights_per_route=2, layout=None, fill=0.3,
+                 passengers=None, start_day=BASE_DAY):
+        self.airports = max(2, airports)
+        self.days = days
+        self.flights_per_route = flights_per_route
+        self.layout = layout or Layout.from_rows(30)
+        self.fill = fill
+        # None: one passenger per reservation; N: reservations share a pool of N
+        self.passengers = passengers
+        self.start_day = start_day
+
+
+def airports(count):
+    # The named airports first, then made-up ones for larger networks
+    named = AIRPORTS[:count]
+    return named + [(f"X{n:02d}", f"City {n}") for n in range(len(named) + 1, count + 1)]
+
+
+def schedule(spec, rng):
+    # [(flight_id, source, destination, departure, arrival, airplane_type)]
+    # -- kept as a list: it is small next to the seats, and load generators
+    # pick flights from it
+    network = airports(spec.airports)
+    flights = []
+    for day in range(spec.days):
+        midnight = datetime.combine(spec.start_day + timedelta(days=day), datetime.min.time())
+        for src, _ in network:
+            for dst, _ in network:
+                if src == dst:
+                    continue
+                for n in range(spec.flights_per_route):
+                    departure = midnight + timedelta(hours=6 + n * 3, minutes=rng.choice((0, 15, 30, 45)))
+                    flights.append((
+                        f"B{len(flights) + 1:06d}", src, dst,
+                        departure, departure + timedelta(hours=rng.choice((1, 1.5, 2, 2.5))),
+                        rng.choice(AIRCRAFT),
+                    ))
+    return flights
+
+
+def _passenger(n):
+    return (
+        f"BP{n:07d}", "Bench", f"User{n}", "bench@example.com", "0300",
+        "Street", "Karachi", "Sindh", "75300", "Pakistan",
+    )
+
+
+# ----------------- WRITING -----------------
+
+_INSERTS = {
+    "seats": "INSERT INTO main_seatdetails (seat_id, travel_class_id, flight_id) VALUES (:1, :2, :3)",
+    "costs": "INSERT INTO main_flightcost (seat_id, valid_from_date, valid_to_date, cost) VALUES (:1, :2, :3, :4)",
+    "passengers": """
+        INSERT INTO main_passenger
+        (passenger_id, first_name, last_name, email, phone_number,
+         address, city, state, zipcode, country)
+        VALUES (:1, :2, :3, :4, :5, :6, :7, :8, :9, :10)
+    """,
+    "reservations": """
+        INSERT INTO main_reservation
+        (reservation_id, passenger_id, seat_id, date_of_reservation)
+        VALUES (:1, :2, :3, :4)
+    """,
+}
+
+
+class _ChunkWriter:
+    # One buffer per table. When any fills up, all are flushed in
+    # foreign-key order (seats before their fares and reservations,
+    # passengers before reservations) and the chunk is committed.
+    def __init__(self, conn, chunk_size, progress=None):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.buffers = {table: [] for table in _INSERTS}
+        self.counts = dict.fromkeys(_INSERTS, 0)
+
+    def add(self, table, row):
+        buffer = self.buffers[table]
+        buffer.append(row)
+        if len(buffer) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        for table, buffer in self.buffers.items():
+            if buffer:
+                self.cursor.executemany(_INSERTS[table], buffer)
+                self.counts[table] += len(buffer)
+                buffer.clear()
+        self.conn.commit()
+        if self.progress:
+            self.progress(self.counts)
+
+
+def generate(conn, spec, rng, chunk_size=CHUNK_SIZE, progress=None):
+    # Write the whole dataset through conn; -> (counts dict, flights)
+    network = airports(spec.airports)
+    layout = spec.layout
+    cur = conn.cursor()
+
+    cur.executemany(
+        "INSERT INTO main_airport (airport_id, airport_city, airport_country) VALUES (:1, :2, :3)",
+        [(code, city, "Pakistan") for code, city in network],
+    )
+    cur.executemany(
+        "INSERT INTO main_travelclass (travel_class_id, name, capacity) VALUES (:1, :2, :3)",
+        [(class_id, CLASSES[class_id][0], layout.capacity(class_id))
+         for class_id in dict.fromkeys(class_id for class_id, _ in layout.cabins)],
+    )
+
+    flights = schedule(spec, rng)
+    for start in range(0, len(flights), chunk_size):
+        cur.executemany(
+            """
+            INSERT INTO main_flightdetails
+            (flight_id, source_airport_id, destination_airport_id,
+             departure_date_time, arrival_date_time, airplane_type)
+            VALUES (:1, :2, :3, :4, :5, :6)
+            """,
+            flights[start:start + chunk_size],
+        )
+    conn.commit()
+
+    writer = _ChunkWriter(conn, chunk_size, progress)
+    if spec.passengers:
+        for n in range(1, spec.passengers + 1):
+            writer.add("passengers", _passenger(n))
+
+    # Valid on both the departure days and today, whichever FARE_DATE is used
+    valid_from = min(spec.start_day, date.today()) - timedelta(days=30)
+    valid_to = max(spec.start_day + timedelta(days=spec.days), date.today()) + timedelta(days=30)
+    seat_layout = list(layout.seats())
+    reservations = 0
+    for flight_id, *_ in flights:
+        for row, letter, class_id in seat_layout:
+            seat_id = f"{flight_id}-{row}{letter}"
+            writer.add("seats", (seat_id, class_id, flight_id))
+            writer.add("costs", (seat_id, valid_from, valid_to, CLASSES[class_id][1] + rng.randint(0, 50)))
+            if rng.random() < spec.fill:
+                reservations += 1
+                if spec.passengers:
+                    passenger_id = f"BP{rng.randint(1, spec.passengers):07d}"
+                else:
+                    passenger_id = _passenger(reservations)[0]
+                    writer.add("passengers", _passenger(reservations))
+                writer.add("reservations", (f"BR{reservations:07d}", passenger_id, seat_id, spec.start_day))
+    writer.flush()
+    writer.cursor.close()
+
+    import flight_summary
+    flight_summary.rebuild(cur)
+    conn.commit()
+    cur.close()
+
+    return {
+        "airports": len(network),
+        "flights": len(flights),
+        "seats": writer.counts["seats"],
+        "passengers": writer.counts["passengers"],
+        "reservations": writer.counts["reservations"],
+    }, flights
+
+
+# ----------------- CLI -----------------
+
+def add_arguments(parser):
+    # The dataset options, shared with benchmark.py
+    parser.add_argument("--airports", type=int, default=6,
+                        help="airports in the network (beyond %d they are made up)" % len(AIRPORTS))
+    parser.add_argument("--days", type=int, default=3, help="days of schedule")
+    parser.add_argument("--flights-per-route", type=int, default=2, help="flights per route per day")
+    parser.add_argument("--fill", type=float, default=0.3, help="fraction of seats already booked")
+    parser.add_argument("--seed", type=int, default=42, help="random seed")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    add_arguments(parser)
+    parser.add_argument("--layout", default=str(Layout.from_rows(30)),
+                        help="cabin rows front to back, e.g. FIR:2,BUS:4,ECO:24")
+    parser.add_argument("--seat-letters", default="ABCDEF", help="seats in every row")
+    parser.add_argument("--passengers", type=int,
+                        help="passenger pool shared by all reservations (default: one per reservation)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="rows per executemany and commit")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    spec = DatasetSpec(
+        airports=args.airports,
+        days=args.days,
+        flights_per_route=args.flights_per_route,
+        layout=Layout.parse(args.layout, args.seat_letters),
+        fill=args.fill,
+        passengers=args.passengers,
+    )
+
+    from db import get_connection
+
+    started = time.perf_counter()
+
+    def progress(counts):
+        elapsed = time.perf_counter() - started
+        print(f"  {counts['seats']:,} seats, {counts['reservations']:,} reservations "
+              f"({counts['seats'] / elapsed:,.0f} seats/s)", flush=True)
+
+    conn = get_connection()
+    counts, _ = generate(conn, spec, random.Random(args.seed), args.chunk_size, progress)
+    conn.close()
+
+    print(f"Generated {counts['flights']:,} flights, {counts['seats']:,} seats, "
+          f"{counts['passengers']:,} passengers and {counts['reservations']:,} reservations "
+          f"in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
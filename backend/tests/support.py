@@ -0,0 +1,104 @@
+"""Shared set-up for the backend tests.
+
+Importing this module points the backend at a throwaway SQLite database
+(and shared inventory segment) in a temporary directory, whatever the
+environment says, so the tests never touch a real Oracle schema. The
+first call to app() seeds it with a small synthetic schedule
+(benchmark.py) and imports the Flask app.
+
+Run from backend/:
+
+    python -m pytest tests
+"""
+import atexit
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+TMP_DIR = tempfile.mkdtemp(prefix="rms-tests-")
+_OWNER = os.getpid()
+# Only the process that made it removes it, not a forked child
+atexit.register(lambda: os.getpid() == _OWNER and shutil.rmtree(TMP_DIR, ignore_errors=True))
+os.environ["DB_BACKEND"] = "sqlite"
+os.environ["SQLITE_PATH"] = os.path.join(TMP_DIR, "flights.sqlite3")
+os.environ["SHARED_INVENTORY"] = os.path.join(TMP_DIR, "inventory")
+os.environ["SHARED_INVENTORY_MB"] = "4"
+os.environ["PAGE_CACHE_MB"] = "0"
+
+# Seeded schedule: airports KHI, LHE, ISB; one day of flights from 2025-11-10
+SEED_ARGS = ["--airports", "3", "--days", "1"]
+ROUTE = ("KHI", "LHE")
+DAY = "2025-11-10"
+
+_app = None
+
+
+def app():
+    global _app
+    if _app is None:
+        import benchmark
+        import db
+
+        conn = db.acquire()
+        try:
+            benchmark.seed_dataset(conn, benchmark.parse_args(SEED_ARGS), random.Random(1))
+        finally:
+            conn.close()
+
+        import app as flask_app
+        _app = flask_app.app
+    return _app
+
+
+def passenger_form(passengers, **fields):
+    # The booking form for `passengers` people, plus fields (seat_ids, ...)
+    form = {"passengers": str(passengers)}
+    for i in range(1, passengers + 1):
+        form.update({f"first_name_{i}": "Test", f"last_name_{i}": f"Passenger{i}",
+                     f"email_{i}": f"p{i}@example.com"})
+        for name in ("phone_number", "address", "city", "state", "zipcode", "country"):
+            form[f"{name}_{i}"] = "x"
+    form.update(fields)
+    return form
+
+
+def free_seats(flight_id, count, class_id=None):
+    # `count` seats of the flight that are neither booked nor held
+    import seat_holds
+    import seat_inventory
+
+    with app().app_context():
+        seat_map = seat_inventory.get_seat_map(flight_id)
+        held = seat_holds.holds.held(flight_id)
+        seats = [seat_id for seat_id in seat_map.seat_ids
+                 if not seat_map.is_booked(seat_id) and seat_id not in held
+                 and (class_id is None or seat_map.class_id_for(seat_id) == class_id)]
+    return seats[:count]
+
+
+def query(sql, params=()):
+    # Rows straight from the SQLite file, outside the app's connections
+    import sqlite3
+
+    conn = sqlite3.connect(os.environ["SQLITE_PATH"])
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+def execute(sql, params=()):
+    import sqlite3
+
+    conn = sqlite3.connect(os.environ["SQLITE_PATH"])
+    try:
+        conn.execute(sql, params)
+        conn.commit()
+    finally:
+        conn.close()
@@ -0,0 +1,62 @@
+import threading
+import unittest
+
+from tests import support
+
+
+class DoubleBookingTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = support.app()
+
+    def active_reservations(self, seat_id):
+        return support.query(
+            "SELECT COUNT(*) FROM main_reservation WHERE seat_id = ? AND status = 'A'", (seat_id,))[0][0]
+
+    def test_second_booking_of_a_seat_is_409(self):
+        seat_id, = support.free_seats("B000003", 1)
+        form = support.passenger_form(1, seat_ids=seat_id)
+
+        first = self.app.test_client().post("/book/B000003", data=form)
+        self.assertEqual(first.status_code, 200)
+        second = self.app.test_client().post("/book/B000003", data=form)
+        self.assertEqual(second.status_code, 409)
+        self.assertIn(b"just taken", second.data)
+        self.assertEqual(self.active_reservations(seat_id), 1)
+
+    def test_concurrent_bookings_of_a_seat_sell_it_once(self):
+        seat_id, = support.free_seats("B000004", 1)
+        form = support.passenger_form(1, seat_ids=seat_id)
+        statuses = []
+        start = threading.Barrier(4)
+
+        def book():
+            client = self.app.test_client()
+            start.wait()
+            statuses.append(client.post("/book/B000004", data=form).status_code)
+
+        threads = [threading.Thread(target=book) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(statuses), [200, 409, 409, 409])
+        self.assertEqual(self.active_reservations(seat_id), 1)
+
+    def test_cancelled_seat_can_be_booked_again(self):
+        seat_id, = support.free_seats("B000003", 1)
+        form = support.passenger_form(1, seat_ids=seat_id)
+        client = self.app.test_client()
+        self.assertEqual(client.post("/book/B000003", data=form).status_code, 200)
+
+        reservation_id, = support.query(
+            "SELECT reservation_id FROM main_reservation WHERE seat_id = ? AND status = 'A'", (seat_id,))[0]
+        self.assertEqual(client.post(f"/reservations/{reservation_id}/cancel").status_code, 200)
+        self.assertEqual(client.post(f"/reservations/{reservation_id}/cancel").status_code, 409)
+        self.assertEqual(client.post("/book/B000003", data=form).status_code, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
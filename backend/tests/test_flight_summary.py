@@ -0,0 +1,133 @@
+import unittest
+from datetime import date, timedelta
+
+from tests import support
+
+
+class QuoteDayTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = support.app()
+
+    def search(self):
+        from routes import flights
+
+        with self.app.app_context():
+            return list(flights._search_rows_sql(*support.ROUTE, date.fromisoformat(support.DAY),
+                                                 date.fromisoformat(support.DAY), None, None))
+
+    def test_rows_quoted_yesterday_are_requoted_on_read(self):
+        import flight_summary
+
+        expected = {(row["flight_id"], row["travel_class"]): row["lowest_price"] for row in self.search()}
+        yesterday = (date.today() - timedelta(days=1)).isoformat()
+        support.execute("UPDATE main_flightclasssummary SET min_fare = 1, quote_day = ?", (yesterday,))
+        flight_summary._current_day = None
+
+        rows = self.search()
+        self.assertEqual({(row["flight_id"], row["travel_class"]): row["lowest_price"] for row in rows},
+                         expected)
+        self.assertEqual(support.query("SELECT DISTINCT quote_day FROM main_flightclasssummary"),
+                         [(date.today().isoformat(),)])
+
+    def test_refresh_runs_once_a_day(self):
+        import db
+        import flight_summary
+
+        flight_summary._current_day = None
+        flight_summary.ensure_current(db.acquire)
+        self.assertFalse(flight_summary.stale())
+        support.execute("UPDATE main_flightclasssummary SET quote_day = NULL")
+        self.assertEqual(flight_summary.ensure_current(db.acquire), 0)
+        support.execute("UPDATE main_flightclasssummary SET quote_day = ?", (date.today().isoformat(),))
+
+    def test_flight_without_summary_rows_is_rebuilt_on_read(self):
+        import flight_summary
+
+        rows = support.query("SELECT * FROM main_flightclasssummary WHERE flight_id = 'B000002'")
+        support.execute("DELETE FROM main_flightclasssummary WHERE flight_id = 'B000002'")
+        flight_summary._current_day = None
+
+        self.assertIn("B000002", {row["flight_id"] for row in self.search()})
+        self.assertEqual(len(support.query(
+            "SELECT * FROM main_flightclasssummary WHERE flight_id = 'B000002'")), len(rows))
+
+
+class SeatCounterTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = support.app()
+
+    def counter(self, flight_id, class_id):
+        return support.query(
+            "SELECT seats_total, seats_booked FROM main_flightclasssummary"
+            " WHERE flight_id = ? AND travel_class_id = ?", (flight_id, class_id))[0]
+
+    def rebuild(self, flight_id):
+        import db
+        import flight_summary
+
+        conn = db.acquire()
+        try:
+            cursor = conn.cursor()
+            flight_summary.rebuild(cursor, [flight_id])
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
+
+    def test_sold_out_class_refuses_a_booking(self):
+        seat_id, = support.free_seats("B000005", 1, class_id="FIR")
+        total, booked = self.counter("B000005", "FIR")
+        support.execute("UPDATE main_flightclasssummary SET seats_booked = seats_total"
+                        " WHERE flight_id = 'B000005' AND travel_class_id = 'FIR'")
+        self.addCleanup(support.execute, "UPDATE main_flightclasssummary SET seats_booked = ?"
+                        " WHERE flight_id = 'B000005' AND travel_class_id = 'FIR'", (booked,))
+
+        response = self.app.test_client().post(
+            "/book/B000005", data=support.passenger_form(1, seat_ids=seat_id))
+        self.assertEqual(response.status_code, 409)
+        self.assertIn(b"just sold out", response.data)
+        self.assertEqual(support.query(
+            "SELECT COUNT(*) FROM main_reservation WHERE seat_id = ? AND status = 'A'", (seat_id,)),
+            [(0,)])
+        self.assertEqual(self.counter("B000005", "FIR"), (total, total))
+
+    def booked(self, flight_id, class_id):
+        return support.query(
+            "SELECT COUNT(*) FROM main_reservation r JOIN main_seatdetails s ON s.seat_id = r.seat_id"
+            " WHERE s.flight_id = ? AND s.travel_class_id = ? AND r.status = 'A'", (flight_id, class_id))[0][0]
+
+    def test_booking_a_flight_without_summary_rows_rebuilds_them(self):
+        business, = support.free_seats("B000004", 1, class_id="BUS")
+        economy, = support.free_seats("B000004", 1, class_id="ECO")
+        support.execute("DELETE FROM main_flightclasssummary WHERE flight_id = 'B000004'")
+
+        response = self.app.test_client().post(
+            "/book/B000004", data=support.passenger_form(2, seat_ids=f"{business},{economy}"))
+        self.assertEqual(response.status_code, 200)
+        # Rebuilt inside the booking: each class counted once, not twice
+        for class_id in ("BUS", "ECO", "FIR"):
+            with self.subTest(class_id=class_id):
+                self.assertEqual(self.counter("B000004", class_id)[1], self.booked("B000004", class_id))
+
+    def test_seats_total_is_capped_at_class_capacity(self):
+        seats = support.query("SELECT COUNT(*) FROM main_seatdetails"
+                              " WHERE flight_id = 'B000005' AND travel_class_id = 'FIR'")[0][0]
+        capacity = support.query("SELECT capacity FROM main_travelclass WHERE travel_class_id = 'FIR'")[0][0]
+        support.execute("UPDATE main_travelclass SET capacity = ? WHERE travel_class_id = 'FIR'", (seats - 2,))
+        self.addCleanup(self.rebuild, "B000005")
+        self.addCleanup(support.execute, "UPDATE main_travelclass SET capacity = ?"
+                        " WHERE travel_class_id = 'FIR'", (capacity,))
+
+        self.rebuild("B000005")
+        self.assertEqual(self.counter("B000005", "FIR")[0], seats - 2)
+        self.assertEqual(self.counter("B000005", "BUS")[0],
+                         min(18, support.query("SELECT COUNT(*) FROM main_seatdetails"
+                                               " WHERE flight_id = 'B000005' AND travel_class_id = 'BUS'")[0][0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+
+from tests import support
+
+
+class HoldRegistryTests(unittest.TestCase):
+
+    def setUp(self):
+        import seat_holds
+
+        self.now = [1000.0]
+        self.holds = seat_holds.HoldRegistry(clock=lambda: self.now[0])
+
+    def test_hold_expires_after_its_ttl(self):
+        self.assertEqual(self.holds.hold("a", "PK301", ["PK301-1A", "PK301-1B"], ttl=60), [])
+        self.assertEqual(self.holds.hold("b", "PK301", ["PK301-1B"], ttl=60), ["PK301-1B"])
+        version, _ = self.holds.version("PK301")
+
+        self.now[0] += 59
+        self.assertEqual(self.holds.held("PK301"), {"PK301-1A", "PK301-1B"})
+        self.now[0] += 1
+        self.assertEqual(self.holds.held("PK301"), frozenset())
+        self.assertEqual(self.holds.get("a", "PK301"), ((), None))
+        self.assertEqual(self.holds.stats()["expired"], 1)
+        self.assertGreater(self.holds.version("PK301")[0], version)
+        self.assertEqual(self.holds.hold("b", "PK301", ["PK301-1B"], ttl=60), [])
+
+    def test_re_holding_restarts_the_ttl(self):
+        self.holds.hold("a", "PK301", ["PK301-1A"], ttl=60)
+        self.now[0] += 50
+        self.holds.hold("a", "PK301", ["PK301-1A", "PK301-1C"], ttl=60)
+        self.now[0] += 50
+        self.assertEqual(self.holds.get("a", "PK301"), (("PK301-1A", "PK301-1C"), 10))
+        self.assertEqual(self.holds.stats()["expired"], 0)
+
+    def test_release_frees_the_seats(self):
+        self.holds.hold("a", "PK301", ["PK301-1A"], ttl=60)
+        self.assertEqual(self.holds.release("a", "PK301"), ("PK301-1A",))
+        self.assertEqual(self.holds.release("a", "PK301"), ())
+        self.assertEqual(self.holds.hold("b", "PK301", ["PK301-1A"], ttl=60), [])
+
+
+class HoldApiTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = support.app()
+
+    def test_held_seat_is_released_by_delete(self):
+        seat_id, = support.free_seats("B000001", 1)
+        first, second = self.app.test_client(), self.app.test_client()
+
+        response = first.put("/flights/B000001/hold", json={"seat_ids": [seat_id]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["seat_ids"], [seat_id])
+        self.assertEqual(first.get("/flights/B000001/hold").get_json()["seat_ids"], [seat_id])
+
+        taken = second.put("/flights/B000001/hold", json={"seat_ids": [seat_id]})
+        self.assertEqual(taken.status_code, 409)
+        self.assertEqual(taken.get_json()["seat_ids"], [seat_id])
+
+        self.assertEqual(first.delete("/flights/B000001/hold").get_json()["released"], [seat_id])
+        self.assertEqual(second.put("/flights/B000001/hold", json={"seat_ids": [seat_id]}).status_code, 200)
+        second.delete("/flights/B000001/hold")
+
+    def test_booking_releases_the_hold(self):
+        import seat_holds
+
+        seat_id, = support.free_seats("B000001", 1)
+        client = self.app.test_client()
+        self.assertEqual(client.put("/flights/B000001/hold", json={"seat_ids": [seat_id]}).status_code, 200)
+        self.assertIn(seat_id, seat_holds.holds.held("B000001"))
+
+        response = client.post("/book/B000001", data=support.passenger_form(1, seat_ids=seat_id))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(seat_id, seat_holds.holds.held("B000001"))
+        self.assertEqual(client.get("/flights/B000001/hold").get_json()["seat_ids"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
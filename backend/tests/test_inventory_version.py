@@ -0,0 +1,33 @@
+import unittest
+
+from tests import support
+
+
+class ConditionalGetTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = support.app()
+
+    def test_booking_in_the_same_second_is_not_answered_with_304(self):
+        client = self.app.test_client()
+        first = client.get("/book/B000003?passengers=1")
+        self.assertEqual(first.status_code, 200)
+        etag, last_modified = first.headers["ETag"], first.headers["Last-Modified"]
+        self.assertEqual(client.get("/book/B000003?passengers=1",
+                                    headers={"If-None-Match": etag}).status_code, 304)
+
+        seat_id, = support.free_seats("B000003", 1)
+        booked = client.post("/book/B000003", data=support.passenger_form(1, seat_ids=seat_id))
+        self.assertEqual(booked.status_code, 200)
+
+        again = client.get("/book/B000003?passengers=1", headers={"If-None-Match": etag})
+        self.assertEqual(again.status_code, 200)
+        self.assertNotEqual(again.headers["ETag"], etag)
+        # Last-Modified alone cannot tell the two copies apart
+        self.assertEqual(client.get("/book/B000003?passengers=1",
+                                    headers={"If-Modified-Since": last_modified}).status_code, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import base64
+import json
+import unittest
+
+from tests import support
+
+
+def cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+
+class CursorPagingTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.client = support.app().test_client()
+        source, destination = support.ROUTE
+        cls.search = f"/flights/search?source={source}&destination={destination}&date={support.DAY}"
+
+    def test_pages_join_up_to_the_full_result(self):
+        full = self.client.get(self.search).get_json()
+        self.assertGreater(len(full), 2)
+
+        items, token = [], None
+        while True:
+            response = self.client.get(self.search + "&limit=2" + (f"&cursor={token}" if token else ""))
+            self.assertEqual(response.status_code, 200)
+            items += response.get_json()
+            token = response.headers.get("X-Next-Cursor")
+            if not token:
+                break
+        self.assertEqual(items, full)
+
+    def test_malformed_search_cursors_are_400(self):
+        for token in ("not-base64!", cursor({"a": 1}), cursor(["x"]), cursor([1, 2]),
+                      cursor([None, "PK301", "Economy"]), cursor(["100", "PK301", "Economy"]),
+                      cursor([True, "PK301", "Economy"]), cursor([100, "PK301", "Economy", "x"])):
+            with self.subTest(token=token):
+                response = self.client.get(self.search + f"&cursor={token}")
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.get_json(), {"error": "cursor is not valid"})
+
+    def test_malformed_seat_cursors_are_400(self):
+        for token in (cursor(["Economy"]), cursor([1, 2]), cursor(["Economy", None])):
+            with self.subTest(token=token):
+                response = self.client.get(f"/flights/B000001/seats?limit=5&cursor={token}")
+                self.assertEqual(response.status_code, 400)
+
+    def test_seat_pages_follow_the_cursor(self):
+        first = self.client.get("/flights/B000001/seats?limit=5")
+        token = first.headers["X-Next-Cursor"]
+        second = self.client.get(f"/flights/B000001/seats?limit=5&cursor={token}").get_json()
+        last = first.get_json()[-1]
+        self.assertGreater((second[0]["class"], second[0]["seat_id"]), (last["class"], last["seat_id"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
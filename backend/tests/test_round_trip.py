@@ -0,0 +1,52 @@
+import unittest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from tests import support  # noqa: F401  (puts backend/ on the path)
+
+
+def leg(flight_id, departure, fare, class_name="Economy", hours=2):
+    # A (record, class_name, fare) row as search_legs() returns them
+    departure = datetime.fromisoformat(departure)
+    record = SimpleNamespace(flight_id=flight_id, departure=departure,
+                             arrival=departure + timedelta(hours=hours))
+    return record, class_name, fare
+
+
+def flights(itineraries):
+    return [(out[0].flight_id, ret[0].flight_id) for _, out, ret in itineraries]
+
+
+class TopItinerariesTests(unittest.TestCase):
+
+    def test_cheapest_pairs_first(self):
+        import round_trip
+
+        outbound = [leg("O1", "2025-11-10 06:00", 100), leg("O2", "2025-11-10 07:00", 150)]
+        inbound = [leg("R1", "2025-11-12 10:00", 80), leg("R2", "2025-11-12 12:00", 90)]
+        itineraries = round_trip.top_itineraries(outbound, inbound, k=3)
+        self.assertEqual([total for total, _, _ in itineraries], [180, 190, 230])
+        self.assertEqual(flights(itineraries), [("O1", "R1"), ("O1", "R2"), ("O2", "R1")])
+
+    def test_cheap_outbound_legs_that_land_too_late_do_not_hide_the_rest(self):
+        import round_trip
+
+        # The three cheapest outbound legs land at 22:00, after the only
+        # return has left; the dearer 06:00 one still connects
+        outbound = [leg(f"O{n}", "2025-11-10 20:00", 100 + n) for n in range(3)]
+        outbound.append(leg("O9", "2025-11-10 06:00", 300))
+        inbound = [leg("R1", "2025-11-10 10:00", 80)]
+        itineraries = round_trip.top_itineraries(outbound, inbound, k=2)
+        self.assertEqual(flights(itineraries), [("O9", "R1")])
+        self.assertEqual(itineraries[0][0], 380)
+
+    def test_legs_only_pair_within_a_class(self):
+        import round_trip
+
+        outbound = [leg("O1", "2025-11-10 06:00", 100, "Economy"), leg("O2", "2025-11-10 06:00", 300, "Business")]
+        inbound = [leg("R1", "2025-11-12 10:00", 500, "Business")]
+        self.assertEqual(flights(round_trip.top_itineraries(outbound, inbound)), [("O2", "R1")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+
+from tests import support
+
+
+class SeatCounterFreshnessTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = support.app()
+        source, destination = support.ROUTE
+        cls.search = f"/flights/search?source={source}&destination={destination}&date={support.DAY}"
+
+    def seats_left(self, flight_id, class_name):
+        rows = self.app.test_client().get(self.search).get_json()
+        return {row["seats_left"] for row in rows
+                if row["flight_id"] == flight_id and row["travel_class"] == class_name}
+
+    def book_elsewhere(self, flight_id, class_id, seats):
+        # What another worker's booking leaves behind: the counter moved in
+        # the database and the flight's version bumped in the shared segment
+        import inventory_version
+
+        support.execute("UPDATE main_flightclasssummary SET seats_booked = seats_booked + ?"
+                        " WHERE flight_id = ? AND travel_class_id = ?", (seats, flight_id, class_id))
+        inventory_version.bump(flight_id)
+
+    def test_search_follows_bookings_made_by_other_workers(self):
+        import search_index
+        import seat_inventory
+
+        self.assertTrue(search_index.is_ready())
+        with self.app.app_context():
+            seat_inventory.get_seat_map("B000001")   # published, as any booking would
+        before, = self.seats_left("B000001", "Economy")
+
+        self.book_elsewhere("B000001", "ECO", 5)
+        self.addCleanup(self.book_elsewhere, "B000001", "ECO", -5)
+        self.assertEqual(self.seats_left("B000001", "Economy"), {before - 5})
+
+    def test_unchanged_flights_are_not_read_again(self):
+        import search_index
+
+        records = search_index.index.flights(*support.ROUTE)
+        search_index.fresh_seats(records)
+        self.assertEqual(search_index.index.stale_seats(records), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+import itertools
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import unittest
+from array import array
+
+from tests import support
+
+
+_paths = itertools.count()
+
+
+def segment(size=1 << 20, slots=64):
+    # A segment of its own, apart from the one the app uses
+    import shared_inventory
+
+    return shared_inventory.Segment(os.path.join(support.TMP_DIR, f"segment-{next(_paths)}"), size, slots)
+
+
+def publish(shared, flight_id, seats, booked=b""):
+    return shared.attach(flight_id, bytearray(booked), 0, array("d", [100.0] * seats))
+
+
+class SegmentTests(unittest.TestCase):
+
+    def test_invalidated_flight_is_rebuilt_in_place(self):
+        shared = segment()
+        offset, generation = publish(shared, "PK301", 20)
+        used = shared.usage()["bytes_used"]
+        versions = set()
+
+        for _ in range(50):
+            shared.kill(["PK301"])
+            self.assertIsNone(shared.find("PK301"))
+            publish(shared, "PK301", 20)
+            versions.add(shared.flight_version("PK301")[0])
+
+        self.assertEqual(shared.find("PK301"), offset)
+        self.assertEqual(shared.generation(offset), generation + 50)
+        self.assertEqual(len(versions), 50)   # an ETag never comes back
+        usage = shared.usage()
+        self.assertEqual((usage["bytes_used"], usage["flights"], usage["dead_blocks"]), (used, 1, 0))
+
+    def test_new_seat_count_appends_and_counts_the_dead_block(self):
+        shared = segment()
+        old, _ = publish(shared, "PK301", 20)
+        shared.kill(["PK301"])
+        new, generation = publish(shared, "PK301", 24)
+
+        self.assertNotEqual(new, old)
+        self.assertEqual(generation, 0)
+        usage = shared.usage()
+        self.assertEqual((usage["flights"], usage["dead_blocks"]), (2, 1))
+        self.assertGreater(usage["dead_bytes"], 0)
+
+    def test_full_segment_refuses_and_reports_it(self):
+        shared = segment(size=64 + 2 * 32 + 256, slots=2)
+        self.assertIsNotNone(publish(shared, "PK301", 20))
+        self.assertEqual(shared.flight_version("PK302")[0], 0)
+
+        self.assertIsNone(publish(shared, "PK302", 20))
+        usage = shared.usage()
+        self.assertEqual((usage["fallbacks"], usage["full"]), (1, True))
+        # An unpublished flight now follows every bump
+        before = shared.flight_version("PK302")[0]
+        shared.bump("PK302")
+        self.assertNotEqual(shared.flight_version("PK302")[0], before)
+
+    def test_reader_waits_out_a_write_in_progress(self):
+        import shared_inventory
+
+        shared = segment()
+        offset, _ = publish(shared, "PK301", 8)
+        seq = shared_inventory._SEQ.unpack_from(shared.mm, offset)[0]
+        shared_inventory._SEQ.pack_into(shared.mm, offset, seq + 1)   # a writer is mid-way
+
+        seen = []
+        reader = threading.Thread(target=lambda: seen.append(bytes(shared.booked(offset))))
+        reader.start()
+        time.sleep(0.05)
+        self.assertEqual(seen, [])
+
+        start, _ = shared._bits_at(offset)
+        shared.mm[start] = 0b101
+        shared_inventory._SEQ.pack_into(shared.mm, offset, seq + 2)
+        reader.join(5)
+        self.assertEqual(seen, [bytes([0b101])])
+
+    def test_reader_retries_a_copy_that_overlapped_a_write(self):
+        import shared_inventory
+
+        shared = segment()
+        offset, _ = publish(shared, "PK301", 8)
+        copies = []
+
+        def copy():
+            copies.append(len(copies))
+            if len(copies) == 1:
+                # A whole write lands while the first copy is being taken
+                seq = shared_inventory._SEQ.unpack_from(shared.mm, offset)[0]
+                shared_inventory._SEQ.pack_into(shared.mm, offset, seq + 2)
+            return copies[-1]
+
+        self.assertEqual(shared._read(offset, copy), 1)
+
+
+# Books one seat through the Flask app in a fresh interpreter, i.e. as
+# another worker on the same database and segment would
+_OTHER_WORKER = """
+import json, sys
+from app import app
+flight_id, form = json.loads(sys.argv[1])
+print(app.test_client().post(f"/book/{flight_id}", data=form).status_code)
+"""
+
+
+class SecondProcessTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = support.app()
+
+    def test_booking_in_another_process_reaches_this_seat_map(self):
+        import inventory_version
+        import seat_inventory
+
+        seat_id, = support.free_seats("B000002", 1)
+        with self.app.app_context():
+            seat_map = seat_inventory.get_seat_map("B000002")
+        self.assertIsInstance(seat_map, seat_inventory.SharedSeatMap)
+        etag, _ = inventory_version.flight_etag("B000002")
+
+        worker = subprocess.run(
+            [sys.executable, "-c", _OTHER_WORKER,
+             json.dumps(["B000002", support.passenger_form(1, seat_ids=seat_id)])],
+            cwd=support.BACKEND_DIR, env=os.environ, capture_output=True, text=True, timeout=120,
+        )
+        self.assertEqual(worker.stdout.split()[-1:], ["200"], worker.stderr)
+
+        with self.app.app_context():
+            self.assertIs(seat_inventory.get_seat_map("B000002"), seat_map)
+        self.assertTrue(seat_map.is_booked(seat_id))
+        self.assertNotEqual(inventory_version.flight_etag("B000002")[0], etag)
+
+    def test_full_segment_builds_from_the_database_every_time(self):
+        import seat_inventory
+        import shared_inventory
+
+        full = segment(size=64 + 32, slots=1)
+        self.addCleanup(seat_inventory.invalidate, "B000005")
+        self.addCleanup(setattr, shared_inventory, "segment", shared_inventory.segment)
+        shared_inventory.segment = full
+        seat_inventory.invalidate("B000005")
+
+        with self.app.app_context():
+            first = seat_inventory.get_seat_map("B000005")
+            second = seat_inventory.get_seat_map("B000005")
+        self.assertIsNot(first, second)
+        self.assertNotIn("B000005", seat_inventory._maps)
+        response = self.app.test_client().get("/stats/inventory")
+        self.assertEqual(response.get_json()["shared"]["fallbacks"], 2)
+        self.assertTrue(response.get_json()["shared"]["full"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import asyncio
+import unittest
+
+from tests import support
+
+
+async def asgi_get(path):
+    # One GET through the ASGI app -> response status
+    import asgi
+    import async_db
+
+    messages = []
+
+    async def receive():
+        return {"type": "http.request"}
+
+    async def send(message):
+        messages.append(message)
+
+    try:
+        await asgi.app({"type": "http", "method": "GET", "path": path, "query_string": b"", "headers": []},
+                       receive, send)
+    finally:
+        await async_db.close()
+    return messages[0]["status"]
+
+
+class RoundTripTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = support.app()
+
+    def observed(self):
+        import sql_metrics
+
+        return sql_metrics._round_trips.count, sql_metrics._round_trips.total
+
+    def test_flask_request_counts_its_round_trips(self):
+        count, total = self.observed()
+        self.assertEqual(self.app.test_client().get("/flights/B000001/seat-map").status_code, 200)
+        self.assertEqual(self.observed()[0], count + 1)
+        self.assertGreater(self.observed()[1], total)
+
+    def test_asgi_request_counts_its_round_trips(self):
+        count, total = self.observed()
+        self.assertEqual(asyncio.run(asgi_get("/flights/B000001/seat-map")), 200)
+        self.assertEqual(self.observed()[0], count + 1)
+        self.assertGreater(self.observed()[1], total)
+
+    def test_work_outside_a_request_is_not_counted(self):
+        import db
+
+        count = self.observed()[0]
+        conn = db.acquire()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM main_flightdetails")
+            cursor.fetchall()
+            cursor.close()
+        finally:
+            conn.close()
+        self.assertEqual(self.observed()[0], count)
+
+
+if __name__ == "__main__":
+    unittest.main()
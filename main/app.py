@@ -1,29 +1,42 @@
 # app.py
 from flask import Flask, render_template, request, redirect
-from db import get_connection
-from datetime import datetime
+from db import get_connection, reference
+import assets
+import page_cache
+import sql_metrics
+from datetime import datetime, timedelta
 from flask_wtf import CSRFProtect
 
 app = Flask(__name__)
+sql_metrics.init_app(app)
+assets.init_app(app)
 
 @app.route('/')
+@page_cache.cached()
 def home():
     return render_template('index.html')
 
 @app.route('/contact')
+@page_cache.cached()
 def contact():
     return render_template('contact.html')
 
 @app.route('/destination')
+@page_cache.cached()
 def destination():
     return render_template('destination.html')
 
 @app.route('/pricing')
+@page_cache.cached()
 def pricing():
     return render_template('pricing.html')
 
 
 @app.route('/search-flights', methods=['POST'])
+@page_cache.cached(
+    page_cache.form_criteria('departure_city', 'arrival_city', 'departure_date', 'travel_class', 'passengers'),
+    versioned=True, ttl=page_cache.TTL,
+)
 def search_flights():
     departure_city = request.form.get('departure_city')
     arrival_city = request.form.get('arrival_city')
@@ -37,24 +50,13 @@ def search_flights():
     cursor = conn.cursor()
 
     try:
-        # First, get the full city names for the search criteria
-        cursor.execute("""
-            SELECT airport_city FROM main_airport WHERE airport_id = :dept
-        """, dept=departure_city)
-        departure_city_name = cursor.fetchone()[0]
-        
-        cursor.execute("""
-            SELECT airport_city FROM main_airport WHERE airport_id = :arr
-        """, arr=arrival_city)
-        arrival_city_name = cursor.fetchone()[0]
-        
-        # Map travel class codes to full names
-        class_names = {
-            'ECO': 'Economy',
-            'BUS': 'Business', 
-            'FIR': 'First Class'
-        }
-        travel_class_name = class_names.get(travel_class, travel_class)
+        # Full city and class names for the search criteria, from the
+        # reference cache rather than a query each
+        departure_city_name = reference.airport_city(departure_city)
+        arrival_city_name = reference.airport_city(arrival_city)
+        if departure_city_name is None or arrival_city_name is None:
+            raise LookupError(f"unknown airport {departure_city!r} or {arrival_city!r}")
+        travel_class_name = reference.class_name(travel_class, travel_class)
 
         # Then get the flights
         query = """
@@ -63,18 +65,23 @@ def search_flights():
                    f.Destination_Airport_ID,
                    TO_CHAR(f.Departure_Date_Time, 'YYYY-MM-DD HH24:MI'),
                    TO_CHAR(f.Arrival_Date_Time, 'YYYY-MM-DD HH24:MI'),
-                   f.Airplane_Type,
-                   a1.airport_city AS Source_City,
-                   a2.airport_city AS Dest_City
+                   f.Airplane_Type
             FROM main_flightdetails f
-            JOIN main_airport a1 ON f.Source_Airport_ID = a1.Airport_ID
-            JOIN main_airport a2 ON f.Destination_Airport_ID = a2.Airport_ID
             WHERE f.Source_Airport_ID = :src
               AND f.Destination_Airport_ID = :dest
-              AND TRUNC(f.Departure_Date_Time) = TO_DATE(:dep_date, 'YYYY-MM-DD')
+              AND f.Departure_Date_Time >= :dep_start
+              AND f.Departure_Date_Time <  :dep_end
         """
-        cursor.execute(query, src=departure_city, dest=arrival_city, dep_date=departure_date)
-        flights = cursor.fetchall()
+        # Range on the raw column instead of TRUNC(...) so the route/departure
+        # index can be used
+        dep_start = datetime.strptime(departure_date, '%Y-%m-%d')
+        dep_end = dep_start + timedelta(days=1)
+        cursor.execute(query, src=departure_city, dest=arrival_city, dep_start=dep_start, dep_end=dep_end)
+        # Source/destination cities appended from the cache
+        flights = [
+            row + (reference.airport_city(row[1]), reference.airport_city(row[2]))
+            for row in cursor.fetchall()
+        ]
 
         # Debug: Print what we found
         print(f"Found {len(flights)} flights")
@@ -96,13 +103,19 @@ def search_flights():
 
     except Exception as e:
         print("Error while searching flights:", e)
-        return render_template("search_results.html", flights=[], error="No flights found or invalid input")
+        # Not a 200, so the page cache does not keep it
+        return render_template("search_results.html", flights=[], error="No flights found or invalid input"), 400
 
     finally:
         cursor.close()
         conn.close()
 
 
+@app.route('/metrics')
+def metrics():
+    return sql_metrics.metrics_response()
+
+
 @app.route('/debug-schema')
 def debug_schema():
     conn = get_connection()
@@ -0,0 +1,66 @@
+"""Rendered-page cache for the Django views (twin of backend/page_cache.py).
+
+The static pages use cache_page over gzip_page, so what is cached is the
+compressed response. The search view is a POST, which cache_page never
+caches, so cached_post() stores its pages itself: gzip-compressed, keyed
+by the form fields the page is built from plus a generation number that
+signals.py bumps whenever fares, seats, reservations or reference data
+change. Entries live in the default cache (LRU, see CACHES in settings).
+"""
+import gzip
+import hashlib
+import re
+from functools import wraps
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+GENERATION_KEY = 'pages:generation'
+
+_ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+
+def _generation():
+    return cache.get_or_set(GENERATION_KEY, 0, None)
+
+
+def invalidate():
+    # Every cached search page is stale from now on
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, None)
+
+
+def _response(request, body, content_type):
+    if _ACCEPTS_GZIP.search(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+        response = HttpResponse(body, content_type=content_type)
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(gzip.decompress(body), content_type=content_type)
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def cached_post(*fields):
+    # View decorator for form POSTs whose page depends only on `fields`
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'POST':
+                return view(request, *args, **kwargs)
+
+            criteria = repr(tuple(request.POST.get(field, '') for field in fields))
+            key = 'page:%s:%d:%s' % (view.__name__, _generation(), hashlib.sha1(criteria.encode()).hexdigest())
+            page = cache.get(key)
+            if page is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200 or response.streaming:
+                    return response
+                page = (compress_string(response.content), response['Content-Type'])
+                cache.set(key, page)
+            return _response(request, *page)
+        return wrapper
+    return decorator
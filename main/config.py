@@ -1,4 +1,15 @@
 # config.py
+import os
+
+# "oracle" (default) or "sqlite" for a local run without a database server
+DB_BACKEND = os.environ.get("DB_BACKEND", "oracle").lower()
+
 DB_USERNAME = "flight_admin"
 DB_PASSWORD = "flight123"
 DB_DSN = "localhost:1521/ORCLPDB"  # Use the same as Django
+
+# Shared with the Flask backend so both apps see the same local data
+SQLITE_PATH = os.environ.get(
+    "SQLITE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend", "flights.sqlite3"),
+)
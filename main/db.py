@@ -1,11 +1,32 @@
 # db.py
-import cx_Oracle
-from config import DB_USERNAME, DB_PASSWORD, DB_DSN
+import os
+import sys
+
+from config import DB_BACKEND, DB_USERNAME, DB_PASSWORD, DB_DSN, SQLITE_PATH
+
+# The SQLite stand-in (schema + Oracle dialect shims) lives with the backend
+# (as does the SQL instrumentation behind /metrics)
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+if BACKEND_DIR not in sys.path:
+    sys.path.append(BACKEND_DIR)
+
+import reference_data
+import sql_metrics
+
 
 def get_connection():
+    if DB_BACKEND == "sqlite":
+        import sqlite_db
+        return sql_metrics.wrap(sqlite_db.connect(SQLITE_PATH))
+
+    import cx_Oracle
     try:
         conn = cx_Oracle.connect(DB_USERNAME, DB_PASSWORD, DB_DSN)
-        return conn
+        return sql_metrics.wrap(conn)
     except cx_Oracle.DatabaseError as e:
         print("Database connection error:", e)
         return None
+
+
+# Airports, travel classes and services, shared by every request
+reference = reference_data.ReferenceCache(get_connection)
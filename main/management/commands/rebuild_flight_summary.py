@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from main import summary
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-flight, per-class fare and seat summary (backfill; searches re-quote fares daily themselves)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--flight', action='append', dest='flights', metavar='FLIGHT_ID',
+                            help="Only rebuild this flight (repeatable); default is every flight")
+
+    def handle(self, *args, **options):
+        rows = summary.rebuild(options['flights'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} flight class summary rows"))
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.3 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_alter_airport_airport_id_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='flightdetails',
+            index=models.Index(fields=['source_airport', 'destination_airport', 'departure_date_time'], name='flight_route_departure_idx'),
+        ),
+    ]
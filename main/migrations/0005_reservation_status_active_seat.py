@@ -0,0 +1,22 @@
+# Generated by Django 5.2.3 on 2026-10-17 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_flightdetails_flight_route_departure_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reservation',
+            name='status',
+            field=models.CharField(choices=[('A', 'Active'), ('C', 'Cancelled')], db_default='A', max_length=1),
+        ),
+        migrations.AddConstraint(
+            model_name='reservation',
+            constraint=models.UniqueConstraint(models.Case(models.When(status='A', then=models.F('seat'))), name='uniq_active_seat_reservation'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-17 20:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_reservation_status_active_seat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlightClassSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('min_fare', models.DecimalField(decimal_places=2, max_digits=10, null=True)),
+                ('seats_total', models.IntegerField(default=0)),
+                ('seats_booked', models.IntegerField(default=0)),
+                ('flight', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='class_summaries', to='main.flightdetails')),
+                ('travel_class', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='flight_summaries', to='main.travelclass')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('flight', 'travel_class'), name='uniq_flight_class_summary')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_flightclasssummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flightclasssummary',
+            name='quote_day',
+            field=models.DateField(db_index=True, null=True),
+        ),
+    ]
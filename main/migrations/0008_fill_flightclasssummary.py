@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+def fill(apps, schema_editor):
+    # 0006 only created the table: fill it for the flights already in the
+    # database, or every booking is refused and every SQL search is empty.
+    # Uses the live models, which match the schema as of this migration.
+    from main import summary
+
+    summary.rebuild()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_flightclasssummary_quote_day'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill, migrations.RunPython.noop),
+    ]
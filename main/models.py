@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Case, F, When
 
 # 1. Airport
 class Airport(models.Model):
@@ -19,6 +20,16 @@ class FlightDetails(models.Model):
     arrival_date_time = models.DateTimeField()
     airplane_type = models.CharField(max_length=50)
 
+    class Meta:
+        # Route + departure window searches; keep departure last so a date
+        # range is an index range scan.
+        indexes = [
+            models.Index(
+                fields=['source_airport', 'destination_airport', 'departure_date_time'],
+                name='flight_route_departure_idx',
+            ),
+        ]
+
     def __str__(self):
         return f"{self.flight_id}: {self.source_airport} -> {self.destination_airport}"
 
@@ -66,6 +77,18 @@ class Reservation(models.Model):
     passenger = models.ForeignKey(Passenger, on_delete=models.CASCADE, related_name='reservations')
     seat = models.ForeignKey(SeatDetails, on_delete=models.CASCADE, related_name='reservations')
     date_of_reservation = models.DateField()
+    # db_default so raw INSERTs (Flask backend, seed scripts) get 'A' too
+    status = models.CharField(max_length=1, choices=[('A','Active'),('C','Cancelled')], db_default='A')
+
+    class Meta:
+        constraints = [
+            # At most one active reservation per seat. Cancelled rows map to
+            # NULL, which unique indexes ignore on both Oracle and SQLite.
+            models.UniqueConstraint(
+                Case(When(status='A', then=F('seat'))),
+                name='uniq_active_seat_reservation',
+            ),
+        ]
 
     def __str__(self):
         return f"Reservation {self.reservation_id} for {self.passenger}"
@@ -119,3 +142,28 @@ class FlightCost(models.Model):
 
     def __str__(self):
         return f"Cost {self.cost} for {self.seat}"
+
+
+# 11. Flight_Class_Summary
+class FlightClassSummary(models.Model):
+    # Lowest fare and seat counts per flight and class, so searches read one
+    # narrow row instead of aggregating every seat and fare. Kept in step by
+    # main/signals.py (ORM writes) and backend/flight_summary.py (raw SQL);
+    # rebuild with `manage.py rebuild_flight_summary`. quote_day is the day
+    # min_fare was valid on under FARE_DATE=booking (null under departure);
+    # readers re-derive rows whose day has passed. seats_total is capped at
+    # the class's capacity.
+    flight = models.ForeignKey(FlightDetails, on_delete=models.CASCADE, related_name='class_summaries')
+    travel_class = models.ForeignKey(TravelClass, on_delete=models.CASCADE, related_name='flight_summaries')
+    min_fare = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    quote_day = models.DateField(null=True, db_index=True)
+    seats_total = models.IntegerField(default=0)
+    seats_booked = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['flight', 'travel_class'], name='uniq_flight_class_summary'),
+        ]
+
+    def __str__(self):
+        return f"{self.flight_id}/{self.travel_class_id}: {self.seats_booked}/{self.seats_total} from {self.min_fare}"
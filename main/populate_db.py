@@ -1,18 +1,106 @@
+"""Populate the IAT Airlines schedule, seats and fares.
+
+Run with `python manage.py shell < main/populate_db.py`. Safe to re-run:
+every table is written with chunked bulk upserts, so the cost is a few
+statements per BATCH_SIZE rows instead of two per row, and memory stays
+flat however many seats there are. POPULATE_DAYS repeats the base
+schedule over more days (seat and fare counts grow linearly with it).
+"""
+import os
+import time
 from datetime import datetime, timedelta
+from itertools import islice
+
 from main.models import (
     Airport, FlightDetails, TravelClass, SeatDetails, Passenger,
     Reservation, PaymentStatus, FlightService, ServiceOffering, FlightCost
 )
-from django.db import transaction
-from django.utils import timezone
+from main import summary
+from django.db import connection, transaction
 
 import warnings
 
 warnings.filterwarnings("ignore")
 
+# Rows per bulk statement (and per progress line)
+BATCH_SIZE = int(os.environ.get("POPULATE_BATCH_SIZE", "2000"))
+
+# Days the November 10 schedule is flown on (1 = the original data set)
+DAYS = max(1, int(os.environ.get("POPULATE_DAYS", "1")))
+
+
+# -----------------------------
+# Bulk helpers
+# -----------------------------
+def chunked(iterable, size=BATCH_SIZE):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Progress:
+    # One line per chunk: rows done, total (if known) and rate
+    def __init__(self, label, total=None):
+        self.label = label
+        self.total = total
+        self.done = 0
+        self.started = time.perf_counter()
+
+    def add(self, n):
+        self.done += n
+        elapsed = time.perf_counter() - self.started
+        rate = self.done / elapsed if elapsed else 0.0
+        of = f"/{self.total}" if self.total is not None else ""
+        print(f"  {self.label}: {self.done}{of} rows ({rate:,.0f}/s)", flush=True)
+
+
+def upsert(model, objs, unique_fields, update_fields, total=None):
+    # Insert new rows and update existing ones, one chunk at a time.
+    # Backends with INSERT ... ON CONFLICT (SQLite, PostgreSQL) do it in one
+    # statement; Oracle has no such bulk_create support, so there we look
+    # up which keys exist per chunk and split into bulk_update + bulk_create.
+    progress = Progress(model.__name__, total)
+    fields = [model._meta.get_field(name) for name in unique_fields]
+    attnames = [field.attname for field in fields]
+    native = connection.features.supports_update_conflicts_with_target
+
+    for chunk in chunked(objs):
+        if native:
+            model.objects.bulk_create(
+                chunk,
+                update_conflicts=True,
+                unique_fields=unique_fields,
+                update_fields=update_fields,
+                batch_size=BATCH_SIZE,
+            )
+        else:
+            keys = [tuple(getattr(obj, name) for name in attnames) for obj in chunk]
+            existing = {
+                tuple(row[1:]): row[0]
+                for row in model.objects.filter(
+                    **{f"{attnames[0]}__in": {key[0] for key in keys}}
+                ).values_list("pk", *attnames)
+            }
+            found, new = [], []
+            for obj, key in zip(chunk, keys):
+                if key in existing:
+                    obj.pk = existing[key]
+                    found.append(obj)
+                else:
+                    new.append(obj)
+            if found:
+                model.objects.bulk_update(found, update_fields, batch_size=BATCH_SIZE)
+            if new:
+                model.objects.bulk_create(new, batch_size=BATCH_SIZE)
+        progress.add(len(chunk))
+
+
 # Wrap everything in a transaction to avoid partial inserts if error occurs
 with transaction.atomic():
-    
+
     # -----------------------------
     # 1. Airports
     # -----------------------------
@@ -24,13 +112,14 @@ with transaction.atomic():
         ('UET', 'Quetta', 'Pakistan'),  # Fixed from QUA to UET
         ('MUX', 'Multan', 'Pakistan')
     ]
-    
-    for code, city, country in airports:
-        Airport.objects.update_or_create(
-            airport_id=code,
-            defaults={'airport_city': city, 'airport_country': country}
-        )
-    
+
+    upsert(
+        Airport,
+        [Airport(airport_id=code, airport_city=city, airport_country=country)
+         for code, city, country in airports],
+        ['airport_id'], ['airport_city', 'airport_country'],
+    )
+
     # -----------------------------
     # 2. Travel Classes
     # -----------------------------
@@ -39,13 +128,14 @@ with transaction.atomic():
         ('BUS', 'Business', 50),
         ('FIR', 'First', 20)      # Fixed from FST to FIR
     ]
-    
-    for tc_id, name, cap in travel_classes:
-        TravelClass.objects.update_or_create(
-            travel_class_id=tc_id,
-            defaults={'name': name, 'capacity': cap}
-        )
-    
+
+    upsert(
+        TravelClass,
+        [TravelClass(travel_class_id=tc_id, name=name, capacity=cap)
+         for tc_id, name, cap in travel_classes],
+        ['travel_class_id'], ['name', 'capacity'],
+    )
+
     # -----------------------------
     # 3. Flight Services
     # -----------------------------
@@ -56,16 +146,16 @@ with transaction.atomic():
         ('EXL', 'Extra Legroom'),
         ('PRI', 'Priority Boarding')
     ]
-    
-    for s_id, name in services:
-        FlightService.objects.update_or_create(service_id=s_id, defaults={'service_name': name})
-    
+
+    upsert(
+        FlightService,
+        [FlightService(service_id=s_id, service_name=name) for s_id, name in services],
+        ['service_id'], ['service_name'],
+    )
+
     # -----------------------------
     # 4. Create Flights Between All Cities
     # -----------------------------
-    flight_counter = 101
-    flights_created = []
-    
     # Define flight durations between cities (in hours)
     flight_durations = {
         ('KHI', 'LHE'): 2.0,
@@ -84,115 +174,90 @@ with transaction.atomic():
         ('PEW', 'MUX'): 2.0,
         ('UET', 'MUX'): 1.5,
     }
-    
-    # Create flights for November 10, 2025
-    base_date = datetime(2025, 11, 10)
-    
-    # Generate flights in both directions
-    for (source, dest), duration in flight_durations.items():
-        # Forward flight (source -> destination)
-        flight_id_forward = f'IAT{flight_counter}'
-        departure_time = base_date.replace(hour=8, minute=0) + timedelta(hours=(flight_counter-101)*0.5)
-        arrival_time = departure_time + timedelta(hours=duration)
-        
-        flight_forward = FlightDetails.objects.update_or_create(
-            flight_id=flight_id_forward,
-            defaults={
-                'source_airport': Airport.objects.get(airport_id=source),
-                'destination_airport': Airport.objects.get(airport_id=dest),
-                'departure_date_time': departure_time,
-                'arrival_date_time': arrival_time,
-                'airplane_type': 'Airbus A320'
-            }
-        )[0]
-        flights_created.append(flight_forward)
-        flight_counter += 1
-        
-        # Return flight (destination -> source)
-        flight_id_return = f'IAT{flight_counter}'
-        departure_time_return = base_date.replace(hour=14, minute=0) + timedelta(hours=(flight_counter-101)*0.5)
-        arrival_time_return = departure_time_return + timedelta(hours=duration)
-        
-        flight_return = FlightDetails.objects.update_or_create(
-            flight_id=flight_id_return,
-            defaults={
-                'source_airport': Airport.objects.get(airport_id=dest),
-                'destination_airport': Airport.objects.get(airport_id=source),
-                'departure_date_time': departure_time_return,
-                'arrival_date_time': arrival_time_return,
-                'airplane_type': 'Boeing 737'
-            }
-        )[0]
-        flights_created.append(flight_return)
-        flight_counter += 1
-    
-    # Create additional flights for November 11, 2025
-    base_date_nov11 = datetime(2025, 11, 11)
-    
-    # Add morning flights for popular routes
+
+    # Add morning and evening flights for popular routes on the next day
     popular_routes = [('KHI', 'ISB'), ('LHE', 'ISB'), ('KHI', 'LHE'), ('ISB', 'PEW')]
-    
-    for source, dest in popular_routes:
-        duration = flight_durations.get((source, dest), 2.0)
-        
-        # Morning flight on Nov 11
-        flight_id_morning = f'IAT{flight_counter}'
-        departure_time_morning = base_date_nov11.replace(hour=7, minute=30)
-        arrival_time_morning = departure_time_morning + timedelta(hours=duration)
-        
-        flight_morning = FlightDetails.objects.update_or_create(
-            flight_id=flight_id_morning,
-            defaults={
-                'source_airport': Airport.objects.get(airport_id=source),
-                'destination_airport': Airport.objects.get(airport_id=dest),
-                'departure_date_time': departure_time_morning,
-                'arrival_date_time': arrival_time_morning,
-                'airplane_type': 'Airbus A321'
-            }
-        )[0]
-        flights_created.append(flight_morning)
-        flight_counter += 1
-        
-        # Evening flight on Nov 11
-        flight_id_evening = f'IAT{flight_counter}'
-        departure_time_evening = base_date_nov11.replace(hour=18, minute=0)
-        arrival_time_evening = departure_time_evening + timedelta(hours=duration)
-        
-        flight_evening = FlightDetails.objects.update_or_create(
-            flight_id=flight_id_evening,
-            defaults={
-                'source_airport': Airport.objects.get(airport_id=source),
-                'destination_airport': Airport.objects.get(airport_id=dest),
-                'departure_date_time': departure_time_evening,
-                'arrival_date_time': arrival_time_evening,
-                'airplane_type': 'Boeing 737'
-            }
-        )[0]
-        flights_created.append(flight_evening)
-        flight_counter += 1
-    
+
+    def schedule():
+        # (flight_id, source, dest, departure, arrival, airplane_type); the
+        # November 10-11 timetable, repeated DAYS times from November 10
+        flight_counter = 101
+        for day in range(DAYS):
+            base_date = datetime(2025, 11, 10) + timedelta(days=day)
+            first = flight_counter
+
+            # Generate flights in both directions
+            for (source, dest), duration in flight_durations.items():
+                departure = base_date.replace(hour=8) + timedelta(hours=(flight_counter - first) * 0.5)
+                yield (f'IAT{flight_counter}', source, dest,
+                       departure, departure + timedelta(hours=duration), 'Airbus A320')
+                flight_counter += 1
+
+                departure = base_date.replace(hour=14) + timedelta(hours=(flight_counter - first) * 0.5)
+                yield (f'IAT{flight_counter}', dest, source,
+                       departure, departure + timedelta(hours=duration), 'Boeing 737')
+                flight_counter += 1
+
+            next_day = base_date + timedelta(days=1)
+            for source, dest in popular_routes:
+                duration = flight_durations.get((source, dest), 2.0)
+
+                departure = next_day.replace(hour=7, minute=30)
+                yield (f'IAT{flight_counter}', source, dest,
+                       departure, departure + timedelta(hours=duration), 'Airbus A321')
+                flight_counter += 1
+
+                departure = next_day.replace(hour=18)
+                yield (f'IAT{flight_counter}', source, dest,
+                       departure, departure + timedelta(hours=duration), 'Boeing 737')
+                flight_counter += 1
+
+    flights = list(schedule())
+    upsert(
+        FlightDetails,
+        (FlightDetails(flight_id=flight_id, source_airport_id=source, destination_airport_id=dest,
+                       departure_date_time=departure, arrival_date_time=arrival,
+                       airplane_type=airplane_type)
+         for flight_id, source, dest, departure, arrival, airplane_type in flights),
+        ['flight_id'],
+        ['source_airport', 'destination_airport', 'departure_date_time',
+         'arrival_date_time', 'airplane_type'],
+        total=len(flights),
+    )
+
     # -----------------------------
     # 5. Seats for All Flights
     # -----------------------------
-    for flight in FlightDetails.objects.all():
-        for tc in TravelClass.objects.all():
-            # Create seats for each travel class
-            seats_per_row = 6  # Assuming 6 seats per row
-            rows = tc.capacity // seats_per_row
-            
-            for row in range(1, rows + 1):
-                for seat_num in range(1, seats_per_row + 1):
-                    seat_letter = chr(64 + seat_num)  # A, B, C, D, E, F
-                    seat_id = f"{flight.flight_id}-{row}{seat_letter}"
-                    
-                    SeatDetails.objects.update_or_create(
-                        seat_id=seat_id,
-                        defaults={
-                            'travel_class': tc,
-                            'flight': flight
-                        }
-                    )
-    
+    # Every class numbers its rows from 1, so seat ids overlap between
+    # classes; the later class in this order keeps the seat (rows 1-3
+    # First, 4-8 Business, 9-25 Economy), as the per-row loop always did.
+    seats_per_row = 6  # Assuming 6 seats per row
+    cabin = {}
+    for tc_id, _, cap in travel_classes:
+        for row in range(1, cap // seats_per_row + 1):
+            for seat_num in range(1, seats_per_row + 1):
+                cabin[f"{row}{chr(64 + seat_num)}"] = tc_id  # A, B, C, D, E, F
+
+    # Every flight in the database gets seats, not only the ones above
+    flight_routes = dict(
+        (flight_id, (source, dest))
+        for flight_id, source, dest in FlightDetails.objects.values_list(
+            'flight_id', 'source_airport_id', 'destination_airport_id')
+    )
+
+    def seats():
+        for flight_id in flight_routes:
+            for seat, tc_id in cabin.items():
+                yield f"{flight_id}-{seat}", flight_id, tc_id
+
+    upsert(
+        SeatDetails,
+        (SeatDetails(seat_id=seat_id, flight_id=flight_id, travel_class_id=tc_id)
+         for seat_id, flight_id, tc_id in seats()),
+        ['seat_id'], ['travel_class', 'flight'],
+        total=len(flight_routes) * len(cabin),
+    )
+
     # -----------------------------
     # 6. Service Offerings
     # -----------------------------
@@ -201,21 +266,16 @@ with transaction.atomic():
         'BUS': ['MEAL', 'WIFI', 'PRI'],  # Business gets meal, wifi, priority
         'FIR': ['MEAL', 'WIFI', 'ENT', 'EXL', 'PRI']  # First gets all services
     }
-    
-    for tc in TravelClass.objects.all():
-        offered_services = service_offerings.get(tc.travel_class_id, [])
-        for svc_id in offered_services:
-            svc = FlightService.objects.get(service_id=svc_id)
-            ServiceOffering.objects.update_or_create(
-                travel_class=tc,
-                service=svc,
-                defaults={
-                    'offered_yn': 'Y',
-                    'from_date': datetime(2025, 11, 1).date(),
-                    'to_date': datetime(2025, 12, 31).date()
-                }
-            )
-    
+
+    upsert(
+        ServiceOffering,
+        [ServiceOffering(travel_class_id=tc_id, service_id=svc_id, offered_yn='Y',
+                         from_date=datetime(2025, 11, 1).date(),
+                         to_date=datetime(2025, 12, 31).date())
+         for tc_id, svc_ids in service_offerings.items() for svc_id in svc_ids],
+        ['travel_class', 'service'], ['offered_yn', 'from_date', 'to_date'],
+    )
+
     # -----------------------------
     # 7. Sample Passengers
     # -----------------------------
@@ -227,23 +287,18 @@ with transaction.atomic():
         ('P005', 'Bilal', 'Shah', 'bilal.shah@example.com', '03003334455', 'Jinnah Road', 'Quetta', 'Balochistan', '87300', 'Pakistan'),
         ('P006', 'Sara', 'Iqbal', 'sara.iqbal@example.com', '03002223344', 'Bosan Road', 'Multan', 'Punjab', '60000', 'Pakistan'),
     ]
-    
-    for pid, fname, lname, email, phone, addr, city, state, zipc, country in passengers:
-        Passenger.objects.update_or_create(
-            passenger_id=pid,
-            defaults={
-                'first_name': fname,
-                'last_name': lname,
-                'email': email,
-                'phone_number': phone,
-                'address': addr,
-                'city': city,
-                'state': state,
-                'zipcode': zipc,
-                'country': country
-            }
-        )
-    
+
+    upsert(
+        Passenger,
+        [Passenger(passenger_id=pid, first_name=fname, last_name=lname, email=email,
+                   phone_number=phone, address=addr, city=city, state=state,
+                   zipcode=zipc, country=country)
+         for pid, fname, lname, email, phone, addr, city, state, zipc, country in passengers],
+        ['passenger_id'],
+        ['first_name', 'last_name', 'email', 'phone_number', 'address',
+         'city', 'state', 'zipcode', 'country'],
+    )
+
     # -----------------------------
     # 8. Sample Reservations and Payments
     # -----------------------------
@@ -254,33 +309,36 @@ with transaction.atomic():
         ('R003', 'P003', 'IAT103-1B', 200.00),  # Usman Malik on KHI->ISB
         ('R004', 'P004', 'IAT104-3C', 180.00),  # Fatima Raza on ISB->KHI
     ]
-    
+
+    # One query for every seat the bookings need
+    known_seats = set(SeatDetails.objects.filter(
+        seat_id__in=[seat_id for _, _, seat_id, _ in sample_bookings]
+    ).values_list('seat_id', flat=True))
+
+    bookings = []
     for res_id, pass_id, seat_id, amount in sample_bookings:
-        try:
-            passenger = Passenger.objects.get(passenger_id=pass_id)
-            seat = SeatDetails.objects.get(seat_id=seat_id)
-            
-            reservation = Reservation.objects.update_or_create(
-                reservation_id=res_id,
-                defaults={
-                    'passenger': passenger,
-                    'seat': seat,
-                    'date_of_reservation': datetime.now().date()
-                }
-            )[0]
-            
-            PaymentStatus.objects.update_or_create(
-                payment_id=f'PAY{res_id[1:]}',  # PAY001, PAY002, etc.
-                defaults={
-                    'payment_status_yn': 'Y',
-                    'payment_due_date': datetime.now().date() + timedelta(days=2),
-                    'payment_amount': amount,
-                    'reservation': reservation
-                }
-            )
-        except Exception as e:
-            print(f"Could not create reservation {res_id}: {e}")
-    
+        if seat_id in known_seats:
+            bookings.append((res_id, pass_id, seat_id, amount))
+        else:
+            print(f"Could not create reservation {res_id}: seat {seat_id} does not exist")
+
+    today = datetime.now().date()
+    upsert(
+        Reservation,
+        [Reservation(reservation_id=res_id, passenger_id=pass_id, seat_id=seat_id,
+                     date_of_reservation=today)
+         for res_id, pass_id, seat_id, _ in bookings],
+        ['reservation_id'], ['passenger', 'seat', 'date_of_reservation'],
+    )
+    upsert(
+        PaymentStatus,
+        [PaymentStatus(payment_id=f'PAY{res_id[1:]}',  # PAY001, PAY002, etc.
+                       payment_status_yn='Y', payment_due_date=today + timedelta(days=2),
+                       payment_amount=amount, reservation_id=res_id)
+         for res_id, _, _, amount in bookings],
+        ['payment_id'], ['payment_status_yn', 'payment_due_date', 'payment_amount', 'reservation'],
+    )
+
     # -----------------------------
     # 9. Flight Costs for All Seats
     # -----------------------------
@@ -289,38 +347,42 @@ with transaction.atomic():
         'BUS': 300.00,   # Business base price
         'FIR': 500.00    # First class base price
     }
-    
+
     # Add some price variation based on route popularity
     route_multipliers = {
         ('KHI', 'ISB'): 1.2,  # Popular route - 20% more expensive
         ('KHI', 'LHE'): 1.1,  # Slightly popular - 10% more
         ('LHE', 'ISB'): 1.0,  # Standard price
     }
-    
-    for seat in SeatDetails.objects.all():
-        base_price = base_prices.get(seat.travel_class.travel_class_id, 100.00)
-        
-        # Check if this route has a multiplier
-        route_key = (seat.flight.source_airport.airport_id, seat.flight.destination_airport.airport_id)
-        multiplier = route_multipliers.get(route_key, 1.0)
-        
-        final_price = base_price * multiplier
-        
-        FlightCost.objects.update_or_create(
-            seat=seat,
-            valid_from_date=datetime(2025, 11, 1).date(),
-            defaults={
-                'valid_to_date': datetime(2025, 12, 31).date(),
-                'cost': final_price
-            }
-        )
+
+    def flight_costs():
+        # Class and route come from the dicts above, not one query per seat
+        for seat_id, flight_id, tc_id in seats():
+            base_price = base_prices.get(tc_id, 100.00)
+            multiplier = route_multipliers.get(flight_routes[flight_id], 1.0)
+            yield FlightCost(seat_id=seat_id,
+                             valid_from_date=datetime(2025, 11, 1).date(),
+                             valid_to_date=datetime(2025, 12, 31).date(),
+                             cost=base_price * multiplier)
+
+    upsert(
+        FlightCost, flight_costs(),
+        ['seat', 'valid_from_date'], ['valid_to_date', 'cost'],
+        total=len(flight_routes) * len(cabin),
+    )
+
+    # -----------------------------
+    # 10. Search summary
+    # -----------------------------
+    # Bulk writes skip the model signals, so rebuild it in one pass
+    print(f"  flight class summaries: {summary.rebuild()} rows", flush=True)
 
 print("Complete database populated successfully for IAT Airlines!")
-print(f"Created flights between all cities for November 10-11, 2025")
+print(f"Created flights between all cities for November 10-{10 + DAYS}, 2025")
 print(f"Total flights created: {FlightDetails.objects.count()}")
 print(f"Total seats created: {SeatDetails.objects.count()}")
 print(f"Sample routes available:")
 print("- Karachi to Islamabad (multiple flights)")
-print("- Lahore to Islamabad") 
+print("- Lahore to Islamabad")
 print("- Karachi to Lahore")
-print("- And all other city combinations!")
\ No newline at end of file
+print("- And all other city combinations!")
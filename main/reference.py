@@ -0,0 +1,19 @@
+"""The backend's reference-data cache, fed by the Django connection.
+
+Same ReferenceCache as backend/db.py, so both sites read airports, travel
+classes and services from memory. signals.py invalidates it on ORM writes
+to those tables; other processes pick the change up via REFERENCE_TTL.
+"""
+import os
+import sys
+
+from django.db import connection
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+if BACKEND_DIR not in sys.path:
+    sys.path.append(BACKEND_DIR)
+
+from reference_data import ReferenceCache
+
+# Django owns the connection (per thread), so the cache must not close it
+cache = ReferenceCache(lambda: connection, close=False)
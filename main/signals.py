@@ -0,0 +1,112 @@
+"""Keep FlightClassSummary in step with ORM writes (connected in apps.py).
+
+Raw-SQL writers (the Flask backend) update the table themselves through
+backend/flight_summary.py.
+
+Also drops the reference-data cache (reference.py) when an airport,
+travel class or service changes, and the cached search pages
+(cached_pages.py) on any of these changes.
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import cached_pages, reference, summary
+from .models import (
+    Airport, FlightCost, FlightDetails, FlightService, Reservation, SeatDetails, ServiceOffering,
+    TravelClass,
+)
+
+
+def _seat_class(seat_id):
+    # (flight_id, travel_class_id) of a seat, or None once it is gone
+    return SeatDetails.objects.filter(pk=seat_id).values_list('flight_id', 'travel_class_id').first()
+
+
+def _active(status):
+    # A new row's status may still be the unsaved db_default ('A')
+    return status != 'C'
+
+
+# ----------------- FARES -----------------
+
+@receiver(post_save, sender=FlightCost)
+@receiver(post_delete, sender=FlightCost)
+def fare_changed(sender, instance, **kwargs):
+    seat = _seat_class(instance.seat_id)
+    if seat is not None:
+        summary.refresh_fares(seat[0])
+
+
+# ----------------- SEATS -----------------
+
+@receiver(post_save, sender=SeatDetails)
+@receiver(post_delete, sender=SeatDetails)
+def seat_changed(sender, instance, **kwargs):
+    summary.rebuild([instance.flight_id])
+
+
+@receiver(post_save, sender=TravelClass)
+def travel_class_saved(sender, instance, created, **kwargs):
+    # seats_total is capped at the class's capacity
+    if not created:
+        summary.rebuild_class(instance.pk)
+
+
+# ----------------- RESERVATIONS -----------------
+
+@receiver(pre_save, sender=Reservation)
+def reservation_saving(sender, instance, **kwargs):
+    # Remember what the row held before, to count the difference on save
+    instance._summary_before = (
+        Reservation.objects.filter(pk=instance.pk).values_list('seat_id', 'status').first()
+    )
+
+
+@receiver(post_save, sender=Reservation)
+def reservation_saved(sender, instance, **kwargs):
+    before = getattr(instance, '_summary_before', None)
+    if before is not None and _active(before[1]):
+        seat = _seat_class(before[0])
+        if seat is not None:
+            summary.adjust_booked(*seat, -1)
+    if _active(instance.status):
+        seat = _seat_class(instance.seat_id)
+        if seat is not None:
+            summary.adjust_booked(*seat, 1)
+
+
+@receiver(post_delete, sender=Reservation)
+def reservation_deleted(sender, instance, **kwargs):
+    if _active(instance.status):
+        seat = _seat_class(instance.seat_id)
+        if seat is not None:
+            summary.adjust_booked(*seat, -1)
+
+
+# ----------------- REFERENCE DATA -----------------
+
+@receiver(post_save, sender=Airport)
+@receiver(post_delete, sender=Airport)
+@receiver(post_save, sender=TravelClass)
+@receiver(post_delete, sender=TravelClass)
+@receiver(post_save, sender=FlightService)
+@receiver(post_delete, sender=FlightService)
+@receiver(post_save, sender=ServiceOffering)
+@receiver(post_delete, sender=ServiceOffering)
+def reference_changed(sender, instance, **kwargs):
+    reference.cache.invalidate()
+    cached_pages.invalidate()
+
+
+# ----------------- CACHED PAGES -----------------
+
+@receiver(post_save, sender=FlightDetails)
+@receiver(post_delete, sender=FlightDetails)
+@receiver(post_save, sender=FlightCost)
+@receiver(post_delete, sender=FlightCost)
+@receiver(post_save, sender=SeatDetails)
+@receiver(post_delete, sender=SeatDetails)
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+def inventory_changed(sender, instance, **kwargs):
+    cached_pages.invalidate()
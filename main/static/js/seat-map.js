@@ -0,0 +1,64 @@
+// Decoder for the compact seat map served by GET /flights/<id>/seat-map.
+//
+//   layout  "1-3:ABCD,4-30:ABCDEF"  rows 1 to 3 with seats A-D, then 4 to 30
+//           with A-F ("~CODE" is a seat spelled out on its own)
+//   runs    [[seat count, class index, fare], ...] in layout order
+//   booked  base64 bitmask, bit i % 8 of byte i / 8 = seat i
+//   held    same, for seats a checkout session is holding (seat_holds.py)
+//   seats_left  {class name: seats still for sale}, from the booking counters
+//
+// SeatMap.load(url) resolves to the seats booking.html renders:
+// [{id, className, cost, booked, held}, ...].
+(function (window) {
+    'use strict';
+
+    // Layouts are shared by every flight of an aircraft type
+    const layouts = {};
+
+    function expandLayout(layout) {
+        if (layouts[layout]) return layouts[layout];
+        const codes = [];
+        layout.split(',').forEach(section => {
+            if (section.charAt(0) === '~') {
+                codes.push(section.slice(1));
+                return;
+            }
+            const [rows, letters] = section.split(':');
+            const [first, last] = rows.split('-').map(n => parseInt(n, 10));
+            for (let row = first; row <= (last || first); row++) {
+                for (const letter of letters) codes.push(row + letter);
+            }
+        });
+        return (layouts[layout] = codes);
+    }
+
+    function decode(map) {
+        const codes = expandLayout(map.layout);
+        const bits = window.atob(map.booked);
+        const held = window.atob(map.held || '');
+        const seats = [];
+        let i = 0;
+        map.runs.forEach(([count, classIndex, cost]) => {
+            for (const end = i + count; i < end; i++) {
+                seats.push({
+                    id: map.prefix + codes[i],
+                    className: map.classes[classIndex],
+                    cost: cost,
+                    booked: (bits.charCodeAt(i >> 3) >> (i & 7)) & 1,
+                    held: i >> 3 < held.length ? (held.charCodeAt(i >> 3) >> (i & 7)) & 1 : 0
+                });
+            }
+        });
+        return seats;
+    }
+
+    function load(url) {
+        // The endpoint sends an ETag, so a revisit is a 304 from the cache
+        return fetch(url, { credentials: 'same-origin' }).then(response => {
+            if (!response.ok) throw new Error('Seat map unavailable (' + response.status + ')');
+            return response.json();
+        }).then(decode);
+    }
+
+    window.SeatMap = { decode: decode, load: load };
+})(window);
@@ -0,0 +1,156 @@
+"""ORM upkeep of FlightClassSummary.
+
+The Django twin of backend/flight_summary.py: the same rows, computed
+through the ORM so admin edits and management commands keep the table in
+step. The quote day follows the backend's FARE_DATE setting ("booking":
+today, "departure": the flight's departure date); under "booking" each row
+records the day it was quoted on and ensure_current() re-derives the rows
+from earlier days on read. ensure_current() also builds the rows of any
+flight that has seats but no summary.
+"""
+import os
+import threading
+from datetime import date
+
+from django.db import transaction
+from django.db.models import Count, Exists, F, Min, OuterRef, Q, Subquery
+from django.db.models.functions import Least, TruncDate
+
+from .models import FlightClassSummary, FlightCost, SeatDetails
+
+FARE_DATE = os.environ.get("FARE_DATE", "booking").lower()
+
+_quote_lock = threading.Lock()
+_current_day = None     # last day this process brought the table up to
+
+
+def _quote_day():
+    # Day stored with the rows: today under "booking", none under "departure"
+    return None if FARE_DATE == "departure" else date.today()
+
+
+def _valid_costs(flight_ids=None):
+    costs = FlightCost.objects.all()
+    if flight_ids is not None:
+        costs = costs.filter(seat__flight_id__in=flight_ids)
+    if FARE_DATE == "departure":
+        day = TruncDate('seat__flight__departure_date_time')
+    else:
+        day = date.today()
+    return costs.filter(valid_from_date__lte=day, valid_to_date__gte=day)
+
+
+def _min_fares(flight_ids=None):
+    # {(flight_id, travel_class_id): lowest fare valid on the quote day}
+    rows = (
+        _valid_costs(flight_ids)
+        .values('seat__flight_id', 'seat__travel_class_id')
+        .annotate(min_fare=Min('cost'))
+    )
+    return {(r['seat__flight_id'], r['seat__travel_class_id']): r['min_fare'] for r in rows}
+
+
+@transaction.atomic
+def rebuild(flight_ids=None):
+    # Recompute the rows for these flights (all flights if None)
+    summaries = FlightClassSummary.objects.all()
+    seats = SeatDetails.objects.all()
+    if flight_ids is not None:
+        flight_ids = list(flight_ids)
+        summaries = summaries.filter(flight_id__in=flight_ids)
+        seats = seats.filter(flight_id__in=flight_ids)
+    summaries.delete()
+
+    # Seats beyond the class's configured capacity are never for sale
+    counts = seats.values('flight_id', 'travel_class_id', 'travel_class__capacity').annotate(
+        seats_total=Least(Count('seat_id', distinct=True), F('travel_class__capacity')),
+        seats_booked=Count('reservations', filter=Q(reservations__status='A')),
+    )
+    fares = _min_fares(flight_ids)
+    quote_day = _quote_day()
+    rows = [
+        FlightClassSummary(
+            flight_id=c['flight_id'],
+            travel_class_id=c['travel_class_id'],
+            min_fare=fares.get((c['flight_id'], c['travel_class_id'])),
+            quote_day=quote_day,
+            seats_total=c['seats_total'],
+            seats_booked=c['seats_booked'],
+        )
+        for c in counts
+    ]
+    FlightClassSummary.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+def rebuild_class(travel_class_id):
+    # Recompute every flight with seats in this class, e.g. after its
+    # capacity (the cap on seats_total) changed
+    flight_ids = (
+        SeatDetails.objects.filter(travel_class_id=travel_class_id)
+        .values_list('flight_id', flat=True).distinct()
+    )
+    return rebuild(list(flight_ids))
+
+
+def refresh_fares(flight_id):
+    # Re-derive min_fare for one flight after a fare row changed
+    fares = _min_fares([flight_id])
+    quote_day = _quote_day()
+    for summary in FlightClassSummary.objects.filter(flight_id=flight_id):
+        min_fare = fares.get((flight_id, summary.travel_class_id))
+        if summary.min_fare != min_fare or summary.quote_day != quote_day:
+            summary.min_fare = min_fare
+            summary.quote_day = quote_day
+            summary.save(update_fields=['min_fare', 'quote_day'])
+
+
+def backfill():
+    # Rebuild the flights with a class that has no row -> rows built
+    missing = SeatDetails.objects.exclude(Exists(FlightClassSummary.objects.filter(
+        flight_id=OuterRef('flight_id'), travel_class_id=OuterRef('travel_class_id'),
+    )))
+    flight_ids = list(missing.values_list('flight_id', flat=True).distinct())
+    return rebuild(flight_ids) if flight_ids else 0
+
+
+def ensure_current():
+    # Call before reading the summary: builds missing rows and, under
+    # FARE_DATE=booking, re-derives the rows quoted on an earlier day
+    # (backend/flight_summary.py does the same). Once per process per day
+    # -> rows written
+    global _current_day
+    today = date.today()
+    if _current_day == today:
+        return 0
+    with _quote_lock:
+        if _current_day == today:
+            return 0
+        written = backfill()
+        if FARE_DATE == "departure":
+            _current_day = today
+            return written
+        lowest = (
+            FlightCost.objects.filter(
+                seat__flight_id=OuterRef('flight_id'),
+                seat__travel_class_id=OuterRef('travel_class_id'),
+                valid_from_date__lte=today,
+                valid_to_date__gte=today,
+            )
+            .values('seat__flight_id', 'seat__travel_class_id')
+            .annotate(lowest=Min('cost'))
+            .values('lowest')
+        )
+        written += FlightClassSummary.objects.filter(
+            Q(quote_day__lt=today) | Q(quote_day__isnull=True),
+        ).update(min_fare=Subquery(lowest), quote_day=today)
+        _current_day = today
+        return written
+
+
+def adjust_booked(flight_id, travel_class_id, delta):
+    # Atomic in the database, so concurrent bookings never lose a count
+    if delta:
+        FlightClassSummary.objects.filter(
+            flight_id=flight_id, travel_class_id=travel_class_id,
+        ).update(seats_booked=F('seats_booked') + delta)
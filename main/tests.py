@@ -1,3 +1,63 @@
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
 from django.test import TestCase
 
-# Create your tests here.
+from . import summary
+from .models import (
+    Airport, FlightClassSummary, FlightCost, FlightDetails, Passenger, Reservation, SeatDetails,
+    TravelClass,
+)
+
+
+class FlightClassSummaryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        khi = Airport.objects.create(airport_id='KHI', airport_city='Karachi', airport_country='Pakistan')
+        lhe = Airport.objects.create(airport_id='LHE', airport_city='Lahore', airport_country='Pakistan')
+        cls.economy = TravelClass.objects.create(travel_class_id='ECO', name='Economy', capacity=3)
+        departure = datetime(2025, 11, 10, 9, 0, tzinfo=timezone.utc)
+        cls.flight = FlightDetails.objects.create(
+            flight_id='PK301', source_airport=khi, destination_airport=lhe, airplane_type='A320',
+            departure_date_time=departure, arrival_date_time=departure + timedelta(hours=2),
+        )
+        today = date.today()
+        for n in range(4):
+            seat = SeatDetails.objects.create(seat_id=f'PK301-{n + 1}A', travel_class=cls.economy,
+                                              flight=cls.flight)
+            FlightCost.objects.create(seat=seat, cost=Decimal(100 + n),
+                                      valid_from_date=today - timedelta(days=30),
+                                      valid_to_date=today + timedelta(days=30))
+        cls.passenger = Passenger.objects.create(
+            passenger_id='P1', first_name='Test', last_name='Passenger', email='p1@example.com',
+            phone_number='x', address='x', city='x', state='x', zipcode='x', country='x',
+        )
+
+    def row(self):
+        return FlightClassSummary.objects.get(flight=self.flight, travel_class=self.economy)
+
+    def test_seats_total_is_capped_at_class_capacity(self):
+        self.assertEqual(self.row().seats_total, 3)
+        self.economy.capacity = 10
+        self.economy.save()
+        self.assertEqual(self.row().seats_total, 4)
+
+    def test_reservations_move_the_counter(self):
+        reservation = Reservation.objects.create(reservation_id='R1', passenger=self.passenger,
+                                                 seat_id='PK301-1A', date_of_reservation=date.today())
+        self.assertEqual(self.row().seats_booked, 1)
+        reservation.status = 'C'
+        reservation.save()
+        self.assertEqual(self.row().seats_booked, 0)
+
+    def test_fares_quoted_on_an_earlier_day_are_requoted(self):
+        if summary.FARE_DATE == 'departure':
+            self.skipTest("quote days only apply under FARE_DATE=booking")
+        self.assertEqual((self.row().min_fare, self.row().quote_day), (Decimal('100'), date.today()))
+
+        FlightClassSummary.objects.update(min_fare=1, quote_day=date.today() - timedelta(days=1))
+        summary._current_day = None
+        self.assertEqual(summary.ensure_current(), 1)
+        self.assertEqual((self.row().min_fare, self.row().quote_day), (Decimal('100'), date.today()))
+        self.assertEqual(summary.ensure_current(), 0)
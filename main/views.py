@@ -1,20 +1,44 @@
 from django.shortcuts import render, redirect
-from django.db.models import Q
-from .models import Airport, FlightDetails
-from datetime import datetime
+from django.db.models import F, Q
+from django.views.decorators.cache import cache_page
+from django.views.decorators.gzip import gzip_page
+from . import summary
+from .cached_pages import cached_post
+from .models import Airport, FlightClassSummary
+from .reference import cache as reference
+from datetime import datetime, timedelta
 
+# Static pages: rendered once an hour, cached already compressed
+STATIC_PAGE_SECONDS = 60 * 60
+
+@cache_page(STATIC_PAGE_SECONDS)
+@gzip_page
 def home(request):
     return render(request, 'index.html')
 
+@cache_page(STATIC_PAGE_SECONDS)
+@gzip_page
 def contact(request):
     return render(request, 'contact.html')
 
+@cache_page(STATIC_PAGE_SECONDS)
+@gzip_page
 def destination(request):
     return render(request, 'destination.html')
 
+@cache_page(STATIC_PAGE_SECONDS)
+@gzip_page
 def pricing(request):
     return render(request, 'pricing.html')
 
+def _airport_label(airport_id):
+    # Airport.__str__ ("City (ID)") from the reference cache
+    city = reference.airport_city(airport_id)
+    if city is None:
+        raise Airport.DoesNotExist(airport_id)
+    return f"{city} ({airport_id})"
+
+@cached_post('departure_city', 'arrival_city', 'departure_date', 'travel_class', 'passengers')
 def search_flights(request):
     if request.method == 'POST':
         departure_city = request.POST.get('departure_city')
@@ -29,18 +53,39 @@ def search_flights(request):
         try:
             departure_datetime = datetime.strptime(departure_date, '%Y-%m-%d')
             
-            # Search for flights
-            flights = FlightDetails.objects.filter(
-                source_airport_id=departure_city,
-                destination_airport_id=arrival_city,
-                departure_date_time__date=departure_datetime.date()
-            ).select_related('source_airport', 'destination_airport')
+            # Search for flights: one row per flight and class from the
+            # summary table, cheapest first (same shape as the Flask search).
+            # Half-open range rather than __date so the route/departure
+            # index is usable
+            summary.ensure_current()
+            summaries = FlightClassSummary.objects.filter(
+                flight__source_airport_id=departure_city,
+                flight__destination_airport_id=arrival_city,
+                flight__departure_date_time__gte=departure_datetime,
+                flight__departure_date_time__lt=departure_datetime + timedelta(days=1),
+                min_fare__isnull=False,
+                seats_booked__lt=F('seats_total'),   # sold-out classes drop out
+            ).select_related('flight').order_by('min_fare', 'flight_id')
+            flights = [
+                (
+                    s.flight.flight_id,
+                    reference.airport_city(s.flight.source_airport_id),
+                    reference.airport_city(s.flight.destination_airport_id),
+                    s.flight.departure_date_time.strftime('%Y-%m-%d %H:%M'),
+                    s.flight.arrival_date_time.strftime('%Y-%m-%d %H:%M'),
+                    s.flight.airplane_type,
+                    s.min_fare,
+                    reference.class_name(s.travel_class_id),
+                    s.seats_total - s.seats_booked,
+                )
+                for s in summaries
+            ]
             
             context = {
                 'flights': flights,
                 'search_criteria': {
-                    'departure_city': Airport.objects.get(airport_id=departure_city),
-                    'arrival_city': Airport.objects.get(airport_id=arrival_city),
+                    'departure_city': _airport_label(departure_city),
+                    'arrival_city': _airport_label(arrival_city),
                     'date': departure_date,
                     'travel_class': travel_class,
                     'passengers': passengers
@@ -55,7 +100,7 @@ def search_flights(request):
             return render(request, 'search_results.html', {
                 'flights': [],
                 'error': 'No flights found or invalid search criteria'
-            })
+            }, status=400)   # not a 200, so cached_post does not keep it
     
     # If GET request, redirect to home
     return redirect('index')
\ No newline at end of file
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -82,6 +83,25 @@ DATABASES = {
     }
 }
 
+# DB_BACKEND=sqlite runs the site against the same local file the Flask
+# backend uses, with no Oracle server.
+if os.environ.get('DB_BACKEND', 'oracle').lower() == 'sqlite':
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'backend' / 'flights.sqlite3'),
+    }
+
+# Rendered pages (main/cached_pages.py). LocMemCache evicts least recently
+# used entries past MAX_ENTRIES.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'pages',
+        'TIMEOUT': int(os.environ.get('PAGE_CACHE_TTL', '300')),
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('PAGE_CACHE_ENTRIES', '500'))},
+    }
+}
+
 
 
 # Password validation